@@ -0,0 +1,6 @@
+"""
+Code shared by grade.py, the task graders and the util scripts.
+
+The task graders are packed with PyInstaller (see util/pack.sh), which bundles
+this package into every executable.
+"""
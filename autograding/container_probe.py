@@ -0,0 +1,89 @@
+import re
+import shlex
+import uuid
+
+from autograding.docker_client import DockerError
+
+def build_probe_script(assertions, marker):
+    """
+    Builds one sh script that runs every assertion command and reports each result.
+
+    For every assertion the script prints a begin marker, the command's stdout and
+    an end marker carrying the command's exit code, so a single exec returns the
+    results of all assertions.
+
+    Args:
+        assertions (list): (name, command) pairs, command being a list of arguments.
+        marker (str): Random token that cannot appear in normal command output.
+    """
+    lines = []
+    for index, (_, command) in enumerate(assertions):
+        lines.append(f"printf '%s\\n' '{marker} begin {index}'")
+        lines.append(f"{shlex.join(command)} 2>/dev/null")
+        lines.append(f"printf '\\n%s %s\\n' '{marker} end {index}' \"$?\"")
+    return '\n'.join(lines)
+
+def parse_probe_output(output, assertions, marker):
+    """
+    Splits the output of a probe script into the result of every assertion.
+
+    Returns:
+        dict: Maps assertion names to {'exit_code': int, 'output': str}. Assertions
+        whose markers are missing (e.g. the script was cut short) are left out.
+    """
+    pattern = re.compile(
+        rf"^{re.escape(marker)} begin (\d+)\n(.*?)\n{re.escape(marker)} end \1 (\d+)$",
+        re.MULTILINE | re.DOTALL
+    )
+    results = {}
+    for match in pattern.finditer(output):
+        index = int(match.group(1))
+        if index < len(assertions):
+            name = assertions[index][0]
+            results[name] = {"exit_code": int(match.group(3)), "output": match.group(2).strip()}
+    return results
+
+def run_probe(docker, container, assertions):
+    """
+    Runs all assertions inside a container with a single exec round-trip.
+
+    Args:
+        docker: Client returned by autograding.docker_client.get_docker().
+        container (str): Name of the running container, e.g. 'autograding-task3'.
+        assertions (list): (name, command) pairs.
+
+    Returns:
+        dict: Results as returned by parse_probe_output(), or None if the probe could
+        not run at all (e.g. the container has no 'sh'), so the caller can fall back
+        to running the assertions one by one.
+    """
+    marker = f"__probe_{uuid.uuid4().hex}__"
+    script = build_probe_script(assertions, marker)
+    try:
+        _, stdout, _ = docker.exec_run(container, ['sh', '-c', script])
+    except DockerError:
+        return None
+    results = parse_probe_output(stdout, assertions, marker)
+    if not results:
+        return None
+    return results
+
+# 每个路径输出 类型、inode、大小、修改时间，普通文件再加内容校验和；不存在的路径输出 missing
+STAT_SCRIPT = ('for path in "$@"; do stat -c "%n %F %i %s %Y" "$path" 2>/dev/null || echo "$path missing"; '
+               '[ -f "$path" ] && cksum < "$path"; done; true')
+
+def stat_paths(docker, container, paths):
+    """
+    Describes the current state of some paths inside a container with a single exec.
+
+    The output changes whenever one of the files is created, removed, replaced or
+    written to, so it can be part of a check's fingerprint.
+
+    Returns:
+        str: The description, or None if the exec failed.
+    """
+    try:
+        exit_code, stdout, _ = docker.exec_run(container, ['sh', '-c', STAT_SCRIPT, 'sh'] + list(paths))
+    except DockerError:
+        return None
+    return stdout if exit_code == 0 else None
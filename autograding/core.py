@@ -0,0 +1,445 @@
+import argparse
+import cProfile
+import hashlib
+import json
+import os
+import pstats
+import queue
+import signal
+import sys
+import threading
+import time
+
+from autograding.envelope import decrypt_envelope, encrypt_report
+from autograding.keys import get_config_path, load_secret_key
+from autograding.timing import begin_session, current_check, session, since_session_start
+
+REPORT_FILE_NAME = "autograding_report.json"
+# 上一次运行中通过的检查及其输入指纹，同样加密保存在任务目录下
+CACHE_FILE_NAME = ".autograding_cache"
+
+# 同时运行的检查数量上限
+DEFAULT_MAX_WORKERS = 4
+
+class GradingTimeout(BaseException):
+    """Raised when grade.py stops a task (SIGTERM or SIGALRM) before all checks finished."""
+
+def handle_timeout(signum, frame):
+    # PyInstaller 的引导进程会转发信号，忽略后续重复的 SIGTERM
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise GradingTimeout()
+
+class Check:
+    """
+    A graded check, declared once and run by Grader.run_checks().
+
+    Args:
+        name (str): Name shown in the report.
+        func (callable): Returns True/False, or (passed, points_earned) for partial points.
+        points (int): Points awarded when func returns True.
+        depends_on (list): Names of earlier checks that must pass before this one runs.
+            If one of them fails, this check is skipped and gets 0 points.
+        skip_message (str): Printed instead of the default message when skipped.
+        fingerprint (callable): Returns a JSON-serializable value describing everything
+            the check depends on (e.g. a binary's path and mtime). If it is unchanged
+            since a run in which the check passed, that verdict is reused instead of
+            running func. Checks without a fingerprint always run.
+    """
+
+    def __init__(self, name, func, points, depends_on=(), skip_message=None, fingerprint=None):
+        self.name = name
+        self.func = func
+        self.points = points
+        self.depends_on = list(depends_on)
+        self.skip_message = skip_message
+        self.fingerprint = fingerprint
+
+class ThreadOutput:
+    """
+    Stands in for sys.stdout while checks run concurrently.
+
+    Text printed by a check thread is collected per thread, so the output of every
+    check can be printed as one block; text printed by any other thread goes straight
+    through to the real stream.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.local = threading.local()
+
+    def capture(self):
+        self.local.buffer = []
+
+    def release(self):
+        text = ''.join(self.local.buffer)
+        self.local.buffer = None
+        return text
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None:
+            return self.target.write(text)
+        buffer.append(text)
+        return len(text)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.target.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+class Grader:
+    """
+    Results, score, scheduling and reporting shared by the task graders.
+
+    Args:
+        task_name (str): Name of the task, e.g. 'task1'.
+        checks (list): Check objects, in the order they appear in the report.
+        max_score (int): Maximum score; defaults to the sum of the checks' points.
+        report_title (str): Heading of the result list in the final report.
+        manual_checks (list): Names of results the task records itself with
+            add_result() instead of through a Check (e.g. 'Quiz'); they are
+            recorded as timed out if the task is stopped before reaching them.
+        max_workers (int): Maximum number of checks running at the same time.
+    """
+
+    def __init__(self, task_name, checks, max_score=None, report_title="Results:",
+                 manual_checks=(), max_workers=DEFAULT_MAX_WORKERS):
+        self.task_name = task_name
+        self.checks = list(checks)
+        self.max_score = max_score if max_score is not None else sum(check.points for check in self.checks)
+        self.report_title = report_title
+        self.manual_checks = list(manual_checks)
+        self.max_workers = max_workers
+
+        declared = set()
+        for check in self.checks:
+            for dependency in check.depends_on:
+                if dependency not in declared:
+                    raise ValueError(f"Check '{check.name}' depends on '{dependency}', which is not declared before it.")
+            declared.add(check.name)
+
+        self.results = []
+        self.score = 0
+        # 使用 --format jsonl 时，结构化事件写入原始 stdout，面向人的输出改写到 stderr
+        self.event_stream = None
+        # 任务所在目录 (报告保存在这里) 与 AES 密钥，均由 main() 设置
+        self.app_dir = None
+        self.secret_key = None
+        # 检查名 -> {'fingerprint', 'points'}，只保存通过的检查；使用 --fresh 时不读取
+        self.cache = {}
+        self.use_cache = False
+        # 使用 --profile 时，主线程与每个检查线程各自的 cProfile.Profile
+        self.profiles = None
+        self.duration = 0.0
+        # 解析后的命令行参数 (含任务自己的参数)，由 main() 设置
+        self.args = None
+        # body() 自行保存了报告时 (例如 task3 批量评分答题卡) 设为 True，main() 不再保存本次运行的报告
+        self.reports_saved = False
+
+    def emit_event(self, event, **fields):
+        """Writes one JSON event line when running with --format jsonl."""
+        if self.event_stream is None:
+            return
+        self.event_stream.write(json.dumps({"event": event, "task": self.task_name, **fields}, ensure_ascii=False) + "\n")
+        self.event_stream.flush()
+
+    def add_result(self, result, duration=0.0, start=None):
+        """
+        Records the result of one check, adds its points and emits a 'check' event.
+
+        Args:
+            result (dict): 'name', 'passed' and 'points', plus any details.
+            duration (float): How long the check took, in seconds.
+            start (float): time.monotonic() when the check started, if it ran.
+        """
+        if start is not None:
+            result['start'] = since_session_start(start)
+        result['duration'] = round(duration, 6)
+        self.results.append(result)
+        self.score += result['points']
+        self.emit_event("check", **result)
+
+    def run_checks(self):
+        """
+        Runs every declared check and records the results in declaration order.
+
+        A check starts as soon as all of its dependencies have passed, with at most
+        max_workers checks running at once; if a dependency failed, it is skipped.
+        The output of each check is printed as one block.
+        """
+        output = ThreadOutput(sys.stdout)
+        completions = queue.Queue()
+        outcomes = {}
+        pending = list(self.checks)
+        running = 0
+        recorded = 0
+
+        sys.stdout = output
+        try:
+            while recorded < len(self.checks):
+                for check in list(pending):
+                    if any(dependency not in outcomes for dependency in check.depends_on):
+                        continue
+                    failed = [dependency for dependency in check.depends_on if not outcomes[dependency]['passed']]
+                    if failed:
+                        pending.remove(check)
+                        outcomes[check.name] = self._skipped_outcome(check, failed[0])
+                    elif running < self.max_workers:
+                        pending.remove(check)
+                        running += 1
+                        threading.Thread(target=self._run_check, args=(check, output, completions), daemon=True).start()
+
+                while recorded < len(self.checks) and self.checks[recorded].name in outcomes:
+                    self._record(self.checks[recorded], outcomes[self.checks[recorded].name])
+                    recorded += 1
+
+                if recorded < len(self.checks):
+                    name, outcome = completions.get()
+                    if 'exit' in outcome:
+                        print(outcome['output'], end='')
+                        raise outcome['exit']
+                    outcomes[name] = outcome
+                    running -= 1
+        except GradingTimeout:
+            # 已经完成的检查照常记录，其余的由 record_timed_out_checks() 记为超时
+            for check in self.checks[recorded:]:
+                if check.name in outcomes:
+                    self._record(check, outcomes[check.name])
+            raise
+        finally:
+            sys.stdout = output.target
+
+    def _fingerprint(self, check):
+        """Returns a digest of the check's inputs, or None if it has no usable fingerprint."""
+        if check.fingerprint is None:
+            return None
+        try:
+            inputs = check.fingerprint()
+        except Exception:
+            return None
+        if inputs is None:
+            return None
+        data = json.dumps([check.name, check.points, inputs], sort_keys=True, default=str)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def _run_check(self, check, output, completions):
+        output.capture()
+        outcome = {"passed": False, "points": 0, "duration": 0.0, "timings": {}, "calls": []}
+        current_check.timings = outcome['timings']
+        current_check.calls = outcome['calls']
+        profile = None
+        if self.profiles is not None:
+            profile = cProfile.Profile()
+            self.profiles.append(profile)
+            profile.enable()
+        try:
+            print(f"Checking {check.name}...")
+            start = outcome['start'] = time.monotonic()
+            outcome['fingerprint'] = self._fingerprint(check)
+            cached = self.cache.get(check.name)
+            if self.use_cache and outcome['fingerprint'] and cached and cached['fingerprint'] == outcome['fingerprint']:
+                outcome.update(passed=True, points=cached['points'], cached=True,
+                               duration=time.monotonic() - start)
+                print(f"✓ {check.name}: Passed (+{cached['points']}pts, unchanged since the last run)")
+                return
+            try:
+                result = check.func()
+            except Exception as e:
+                print(f"  - An error occurred: {e}")
+                result = False
+            outcome['duration'] = time.monotonic() - start
+
+            if isinstance(result, tuple):
+                passed, points = result
+            else:
+                passed, points = bool(result), check.points
+            if passed:
+                outcome.update(passed=True, points=points)
+                print(f"✓ {check.name}: Passed (+{points}pts)")
+            else:
+                print(f"✗ {check.name}: Failed")
+        except SystemExit as e:
+            # 检查函数调用了 sys.exit()，交给主线程退出
+            outcome['exit'] = e
+        finally:
+            if profile is not None:
+                profile.disable()
+            current_check.timings = None
+            current_check.calls = None
+            outcome['output'] = output.release()
+            completions.put((check.name, outcome))
+
+    def _skipped_outcome(self, check, failed_dependency):
+        message = check.skip_message or f"✗ Skipping {check.name} because '{failed_dependency}' did not pass."
+        return {"passed": False, "points": 0, "duration": 0.0, "output": message + "\n", "skipped": True}
+
+    def _record(self, check, outcome):
+        print(outcome['output'], end='')
+        result = {"name": check.name, "passed": outcome['passed'], "points": outcome['points']}
+        if outcome.get('skipped'):
+            result['skipped'] = True
+        if outcome.get('timings'):
+            result['timings'] = outcome['timings']
+        if outcome.get('calls'):
+            result['calls'] = outcome['calls']
+        if outcome.get('cached'):
+            result['cached'] = True
+        # 只缓存通过的检查：失败的检查下次总会重新运行
+        if outcome['passed'] and outcome.get('fingerprint'):
+            self.cache[check.name] = {"fingerprint": outcome['fingerprint'], "points": outcome['points']}
+        else:
+            self.cache.pop(check.name, None)
+        self.add_result(result, outcome['duration'], outcome.get('start'))
+
+    def record_timed_out_checks(self):
+        """Records every check that has not finished yet as timed out."""
+        print("\n✗ Grading was stopped before all checks finished (timed out).")
+        finished = {result['name'] for result in self.results}
+        for check in self.checks:
+            if check.name not in finished:
+                self.add_result({"name": check.name, "passed": False, "points": 0, "timed_out": True})
+        for name in self.manual_checks:
+            if not any(finished_name.startswith(name) for finished_name in finished):
+                self.add_result({"name": name, "passed": False, "points": 0, "timed_out": True})
+
+    def print_final_report(self):
+        """Prints a formatted summary of the test results and the final score."""
+        print("\n--- AUTOGRADING FINAL REPORT ---")
+        print(self.report_title)
+        for result in self.results:
+            status = '✓ Passed' if result['passed'] else '✗ Failed'
+            print(f"  - {result['name']}: {status} (+{result['points']}pts)")
+        print(f"\nFinal Score: {self.score}/{self.max_score} (Correctness)")
+        print("----------------------------------\n")
+
+    def save_report(self):
+        """Encrypts the results and saves them next to the task executable."""
+        report_file_path = os.path.join(self.app_dir, REPORT_FILE_NAME)
+
+        final_results = {
+            "task": self.task_name,
+            "score": self.score,
+            "max_score": self.max_score,
+            "duration": round(self.duration, 6),
+            "test_results": self.results
+        }
+        if session['calls']:
+            # 不属于任何检查的调用，例如 task3 启动容器
+            final_results['calls'] = session['calls']
+
+        self.write_report(report_file_path, final_results)
+
+        print("--- SUBMISSION CREATED ---")
+        print(f"An encrypted submission file has been saved to {report_file_path}.")
+        print("Please submit this file.")
+
+    def write_report(self, report_file_path, final_results):
+        """Encrypts a report ('task', 'score', 'max_score', 'duration', 'test_results') into a file."""
+        with open(report_file_path, "w") as f:
+            f.write(encrypt_report(final_results, self.secret_key))
+
+    def load_cache(self):
+        """Reads the verdicts of the last run; a missing, stale or tampered cache is ignored."""
+        try:
+            with open(os.path.join(self.app_dir, CACHE_FILE_NAME), 'r') as f:
+                self.cache = decrypt_envelope(f.read(), self.secret_key)
+        except (OSError, ValueError):
+            self.cache = {}
+        self.use_cache = True
+
+    def save_cache(self):
+        """Saves the fingerprints of the checks that passed, for the next run."""
+        try:
+            with open(os.path.join(self.app_dir, CACHE_FILE_NAME), 'w') as f:
+                f.write(encrypt_report(self.cache, self.secret_key))
+        except OSError:
+            pass
+
+    def save_profile(self):
+        """Merges the profiles of the main thread and every check thread into one pstats file."""
+        profile_path = os.path.join(self.app_dir, f"{self.task_name}.pstats")
+        stats = pstats.Stats(self.profiles[0])
+        for profile in self.profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(profile_path)
+        print(f"Profile saved to {profile_path} (view it with: python3 -m pstats {profile_path})")
+
+    def main(self, body, argv=None, app_dir=None, add_arguments=None):
+        """
+        Command-line entry point of a task.
+
+        Parses --format, --fresh and --profile, loads the AES key and the cached verdicts
+        of the last run, runs body() (which runs the checks), then prints and saves the
+        report. If grade.py stops the task, the unfinished checks are recorded as timed
+        out before the report is saved.
+
+        Args:
+            body (callable): Runs the task's checks, usually through run_checks().
+            argv (list): Command-line arguments, defaults to sys.argv[1:].
+            app_dir (str): Directory of the task, where the report is saved and from which
+                etc/config is found (two levels up). Defaults to the executable's directory.
+            add_arguments (callable): Adds the task's own options to the parser; the
+                parsed arguments are available to body() as self.args.
+        """
+        parser = argparse.ArgumentParser(prog=self.task_name, description=f"Autograder for {self.task_name}.")
+        parser.add_argument("--format", choices=["text", "jsonl"], default="text",
+                            help="'jsonl' writes one JSON event per check to stdout and everything else to stderr.")
+        parser.add_argument("--fresh", action="store_true",
+                            help="Run every check again instead of reusing verdicts whose inputs are unchanged.")
+        parser.add_argument("--profile", action="store_true",
+                            help="Profile the grader and save the statistics to <task>.pstats next to the report.")
+        if add_arguments is not None:
+            add_arguments(parser)
+        args = self.args = parser.parse_args(argv)
+
+        original_stdout = sys.stdout
+        if args.format == "jsonl":
+            self.event_stream = sys.stdout
+            sys.stdout = sys.stderr
+        try:
+            self.app_dir = app_dir or os.path.dirname(os.path.realpath(sys.executable))
+            # --- SECRET KEY ---
+            # 从 etc/config 文件中加载密钥
+            try:
+                self.secret_key = load_secret_key(get_config_path(os.path.dirname(os.path.dirname(self.app_dir))))
+            except FileNotFoundError:
+                print("Error: 'etc/config' file not found. Please ensure it exists.")
+                sys.exit(1)
+            except Exception as e:
+                print(f"Error loading secret key: {e}")
+                sys.exit(1)
+
+            if not args.fresh:
+                self.load_cache()
+
+            signal.signal(signal.SIGTERM, handle_timeout)
+            timed_out = False
+            begin_session()
+            if args.profile:
+                self.profiles = [cProfile.Profile()]
+                self.profiles[0].enable()
+
+            try:
+                body()
+            except GradingTimeout:
+                timed_out = True
+                self.record_timed_out_checks()
+            finally:
+                if self.profiles:
+                    self.profiles[0].disable()
+            self.duration = time.monotonic() - session['start']
+
+            if not self.reports_saved:
+                self.print_final_report()
+                self.save_report()
+                self.save_cache()
+            if self.profiles:
+                self.save_profile()
+            self.emit_event("summary", score=self.score, max_score=self.max_score,
+                            duration=round(self.duration, 6), timed_out=timed_out)
+            if timed_out:
+                sys.exit(1)
+        finally:
+            sys.stdout = original_stdout
@@ -0,0 +1,351 @@
+import functools
+import http.client
+import json
+import os
+import socket
+import struct
+import subprocess
+import threading
+from urllib.parse import quote, urlencode
+
+from autograding.timing import timed
+
+DEFAULT_SOCKET_PATH = "/var/run/docker.sock"
+
+class DockerError(Exception):
+    """Raised when neither the Docker daemon nor the 'docker' command can be reached."""
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection to a unix socket, kept open between requests."""
+
+    def __init__(self, socket_path, timeout=60):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+def demultiplex(data):
+    """
+    Splits a Docker raw stream (used when the container has no TTY) into stdout and stderr.
+
+    Every frame starts with an 8-byte header: stream type (1 = stdout, 2 = stderr),
+    three zero bytes and the payload size as a big-endian uint32.
+    """
+    stdout, stderr = [], []
+    offset = 0
+    while offset + 8 <= len(data):
+        stream, size = struct.unpack('>BxxxI', data[offset:offset + 8])
+        payload = data[offset + 8:offset + 8 + size]
+        (stderr if stream == 2 else stdout).append(payload)
+        offset += 8 + size
+    return b''.join(stdout).decode('utf-8', 'replace'), b''.join(stderr).decode('utf-8', 'replace')
+
+class DockerClient:
+    """
+    Talks to the Docker Engine API over the daemon's unix socket.
+
+    Every thread keeps one HTTP connection open and reuses it, so the graders pay
+    neither a CLI start nor a new daemon connection per call.
+
+    Args:
+        socket_path (str): Path of the daemon socket.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH):
+        self.socket_path = socket_path
+        self.local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = UnixHTTPConnection(self.socket_path)
+        return connection
+
+    def request(self, method, path, body=None, query=None, headers=None):
+        """
+        Sends one request and returns (status, body bytes).
+
+        The body can be bytes, an open file (sent as is, with the given headers) or
+        any other value, which is sent as JSON.
+
+        Raises:
+            DockerError: If the socket cannot be reached.
+        """
+        if query:
+            path = f"{path}?{urlencode(query)}"
+        headers = dict(headers or {})
+        if body is not None and not isinstance(body, bytes) and not hasattr(body, 'read'):
+            body = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            connection = self._connection()
+            if hasattr(body, 'seek'):
+                body.seek(0)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                if response.will_close:
+                    connection.close()
+                return response.status, data
+            except (ConnectionError, http.client.HTTPException) as e:
+                # 守护进程关闭了空闲连接时重连一次
+                connection.close()
+                if attempt == 1:
+                    raise DockerError(f"Could not talk to the Docker daemon: {e}")
+            except OSError as e:
+                connection.close()
+                raise DockerError(f"Could not connect to {self.socket_path}: {e}")
+
+    def _json(self, method, path, body=None, query=None):
+        status, data = self.request(method, path, body, query)
+        return status, (json.loads(data) if data else None)
+
+    @timed('docker ping')
+    def ping(self):
+        """Returns True if the daemon answers."""
+        try:
+            status, _ = self.request('GET', '/_ping')
+        except DockerError:
+            return False
+        return status == 200
+
+    @timed('docker info')
+    def info(self):
+        """Returns the daemon's system information, or None if it cannot be read."""
+        try:
+            status, info = self._json('GET', '/info')
+        except DockerError:
+            return None
+        return info if status == 200 else None
+
+    @timed('docker inspect')
+    def inspect(self, container):
+        """Returns the container's details (as in 'docker inspect'), or None if it does not exist."""
+        status, details = self._json('GET', f"/containers/{quote(container)}/json")
+        return details if status == 200 else None
+
+    @timed('docker ps')
+    def list_containers(self, label=None):
+        """Returns the names of all containers (running or not), only those with the label if given."""
+        query = {"all": 1}
+        if label:
+            query['filters'] = json.dumps({"label": [label]})
+        status, containers = self._json('GET', '/containers/json', query=query)
+        if status != 200:
+            raise DockerError(f"Could not list containers (HTTP {status}).")
+        return [container['Names'][0].lstrip('/') for container in containers if container.get('Names')]
+
+    @timed('docker start')
+    def start(self, container):
+        """Starts the container; returns True if it is running afterwards."""
+        status, _ = self.request('POST', f"/containers/{quote(container)}/start")
+        # 304: 容器本来就在运行
+        return status in (204, 304)
+
+    @timed('docker exec')
+    def exec_run(self, container, command):
+        """
+        Runs a command inside a running container.
+
+        Returns:
+            tuple: (exit_code, stdout, stderr).
+        """
+        status, created = self._json('POST', f"/containers/{quote(container)}/exec", {
+            "AttachStdout": True, "AttachStderr": True, "Cmd": list(command)
+        })
+        if status != 201:
+            message = created.get('message', '') if created else ''
+            return 1, '', message or f"Could not create exec (HTTP {status})."
+        exec_id = created['Id']
+        _, data = self.request('POST', f"/exec/{exec_id}/start", {"Detach": False, "Tty": False})
+        stdout, stderr = demultiplex(data)
+        _, details = self._json('GET', f"/exec/{exec_id}/json")
+        return details.get('ExitCode', 1) if details else 1, stdout, stderr
+
+    @timed('docker run')
+    def run(self, image, command=None):
+        """
+        Creates a container from the image, waits for it and returns its output, like
+        'docker run --rm'. The image is pulled first if it is not present.
+
+        Returns:
+            tuple: (exit_code, stdout, stderr).
+        """
+        config = {"Image": image}
+        if command:
+            config["Cmd"] = list(command)
+        status, created = self._json('POST', '/containers/create', config)
+        if status == 404:
+            pull_error = self.pull(image)
+            if pull_error:
+                return 1, '', pull_error
+            status, created = self._json('POST', '/containers/create', config)
+        if status != 201:
+            return 1, '', created.get('message', '') if created else f"Could not create container (HTTP {status})."
+
+        container_id = created['Id']
+        try:
+            self.request('POST', f"/containers/{container_id}/start")
+            _, waited = self._json('POST', f"/containers/{container_id}/wait")
+            _, logs = self.request('GET', f"/containers/{container_id}/logs", query={"stdout": 1, "stderr": 1})
+            stdout, stderr = demultiplex(logs)
+            return waited.get('StatusCode', 1) if waited else 1, stdout, stderr
+        finally:
+            self.request('DELETE', f"/containers/{container_id}", query={"force": 1})
+
+    @timed('docker image inspect')
+    def image_exists(self, image):
+        """Returns True if the image is present locally."""
+        status, _ = self.request('GET', f"/images/{quote(image)}/json")
+        return status == 200
+
+    @timed('docker image inspect')
+    def image_id(self, image):
+        """Returns the ID of the local image (changes when it is pulled or loaded again), or None if it is absent."""
+        status, details = self._json('GET', f"/images/{quote(image)}/json")
+        return details.get('Id') if status == 200 and details else None
+
+    @timed('docker pull')
+    def pull(self, image):
+        """Pulls the image; returns None on success or the error message."""
+        name, _, tag = image.partition(':')
+        status, data = self.request('POST', '/images/create', query={"fromImage": name, "tag": tag or 'latest'})
+        if status != 200:
+            return f"Could not pull '{image}' (HTTP {status})."
+        return stream_error(data)
+
+    @timed('docker load')
+    def load_image(self, tarball_path):
+        """Loads images from a 'docker save' tarball; returns None on success or the error message."""
+        with open(tarball_path, 'rb') as tarball:
+            status, data = self.request('POST', '/images/load', body=tarball, query={"quiet": 1}, headers={
+                "Content-Type": "application/x-tar",
+                "Content-Length": str(os.path.getsize(tarball_path)),
+            })
+        if status != 200:
+            return f"Could not load '{tarball_path}' (HTTP {status})."
+        return stream_error(data)
+
+def stream_error(data):
+    """Returns the error reported in a JSON progress stream (pull, load), or None."""
+    for line in data.decode('utf-8', 'replace').splitlines():
+        try:
+            progress = json.loads(line)
+        except ValueError:
+            continue
+        if 'error' in progress:
+            return progress['error']
+    return None
+
+class DockerCli:
+    """
+    The same operations as DockerClient, through the 'docker' command.
+
+    Used when the daemon socket is not reachable (e.g. Docker Desktop with another
+    socket path, or a remote DOCKER_HOST).
+    """
+
+    def _run(self, args):
+        try:
+            return subprocess.run(['docker'] + args, capture_output=True, text=True)
+        except FileNotFoundError:
+            raise DockerError("'docker' command not found. Is Docker installed and in your PATH?")
+
+    @timed('docker ping')
+    def ping(self):
+        try:
+            return self._run(['info']).returncode == 0
+        except DockerError:
+            return False
+
+    @timed('docker info')
+    def info(self):
+        try:
+            process = self._run(['info', '--format', '{{json .}}'])
+        except DockerError:
+            return None
+        if process.returncode != 0:
+            return None
+        try:
+            return json.loads(process.stdout)
+        except ValueError:
+            return None
+
+    @timed('docker inspect')
+    def inspect(self, container):
+        process = self._run(['inspect', container])
+        if process.returncode != 0:
+            return None
+        return json.loads(process.stdout)[0]
+
+    @timed('docker ps')
+    def list_containers(self, label=None):
+        args = ['ps', '--all', '--format', '{{.Names}}']
+        if label:
+            args += ['--filter', f"label={label}"]
+        process = self._run(args)
+        if process.returncode != 0:
+            raise DockerError(f"Could not list containers: {process.stderr.strip()}")
+        return process.stdout.split()
+
+    @timed('docker start')
+    def start(self, container):
+        return self._run(['start', container]).returncode == 0
+
+    @timed('docker exec')
+    def exec_run(self, container, command):
+        process = self._run(['exec', container] + list(command))
+        return process.returncode, process.stdout, process.stderr
+
+    @timed('docker run')
+    def run(self, image, command=None):
+        process = self._run(['run', '--rm', image] + list(command or []))
+        return process.returncode, process.stdout, process.stderr
+
+    @timed('docker image inspect')
+    def image_exists(self, image):
+        return self._run(['image', 'inspect', image]).returncode == 0
+
+    @timed('docker image inspect')
+    def image_id(self, image):
+        process = self._run(['image', 'inspect', '--format', '{{.Id}}', image])
+        if process.returncode != 0:
+            return None
+        return process.stdout.strip() or None
+
+    @timed('docker pull')
+    def pull(self, image):
+        process = self._run(['pull', image])
+        return None if process.returncode == 0 else process.stderr.strip()
+
+    @timed('docker load')
+    def load_image(self, tarball_path):
+        process = self._run(['load', '-i', tarball_path])
+        return None if process.returncode == 0 else process.stderr.strip()
+
+def get_socket_path():
+    """Returns the daemon socket path, honouring DOCKER_HOST=unix://..."""
+    docker_host = os.environ.get('DOCKER_HOST', '')
+    if docker_host.startswith('unix://'):
+        return docker_host[len('unix://'):]
+    if docker_host:
+        return None
+    return DEFAULT_SOCKET_PATH
+
+@functools.lru_cache(maxsize=None)
+def get_docker():
+    """
+    Returns the client shared by the whole grading session: a DockerClient if the
+    daemon socket answers, otherwise a DockerCli.
+    """
+    socket_path = get_socket_path()
+    if socket_path and os.path.exists(socket_path):
+        client = DockerClient(socket_path)
+        if client.ping():
+            return client
+    return DockerCli()
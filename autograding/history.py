@@ -0,0 +1,161 @@
+import hashlib
+import socket
+import sqlite3
+import statistics
+import time
+
+HISTORY_FILE_NAME = "grading_history.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    build TEXT NOT NULL,
+    host TEXT NOT NULL,
+    mode TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS task_timings (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    task TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS check_timings (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    task TEXT NOT NULL,
+    check_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_host ON runs(host, build);
+CREATE INDEX IF NOT EXISTS task_timings_by_run ON task_timings(run_id);
+CREATE INDEX IF NOT EXISTS check_timings_by_run ON check_timings(run_id);
+"""
+
+# 只有真正运行过的检查才参与比较；沿用缓存、被跳过或超时的检查耗时没有意义
+TIMED_STATUSES = ('passed', 'failed')
+
+def get_build_hash(paths):
+    """Returns a short digest of the given files (the grader build), in order."""
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        except OSError:
+            digest.update(f"missing:{path}".encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+def check_status(result):
+    """Classifies a test_results entry: 'passed', 'failed', 'skipped', 'cached' or 'timed_out'."""
+    for status in ('timed_out', 'skipped', 'cached'):
+        if result.get(status):
+            return status
+    return 'passed' if result.get('passed') else 'failed'
+
+def check_key(name):
+    """Name under which a check is tracked; e.g. 'Quiz (6/15 correct)' is tracked as 'Quiz'."""
+    return name.split(' (')[0]
+
+def open_history(path):
+    """Opens (and if needed creates) the history database."""
+    connection = sqlite3.connect(path, timeout=5)
+    connection.executescript(SCHEMA)
+    return connection
+
+def record_run(path, build, mode, tasks, host=None):
+    """
+    Appends the timings of one grade run to the history.
+
+    Args:
+        path (str): Path of the SQLite database.
+        build (str): Build hash, from get_build_hash().
+        mode (str): 'in-process', 'bundled' or 'exec'.
+        tasks (list): One dict per task with 'task', 'status', 'duration' and
+            'checks' (test_results entries carrying 'name' and 'duration').
+        host (str): Host name, defaults to this machine's.
+    """
+    connection = open_history(path)
+    try:
+        with connection:
+            cursor = connection.execute(
+                "INSERT INTO runs (started_at, build, host, mode) VALUES (?, ?, ?, ?)",
+                (time.strftime('%Y-%m-%dT%H:%M:%S'), build, host or socket.gethostname(), mode)
+            )
+            run_id = cursor.lastrowid
+            connection.executemany(
+                "INSERT INTO task_timings (run_id, task, status, duration) VALUES (?, ?, ?, ?)",
+                [(run_id, task['task'], task['status'], task['duration']) for task in tasks]
+            )
+            connection.executemany(
+                "INSERT INTO check_timings (run_id, task, check_name, status, duration) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, task['task'], check_key(result['name']), check_status(result), result.get('duration', 0.0))
+                 for task in tasks for result in task['checks']]
+            )
+        return run_id
+    finally:
+        connection.close()
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def load_durations(connection, run_ids):
+    """
+    Returns {(task, check): [durations]} for the given runs.
+
+    The total time of every task is included under the check name '(task total)'.
+    """
+    durations = {}
+    if not run_ids:
+        return durations
+    placeholders = ', '.join('?' * len(run_ids))
+    for task, duration in connection.execute(
+            f"SELECT task, duration FROM task_timings WHERE run_id IN ({placeholders}) AND status = 'ok'", run_ids):
+        durations.setdefault((task, '(task total)'), []).append(duration)
+    for task, check_name, duration in connection.execute(
+            f"SELECT task, check_name, duration FROM check_timings WHERE run_id IN ({placeholders}) "
+            f"AND status IN ({', '.join('?' * len(TIMED_STATUSES))})", run_ids + list(TIMED_STATUSES)):
+        durations.setdefault((task, check_name), []).append(duration)
+    return durations
+
+def compare_latest(connection, host, baseline_runs=20, threshold=0.2, min_delta=0.005, latest_runs=5):
+    """
+    Compares the latest build on a host against a rolling baseline of earlier builds.
+
+    The latest build's most recent `latest_runs` runs are compared with the
+    `baseline_runs` most recent runs of any other build on the same host. A check
+    regressed if its median or p95 grew by more than `threshold` (relative) and
+    by more than `min_delta` seconds.
+
+    Returns:
+        tuple: (build, rows), rows being one dict per task/check seen in both
+        samples, with the medians, p95s and a 'regressed' flag. build is None if
+        the host has no runs.
+    """
+    latest = connection.execute("SELECT build FROM runs WHERE host = ? ORDER BY id DESC LIMIT 1", (host,)).fetchone()
+    if latest is None:
+        return None, []
+    build = latest[0]
+    current_ids = [row[0] for row in connection.execute(
+        "SELECT id FROM runs WHERE host = ? AND build = ? ORDER BY id DESC LIMIT ?", (host, build, latest_runs))]
+    baseline_ids = [row[0] for row in connection.execute(
+        "SELECT id FROM runs WHERE host = ? AND build != ? ORDER BY id DESC LIMIT ?", (host, build, baseline_runs))]
+
+    current = load_durations(connection, current_ids)
+    baseline = load_durations(connection, baseline_ids)
+    rows = []
+    for key in sorted(set(current) & set(baseline)):
+        row = {
+            "task": key[0], "check": key[1],
+            "runs": len(current[key]), "baseline_runs": len(baseline[key]),
+            "median": statistics.median(current[key]), "baseline_median": statistics.median(baseline[key]),
+            "p95": percentile(current[key], 0.95), "baseline_p95": percentile(baseline[key], 0.95),
+        }
+        row['regressed'] = any(
+            row[stat] > row[f"baseline_{stat}"] * (1 + threshold) and row[stat] - row[f"baseline_{stat}"] > min_delta
+            for stat in ('median', 'p95')
+        )
+        rows.append(row)
+    return build, rows
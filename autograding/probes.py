@@ -0,0 +1,70 @@
+import functools
+import os
+import shutil
+import subprocess
+
+from autograding.timing import timed
+
+# 每个探测的结果在整个评测会话内缓存：grade 在同一进程中依次运行各任务时，
+# 相同的事实 (PATH 查找、用户组、文件内容) 只探测一次
+
+@functools.lru_cache(maxsize=None)
+def which(command):
+    """Returns the full path of an executable on PATH, like 'which', without starting a process."""
+    return shutil.which(command)
+
+@functools.lru_cache(maxsize=None)
+def user_groups():
+    """Returns the names of the current process's groups, like 'groups', without starting a process."""
+    import grp  # 仅 Unix 可用，task1 需要在 Windows 上也能启动
+    names = set()
+    for gid in set(os.getgroups()) | {os.getegid()}:
+        try:
+            names.add(grp.getgrgid(gid).gr_name)
+        except KeyError:
+            names.add(str(gid))
+    return frozenset(names)
+
+@functools.lru_cache(maxsize=None)
+def read_file(path):
+    """Returns the text of a file, or None if it cannot be read."""
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except OSError:
+        return None
+
+@functools.lru_cache(maxsize=None)
+def command_output(command):
+    """
+    Runs a command and returns its stdout, or None if it is missing or fails.
+
+    Only for facts that cannot be read in-process (e.g. 'git --version'). A missing
+    executable is detected with which(), so no process is started for it.
+
+    Args:
+        command (tuple): The command and its arguments.
+    """
+    if which(command[0]) is None:
+        return None
+    try:
+        with timed(' '.join(command)):
+            return subprocess.check_output(list(command), text=True, stderr=subprocess.DEVNULL)
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+def binary_fingerprint(command):
+    """
+    Returns [path, size, mtime] of an executable on PATH, or None if it is missing.
+
+    Used as the fingerprint of checks that only depend on a binary being installed,
+    so their verdict is reused until the binary is replaced or moved.
+    """
+    path = which(command)
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [path, stat.st_size, stat.st_mtime_ns]
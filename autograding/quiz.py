@@ -0,0 +1,217 @@
+import base64
+import hashlib
+import json
+import struct
+
+def question_id(question_text):
+    """Stable identifier of a quiz question, derived from its text (so it survives reordering the bank)."""
+    return hashlib.sha256(question_text.strip().encode('utf-8')).hexdigest()[:8]
+
+def encode_mask(correct):
+    """
+    Packs which questions were answered correctly into a hex string.
+
+    Bit i (least significant first) is set if the i-th question asked was answered
+    correctly; e.g. [True, False, True] becomes '5'.
+    """
+    mask = 0
+    for index, is_correct in enumerate(correct):
+        if is_correct:
+            mask |= 1 << index
+    return format(mask, 'x')
+
+def decode_mask(mask, count):
+    """Unpacks a mask from encode_mask() into `count` booleans."""
+    value = int(mask, 16)
+    return [bool(value >> index & 1) for index in range(count)]
+
+# build_quiz.py 生成的题库模块格式：每道题是一条独立的 Base64 JSON 记录，INDEX 为偏移表，
+# TAGS 与 TAG_POSITIONS 按标签列出题目的位置
+BANK_FORMAT = 3
+OPTION_LETTERS = 'ABCDEFGH'
+
+class QuizBank:
+    """
+    The questions of a quiz_data module generated by build_quiz.py.
+
+    Questions are decoded one at a time, when they are accessed: importing the
+    module and creating the bank cost the same for 15 questions or 50,000.
+    """
+
+    def __init__(self, module):
+        if getattr(module, 'FORMAT', None) != BANK_FORMAT:
+            raise ValueError("quiz_data was generated by an older build_quiz.py, please rebuild it")
+        self.bank_id = module.BANK_ID
+        self.index = module.INDEX
+        self.records = memoryview(module.RECORDS)
+        self.count = module.COUNT
+        # 标签 -> (在 TAG_POSITIONS 中的起点, 题目数)；没有标签的题目归入 ''
+        self.tags = module.TAGS
+        self.tag_positions = module.TAG_POSITIONS
+
+    def tag_position(self, tag, index):
+        """Position in the bank of the index-th question with the tag."""
+        start, count = self.tags[tag]
+        if not 0 <= index < count:
+            raise IndexError(index)
+        return struct.unpack_from('<I', self.tag_positions, 4 * (start + index))[0]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.count:
+            raise IndexError(position)
+        start, end = struct.unpack_from('<2I', self.index, 4 * position)
+        return json.loads(base64.b64decode(self.records[start:end]))
+
+    def __iter__(self):
+        for position in range(self.count):
+            yield self[position]
+
+def derive_seed(task_name, student):
+    """The quiz seed of a student: the same student always gets the same quiz."""
+    return hashlib.sha256(f"{task_name}:{student}".encode('utf-8')).hexdigest()[:16]
+
+class SeededStream:
+    """
+    Deterministic random numbers derived from a seed with SHA-256.
+
+    Unlike random.Random, the sequence does not depend on the Python version, so a
+    quiz drawn by a packed grader can be drawn again by the decrypt tooling.
+    """
+
+    def __init__(self, seed, purpose):
+        self.prefix = f"{seed}:{purpose}:".encode('utf-8')
+        self.counter = 0
+
+    def below(self, bound):
+        digest = hashlib.sha256(self.prefix + str(self.counter).encode('ascii')).digest()
+        self.counter += 1
+        return int.from_bytes(digest[:8], 'big') % bound
+
+    def choose(self, population, count):
+        """Returns `count` distinct numbers below `population` (Floyd's algorithm: O(count), not O(population))."""
+        chosen = []
+        seen = set()
+        for upper in range(population - count, population):
+            candidate = self.below(upper + 1)
+            if candidate in seen:
+                candidate = upper
+            seen.add(candidate)
+            chosen.append(candidate)
+        return chosen
+
+    def shuffle(self, items):
+        for index in range(len(items) - 1, 0, -1):
+            other = self.below(index + 1)
+            items[index], items[other] = items[other], items[index]
+        return items
+
+def allocate(sizes, count):
+    """
+    Splits `count` questions over the tags in proportion to their sizes (largest
+    remainder, ties broken by tag name), never more than a tag has.
+    """
+    total = sum(sizes.values())
+    count = min(count, total)
+    if not total:
+        return {}
+    quotas = {tag: count * size // total for tag, size in sizes.items()}
+    remaining = count - sum(quotas.values())
+    by_remainder = sorted(sizes, key=lambda tag: (-(count * sizes[tag] % total), tag))
+    for tag in by_remainder[:remaining]:
+        quotas[tag] += 1
+    return quotas
+
+def sample_quiz(bank, seed, count):
+    """
+    Draws `count` question positions from the bank, stratified by tag, in a shuffled order.
+
+    Only the selected positions are touched, so the cost is O(count + number of tags)
+    whatever the size of the bank.
+    """
+    stream = SeededStream(seed, 'questions')
+    quotas = allocate({tag: size for tag, (_, size) in bank.tags.items()}, count)
+    positions = []
+    for tag in sorted(quotas):
+        positions.extend(bank.tag_position(tag, index) for index in stream.choose(bank.tags[tag][1], quotas[tag]))
+    return stream.shuffle(positions)
+
+def present_question(question, seed):
+    """
+    Shuffles the options of a question for this seed.
+
+    Returns:
+        tuple: (options as {letter shown: text}, the letter shown for the correct answer).
+    """
+    letters = sorted(question['options'])
+    order = SeededStream(seed, f"options:{question['id']}").shuffle(list(letters))
+    options = {OPTION_LETTERS[index]: question['options'][letter] for index, letter in enumerate(order)}
+    return options, OPTION_LETTERS[order.index(question['answer'])]
+
+def answer_key(bank, seed, count, decoded=None):
+    """
+    Draws the quiz of a seed.
+
+    Args:
+        decoded (dict): Questions already decoded, by position. Pass the same dict when
+            scoring many students so every question is decoded once per batch.
+
+    Returns:
+        tuple: (questions drawn, and for each its (options shown, letter of the correct answer)).
+    """
+    if decoded is None:
+        decoded = {}
+    questions = []
+    for position in sample_quiz(bank, seed, count):
+        question = decoded.get(position)
+        if question is None:
+            question = decoded[position] = bank[position]
+        questions.append(question)
+    return questions, [present_question(question, seed) for question in questions]
+
+def parse_answers(text):
+    """Reads answers written as 'B D A C', 'B,D,A,C' or 'BDAC' (one letter per question) into 'BDAC'."""
+    return ''.join(text.replace(',', ' ').split()).upper()
+
+def check_answers(answers, key):
+    """Returns why the answers cannot be scored against the key of answer_key(), or None."""
+    if len(answers) != len(key):
+        return f"expected {len(key)} answers, got {len(answers)}"
+    for number, (answer, (options, _)) in enumerate(zip(answers, key), 1):
+        if answer not in options:
+            return f"answer {number} is '{answer}', expected one of {'/'.join(options)}"
+    return None
+
+def score_answers(answers, key):
+    """Which answers are correct, one boolean per question."""
+    return [answer == correct_letter for answer, (_, correct_letter) in zip(answers, key)]
+
+def verify_quiz(bank, result):
+    """
+    Draws a report's quiz again from its seed and checks the recorded results.
+
+    Args:
+        bank (QuizBank): The bank the quiz was drawn from.
+        result (dict): The report's quiz entry, with 'seed', 'question_ids',
+            'answers' and 'correct_mask'.
+
+    Returns:
+        list: Problems found; empty if the quiz matches the bank.
+    """
+    problems = []
+    if result.get('bank_id') != bank.bank_id:
+        problems.append(f"the quiz was drawn from another bank ({result.get('bank_id')}, not {bank.bank_id})")
+        return problems
+    question_ids = result['question_ids']
+    questions, key = answer_key(bank, result['seed'], len(question_ids))
+    if [question['id'] for question in questions] != question_ids:
+        problems.append("the questions differ from the ones drawn for this seed")
+        return problems
+    correct = score_answers(result['answers'], key)
+    if len(result['answers']) != len(questions) or encode_mask(correct) != result['correct_mask']:
+        problems.append("the recorded answers do not match the correct_mask")
+    elif f"({sum(correct)}/{len(questions)} correct)" not in result['name']:
+        problems.append("the number of correct answers does not match the answers")
+    return problems
@@ -0,0 +1,47 @@
+import contextlib
+import threading
+import time
+
+# 正在运行的检查记录计时的位置，每个检查线程各自一份 (由 Grader 设置)
+current_check = threading.local()
+
+# 当前评测会话的起点，以及不属于任何检查的调用 (例如 task3 启动容器)
+session = {"start": time.monotonic(), "calls": []}
+
+def begin_session():
+    """Starts a new grading session: offsets are measured from now on."""
+    session['start'] = time.monotonic()
+    session['calls'] = []
+
+def since_session_start(moment):
+    """Converts a time.monotonic() value into seconds since the session started."""
+    return round(moment - session['start'], 6)
+
+def record_timing(label, seconds):
+    """
+    Adds a named duration (in seconds) to the result of the check running in this thread.
+
+    The timings are stored under 'timings' in the check's result, e.g. to report
+    how long an image load took apart from the container run.
+    """
+    timings = getattr(current_check, 'timings', None)
+    if timings is not None:
+        timings[label] = round(timings.get(label, 0.0) + seconds, 6)
+
+@contextlib.contextmanager
+def timed(label):
+    """
+    Records how long the block (or the decorated function) took as one call.
+
+    The call is added to the 'calls' of the check running in this thread, or to
+    the session's calls if no check is running.
+    """
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        calls = getattr(current_check, 'calls', None)
+        if calls is None:
+            calls = session['calls']
+        calls.append({"call": label, "start": since_session_start(start),
+                      "duration": round(time.monotonic() - start, 6)})
@@ -1,77 +1,574 @@
 import sys
+import json
 import subprocess
 import os
+import signal
+import threading
+import time
+import argparse
+import contextlib
+import glob
+import importlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 
 # 定义所有任务的列表，你可以根据需要在这里添加或删除任务。
-ALL_TASKS = ['task1']
+ALL_TASKS = ['task1', 'task2', 'task3']
 
-def run_task_grader(task_name):
+# 共享模块 autograding/ 位于项目根目录；任务模块位于 tasks/taskN/ 下，
+# 使用 util/pack_grade.sh 打包时它们都会被打进同一个 grade 可执行文件
+GRADE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(GRADE_DIR))
+for _task_name in ALL_TASKS:
+    sys.path.insert(0, os.path.join(GRADE_DIR, _task_name))
+
+from autograding.history import HISTORY_FILE_NAME, get_build_hash, record_run
+
+# 需要学生在终端作答的任务 (例如 task3 的选择题) 不能放进并发池中捕获输出，
+# 它们会按顺序在前台运行，直接使用当前终端的输入输出。
+INTERACTIVE_TASKS = {'task3'}
+
+# grade 以 "grade --run-task taskN [任务参数]" 在单独的进程中运行自身打包的任务 (设置了时间限制时)
+RUN_TASK_OPTION = '--run-task'
+
+# 超时后先发送 SIGTERM，让任务记录未完成的检查并保存报告；宽限期过后仍未退出则强制结束
+KILL_GRACE_SECONDS = 5
+
+# 使用 --format jsonl 时，结构化事件写入原始 stdout，面向人的输出改写到 stderr
+event_stream = None
+
+# 传给每个任务的参数，例如 --format jsonl、--fresh 与 --profile
+task_options = []
+
+# 每次运行的任务与检查耗时追加到这个 SQLite 数据库中；使用 --no-history 时为 None
+history_path = None
+
+USAGE = """Usage: ./grade [-j N] [--exec] [--fresh] [--profile] [--no-history] [--timeout SEC] [--deadline SEC] [--format text|jsonl] [-a | task_name1 task_name2 ...]
+Example: ./grade task1 task3
+To run all tasks: ./grade -a
+To run up to 3 tasks at the same time: ./grade -j 3 -a
+To stop any task after 60s and the whole run after 300s: ./grade --timeout 60 --deadline 300 -a
+To print one JSON event per check instead of the report text: ./grade --format jsonl -a
+To run the separate task executables even if the tasks are bundled into grade: ./grade --exec -a
+To run every check again instead of reusing the verdicts of the last run: ./grade --fresh -a
+To save a cProfile dump (tasks/taskN/taskN.pstats) for every task: ./grade --profile -a
+To not record the timings of this run in grading_history.db: ./grade --no-history -a"""
+
+def emit_event(event, **fields):
+    """Writes one JSON event line when running with --format jsonl."""
+    if event_stream is None:
+        return
+    event_stream.write(json.dumps({"event": event, **fields}, ensure_ascii=False) + "\n")
+    event_stream.flush()
+
+class TaskRun:
+    """
+    Output and final status of one task executable.
+
+    The worker running the task appends output lines as they are produced, while the
+    main thread prints them, so a task's output is shown live once it is its turn.
+    Event lines are the task's JSON events: grade reads the checks and the summary
+    from them, and with --format jsonl passes them through unchanged. Other lines are
+    printed (to stderr with --format jsonl).
+    """
+
+    def __init__(self, task_name):
+        self.task_name = task_name
+        self.lines = []
+        # None while running, then one of 'ok', 'failed' or 'timeout'
+        self.status = None
+        self.duration = 0.0
+        # The task's own 'summary' event, if it got far enough to emit one
+        self.summary = None
+        # The task's test_results entries (with their durations): from the grader of an
+        # in-process task, or from the 'check' events of a task executable
+        self.checks = []
+        self.condition = threading.Condition()
+
+    def add_line(self, line, event=False):
+        with self.condition:
+            self.lines.append((line, event))
+            self.condition.notify_all()
+
+    def finish(self, status):
+        with self.condition:
+            self.status = status
+            self.condition.notify_all()
+
+    def stream(self):
+        """Prints the task's output as it arrives and returns the final status."""
+        printed = 0
+        while True:
+            with self.condition:
+                while printed == len(self.lines) and self.status is None:
+                    self.condition.wait()
+                new_lines = self.lines[printed:]
+                printed = len(self.lines)
+                status = self.status
+            for line, event in new_lines:
+                self.write(line, event)
+            if status is not None:
+                emit_event("task", task=self.task_name, status=status, duration=round(self.duration, 6))
+                return status
+
+    def write(self, line, event=False):
+        parsed = None
+        if event:
+            try:
+                parsed = json.loads(line)
+            except ValueError:
+                pass
+        if not isinstance(parsed, dict):
+            print(line, end='', flush=True)
+            return
+        if parsed.get('event') == 'summary':
+            self.summary = parsed
+        elif parsed.get('event') == 'check':
+            self.checks.append(parsed)
+        if event_stream is not None:
+            event_stream.write(json.dumps(parsed, ensure_ascii=False) + "\n")
+            event_stream.flush()
+
+class EventWriter:
+    """File-like object that hands every complete line written to it to a TaskRun."""
+
+    def __init__(self, run):
+        self.run = run
+        self.buffer = ''
+
+    def write(self, text):
+        self.buffer += text
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n', 1)
+            self.run.write(line + '\n', event=True)
+        return len(text)
+
+    def flush(self):
+        pass
+
+def load_task_registry():
     """
-    Runs the specific task's grading script.
-    
+    Imports the task modules that can run inside this process.
+
+    Returns:
+        dict: Maps task names to modules exposing main(argv, app_dir). Tasks whose
+        module (or one of its dependencies) cannot be imported are left out.
+    """
+    registry = {}
+    for task_name in ALL_TASKS:
+        try:
+            module = importlib.import_module(task_name)
+        except ImportError:
+            continue
+        # 没有打包任务模块时，tasks/taskN 目录可能被当作命名空间包导入
+        if hasattr(module, 'main'):
+            registry[task_name] = module
+    return registry
+
+def get_task_dir(task_name):
+    """
+    Returns the task's directory, where its executable and report live.
+
     Args:
         task_name (str): The name of the task (e.g., 'task1').
     """
     # Get the directory where this script is located
     # This is reliable even when packed with PyInstaller
     grade_script_dir = os.path.dirname(os.path.realpath(sys.executable))
-    
-    # Construct the path to the specific task's executable
+    return os.path.join(grade_script_dir, task_name)
+
+def get_task_path(task_name):
+    """
+    Returns the path of the task's executable.
+
+    Args:
+        task_name (str): The name of the task (e.g., 'task1').
+    """
     # Assumes task executables are structured as: tasks/taskN/taskN
-    task_script_path = os.path.join(grade_script_dir, task_name, task_name)
-    
-    # Check if the task executable exists
-    if not os.path.exists(task_script_path):
-        print(f"Error: Task executable not found for '{task_name}'.")
-        print(f"Expected path: {task_script_path}")
-        sys.exit(1)
-    
+    return os.path.join(get_task_dir(task_name), task_name)
+
+def get_task_command(task_name, bundled=False):
+    """
+    Returns the command that runs a task: its executable, or with bundled=True this
+    grade (the binary, or python with this script) running the task it bundles.
+    """
+    if not bundled:
+        return [get_task_path(task_name)]
+    grade_command = [sys.executable] if getattr(sys, 'frozen', False) else [sys.executable, os.path.abspath(__file__)]
+    return grade_command + [RUN_TASK_OPTION, task_name]
+
+def get_time_limit(timeout, deadline):
+    """
+    Returns how many seconds a task may still run, or None if there is no limit.
+
+    Args:
+        timeout (float): Per-task timeout in seconds, or None.
+        deadline (float): Absolute time.monotonic() value when the whole run must end, or None.
+    """
+    limits = []
+    if timeout is not None:
+        limits.append(timeout)
+    if deadline is not None:
+        limits.append(deadline - time.monotonic())
+    return min(limits) if limits else None
+
+def stop_process(process, whole_group=True):
+    """
+    Asks the task to stop with SIGTERM, then kills it after a grace period.
+
+    Args:
+        process (subprocess.Popen): The task process.
+        whole_group (bool): Also stop every command the task started (its process group).
+    """
+    send_signal = (lambda sig: os.killpg(process.pid, sig)) if whole_group else process.send_signal
+    try:
+        send_signal(signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        process.wait(timeout=KILL_GRACE_SECONDS)
+    except subprocess.TimeoutExpired:
+        pass
+    # 同一进程组中可能还有残留的 docker 子进程
+    if whole_group or process.returncode is None:
+        try:
+            send_signal(signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    process.wait()
+
+def pump_output(stream, run, events=False):
+    for line in stream:
+        run.add_line(line, events)
+    stream.close()
+
+def run_task_grader(run, timeout=None, deadline=None, bundled=False):
+    """
+    Runs the specific task's grading script, collecting its output line by line.
+
+    The task always runs with --format jsonl, so its check events (and their timings,
+    for the history) are read from its stdout, while its report text arrives on stderr.
+    Non-interactive tasks run in their own process group so that, on timeout, the task
+    and every command it started (e.g. a hung 'docker run') can be stopped together.
+    Interactive tasks keep the terminal: their report text is not captured, and only
+    the task itself is stopped on timeout.
+
+    Args:
+        run (TaskRun): Receives the task's output and final status.
+        timeout (float): Per-task timeout in seconds, or None.
+        deadline (float): Absolute time.monotonic() deadline of the whole run, or None.
+        bundled (bool): Run the task bundled into grade instead of its executable
+            (see get_task_command).
+    """
+    task_name = run.task_name
+    interactive = task_name in INTERACTIVE_TASKS
+    time_limit = get_time_limit(timeout, deadline)
+    if time_limit is not None and time_limit <= 0:
+        run.add_line(f"✗ Skipping {task_name}: the overall time budget has been used up.\n")
+        run.finish('timeout')
+        return
+
+    command = get_task_command(task_name, bundled) + task_options
+    if event_stream is None:
+        # 文本模式下同样读取任务的事件 (用于记录每项检查的耗时)，面向人的输出在 stderr 上照常显示
+        command += ['--format', 'jsonl']
+    # 文本模式下非交互式任务的输出需要捕获，以便按任务顺序整块显示，交互式任务的输出直接写到
+    # grade 的 stdout；jsonl 模式下 grade 的 stdout 只有事件，任务的输出直接显示在 stderr 上
+    capture_text = event_stream is None and not interactive
+    if capture_text:
+        text_output = subprocess.PIPE
+    elif event_stream is None:
+        text_output = sys.stdout
+    else:
+        text_output = None
+    start = time.monotonic()
     try:
-        # Execute the task executable and capture its output
-        result = subprocess.run(
-            [task_script_path],
-            capture_output=True,
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=text_output,
             text=True,
-            check=True
+            bufsize=1,
+            start_new_session=not interactive
         )
-        print(result.stdout)
-    except subprocess.CalledProcessError as e:
-        print(f"An error occurred while running the grader for {task_name}:")
-        print(e.stderr)
+    except OSError as e:
+        run.add_line(f"An error occurred while running the grader for {task_name}: {e}\n")
+        run.finish('failed')
+        return
+
+    readers = [threading.Thread(target=pump_output, args=(process.stdout, run, True), daemon=True)]
+    if capture_text:
+        readers.append(threading.Thread(target=pump_output, args=(process.stderr, run), daemon=True))
+    for reader in readers:
+        reader.start()
+    try:
+        process.wait(timeout=time_limit)
+        status = 'ok' if process.returncode == 0 else 'failed'
+    except subprocess.TimeoutExpired:
+        stop_process(process, whole_group=not interactive)
+        status = 'timeout'
+    for reader in readers:
+        reader.join()
+    run.duration = time.monotonic() - start
+
+    if status == 'timeout':
+        run.add_line(f"✗ {task_name} timed out after {time_limit:.0f}s. Unfinished checks were recorded as timed out.\n")
+    elif status == 'failed':
+        run.add_line(f"An error occurred while running the grader for {task_name} (exit code {process.returncode}).\n")
+    run.finish(status)
+
+def run_task_in_process(run, module):
+    """
+    Runs a task module's main() inside this process.
+
+    Only used without a time limit: a timeout could interrupt the task's main thread,
+    but not its check threads or the commands they started (see dispatch()).
+
+    Args:
+        run (TaskRun): Receives the task's JSONL events and final status.
+        module (module): The task module, from load_task_registry().
+    """
+    # 只有任务被打包进 grade 时才会用到 (需要加密库)
+    from autograding.core import GradingTimeout
+
+    task_name = run.task_name
+    argv = list(task_options)
+    # 任务会修改 SIGTERM 的处理方式，结束后恢复
+    previous_sigterm = signal.getsignal(signal.SIGTERM)
+    start = time.monotonic()
+    try:
+        stdout = EventWriter(run) if event_stream is not None else sys.stdout
+        with contextlib.redirect_stdout(stdout):
+            module.main(argv, get_task_dir(task_name))
+        status = 'ok'
+    except SystemExit as e:
+        status = 'ok' if e.code in (None, 0) else 'failed'
+    except GradingTimeout:
+        # grade 自身在任务保存报告时收到了 SIGTERM
+        status = 'timeout'
+    finally:
+        signal.signal(signal.SIGTERM, previous_sigterm)
+    run.duration = time.monotonic() - start
+    grader = getattr(module, 'grader', None)
+    if grader is not None and not run.checks:
+        run.checks = list(grader.results)
+
+    if status == 'timeout':
+        run.add_line(f"✗ {task_name} was stopped before it finished.\n")
+    elif status == 'failed':
+        run.add_line(f"An error occurred while running the grader for {task_name}.\n")
+    run.finish(status)
+
+def get_build_files(task_names, mode):
+    """Returns the files that make up the grader build, for the history's build hash."""
+    if getattr(sys, 'frozen', False):
+        files = [sys.executable]
+        if mode == 'exec':
+            files += [get_task_path(task_name) for task_name in task_names]
+        return files
+    project_root = os.path.dirname(GRADE_DIR)
+    return ([os.path.abspath(__file__)]
+            + sorted(glob.glob(os.path.join(project_root, 'autograding', '*.py')))
+            + [os.path.join(GRADE_DIR, task_name, f"{task_name}.py") for task_name in task_names])
+
+def save_history(runs, mode):
+    """Appends the task and check timings of this run to the history database."""
+    tasks = [{"task": task_name, "status": run.status, "duration": run.duration, "checks": run.checks}
+             for task_name, run in runs.items()]
+    try:
+        record_run(history_path, get_build_hash(get_build_files(list(runs), mode)), mode, tasks)
+    except (sqlite3.Error, OSError) as e:
+        # 记录失败不影响评测结果
+        print(f"Note: could not record timings in {history_path}: {e}")
+
+def finish_session(runs, session_start, mode):
+    """
+    Emits the final 'session' event (with --format jsonl) summing up the scores of all
+    tasks, and appends the timings of this run to the history.
+
+    Args:
+        runs (dict): Maps task names to their TaskRun.
+        session_start (float): time.monotonic() when grading started.
+        mode (str): 'in-process', 'bundled' (bundled tasks in their own processes) or 'exec'.
+
+    Returns:
+        int: 0 if every task succeeded, 1 otherwise.
+    """
+    if history_path is not None:
+        save_history(runs, mode)
+    summaries = [run.summary for run in runs.values() if run.summary is not None]
+    emit_event(
+        "session",
+        tasks={task_name: run.status for task_name, run in runs.items()},
+        score=sum(summary.get('score', 0) for summary in summaries),
+        max_score=sum(summary.get('max_score', 0) for summary in summaries),
+        duration=round(time.monotonic() - session_start, 6)
+    )
+    return 0 if all(run.status == 'ok' for run in runs.values()) else 1
+
+def run_tasks_in_process(task_names, registry):
+    """
+    Runs the given tasks one after another inside this process.
+
+    This is what the single grade binary does: the interpreter, the crypto library
+    and the AES key are loaded once for the whole session instead of once per task.
+
+    Returns:
+        int: 0 if every task succeeded, 1 otherwise.
+    """
+    session_start = time.monotonic()
+    runs = {task_name: TaskRun(task_name) for task_name in task_names}
+    for task_name in task_names:
+        run_task_in_process(runs[task_name], registry[task_name])
+        runs[task_name].stream()
+        print()
+    return finish_session(runs, session_start, 'in-process')
+
+def run_tasks(task_names, jobs=1, timeout=None, deadline=None, bundled=False):
+    """
+    Runs the given tasks with at most `jobs` task executables in flight.
+
+    Output of each task is printed as one block, in the order the tasks were given,
+    no matter which task finishes first. The task whose turn it is streams its
+    output live; the others are buffered until then.
+
+    Args:
+        task_names (list): Tasks to run, in the order their output is printed.
+        jobs (int): Maximum number of tasks running at the same time.
+        timeout (float): Per-task timeout in seconds, or None.
+        deadline (float): Absolute time.monotonic() deadline of the whole run, or None.
+        bundled (bool): Run the tasks bundled into grade, each in a process of its own,
+            instead of the task executables.
+
+    Returns:
+        int: 0 if every task succeeded, 1 otherwise.
+
+    With --format jsonl, a final 'session' event sums up the scores of all tasks.
+    """
+    # 先检查所有可执行文件是否存在，避免跑了一半才发现缺少某个任务
+    for task_name in [] if bundled else task_names:
+        task_script_path = get_task_path(task_name)
+        if not os.path.exists(task_script_path):
+            print(f"Error: Task executable not found for '{task_name}'.")
+            print(f"Expected path: {task_script_path}")
+            return 1
+
+    session_start = time.monotonic()
+    runs = {task_name: TaskRun(task_name) for task_name in task_names}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for task_name in task_names:
+            if task_name not in INTERACTIVE_TASKS:
+                pool.submit(run_task_grader, runs[task_name], timeout, deadline, bundled)
+        for task_name in task_names:
+            if task_name in INTERACTIVE_TASKS:
+                # 交互式任务需要终端，轮到它时才在前台运行
+                run_task_grader(runs[task_name], timeout, deadline, bundled)
+            runs[task_name].stream()
+            print()
+    return finish_session(runs, session_start, 'bundled' if bundled else 'exec')
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='grade', usage=USAGE, add_help=True)
+    parser.add_argument('-a', action='store_true', help='Run all tasks.')
+    parser.add_argument('-j', type=int, default=1, metavar='N',
+                        help='Number of tasks to run at the same time (default: 1).')
+    parser.add_argument('--exec', action='store_true', dest='use_exec',
+                        help='Run every task as its own executable (tasks/taskN/taskN) even if it is bundled into grade.')
+    parser.add_argument('--fresh', action='store_true',
+                        help='Run every check again instead of reusing verdicts whose inputs are unchanged.')
+    parser.add_argument('--profile', action='store_true',
+                        help='Save a cProfile dump of every task to tasks/taskN/taskN.pstats.')
+    parser.add_argument('--no-history', action='store_true',
+                        help=f'Do not append the timings of this run to {HISTORY_FILE_NAME}.')
+    parser.add_argument('--timeout', type=float, metavar='SEC',
+                        help='Stop a task that runs longer than SEC seconds. With this or --deadline, tasks bundled '
+                             'into grade run in processes of their own, so a stopped task ends with every command it started.')
+    parser.add_argument('--deadline', type=float, metavar='SEC',
+                        help='Stop every task still running SEC seconds after grading started.')
+    parser.add_argument('--format', choices=['text', 'jsonl'], default='text',
+                        help="'jsonl' prints one JSON event per check, task and session to stdout.")
+    parser.add_argument('tasks', nargs='*', help='Names of the tasks to run.')
+    args = parser.parse_args(argv)
+    if args.j < 1:
+        parser.error("-j must be at least 1")
+    if args.timeout is not None and args.timeout <= 0:
+        parser.error("--timeout must be positive")
+    if args.deadline is not None and args.deadline <= 0:
+        parser.error("--deadline must be positive")
+    return args
+
+def dispatch(task_names, args, deadline):
+    """
+    Runs the tasks in-process if they are all bundled into grade, else as executables.
+
+    With a time limit, bundled tasks run in processes of their own started by grade,
+    like task executables: a thread cannot be stopped from the outside, so a timeout
+    in this process would leave the task's check threads and the commands they
+    started running. Its process group can be stopped as a whole.
+
+    Returns:
+        int: 0 if every task succeeded, 1 otherwise.
+    """
+    registry = {} if args.use_exec else load_task_registry()
+    if all(task_name in registry for task_name in task_names):
+        if args.timeout is not None or deadline is not None:
+            return run_tasks(task_names, args.j, args.timeout, deadline, bundled=True)
+        if args.j > 1:
+            print("Note: -j only applies to task executables (--exec) or with --timeout/--deadline; "
+                  "bundled tasks run one after another.")
+        return run_tasks_in_process(task_names, registry)
+    return run_tasks(task_names, args.j, args.timeout, deadline)
+
+def run_bundled_task(task_name, argv):
+    """Runs one task bundled into grade as if it were the task's executable ('grade --run-task taskN ...')."""
+    registry = load_task_registry()
+    if task_name not in registry:
+        print(f"Error: Task '{task_name}' is not bundled into grade.")
         sys.exit(1)
+    registry[task_name].main(argv, get_task_dir(task_name))
 
 def main():
     """
     Main function to parse arguments and run the grader.
     """
+    global event_stream, task_options, history_path
+    if len(sys.argv) > 2 and sys.argv[1] == RUN_TASK_OPTION:
+        run_bundled_task(sys.argv[2], sys.argv[3:])
+        return
     # 如果没有提供参数，则打印使用说明
     if len(sys.argv) == 1:
-        print("Usage: ./grade [-a | task_name1 task_name2 ...]")
-        print("Example: ./grade task1 task3")
-        print("To run all tasks: ./grade -a")
+        print(USAGE)
         sys.exit(1)
-    elif len(sys.argv) > 1:
-        args = sys.argv[1:]
-        if args[0] == '-a':
-            # Run all tasks if '-a' flag is provided
-            print("\nRunning all tasks...")
-            for task in ALL_TASKS:
-                run_task_grader(task)
-            print("--- ALL TASKS COMPLETED ---\n")
-        else:
-            # Run multiple specific tasks
-            for task_name in args:
-                if task_name not in ALL_TASKS:
-                    print(f"Error: Unknown task '{task_name}'.")
-                    print("Available tasks are: " + ", ".join(ALL_TASKS))
-                    sys.exit(1)
-                run_task_grader(task_name)
+
+    args = parse_args(sys.argv[1:])
+    if args.format == 'jsonl':
+        event_stream = sys.stdout
+        sys.stdout = sys.stderr
+        task_options += ['--format', 'jsonl']
+    if args.fresh:
+        task_options += ['--fresh']
+    if args.profile:
+        task_options += ['--profile']
+    if not args.no_history:
+        history_path = os.path.join(os.path.dirname(os.path.realpath(sys.executable)), HISTORY_FILE_NAME)
+    deadline = time.monotonic() + args.deadline if args.deadline is not None else None
+    if args.a:
+        # Run all tasks if '-a' flag is provided
+        print("\nRunning all tasks...")
+        exit_code = dispatch(ALL_TASKS, args, deadline)
+        print("--- ALL TASKS COMPLETED ---\n")
+    elif args.tasks:
+        # Run multiple specific tasks
+        for task_name in args.tasks:
+            if task_name not in ALL_TASKS:
+                print(f"Error: Unknown task '{task_name}'.")
+                print("Available tasks are: " + ", ".join(ALL_TASKS))
+                sys.exit(1)
+        exit_code = dispatch(args.tasks, args, deadline)
     else:
-        # This part of the code is unreachable due to the first if statement, but it's good practice to have a general else
-        print("Usage: ./grade [-a | task_name1 task_name2 ...]")
-        print("Example: ./grade task1 task3")
-        print("To run all tasks: ./grade -a")
+        print(USAGE)
         sys.exit(1)
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
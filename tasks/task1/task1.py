@@ -1,13 +1,14 @@
 import platform
-import subprocess
 import sys
 import os
 import hashlib
-from base64 import b64encode
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad
-import json
-import base64
+
+# 共享模块 autograding/ 位于项目根目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from autograding import probes
+from autograding.core import Check, Grader
+
+TASK_NAME = 'task1'
 
 # --- Test Definitions ---
 TESTS = {
@@ -16,90 +17,33 @@ TESTS = {
     'Python3 Check': 25,
 }
 
-results = []
-score = 0
 current_os = platform.system()
 
-# --- SECRET KEY ---
-# 从 etc/config 文件中加载密钥
-try:
-    app_path = os.path.realpath(sys.executable)
-    app_dir = os.path.dirname(app_path)
-    project_root = os.path.dirname(os.path.dirname(app_dir))
-    config_path = os.path.join(project_root, 'etc', 'config')
-    
-    with open(config_path, 'r') as f:
-        SECRET_KEY = base64.b64decode(f.read().strip())
-    if len(SECRET_KEY) not in [16, 24, 32]:
-        raise ValueError("Incorrect AES key length from config file.")
-except FileNotFoundError:
-    print("Error: 'etc/config' file not found. Please ensure it exists.")
-    sys.exit(1)
-except Exception as e:
-    print(f"Error loading secret key: {e}")
-    sys.exit(1)
-
-# --- Helper function for printing reports ---
-def print_final_report():
-    print("\n--- AUTOGRADING FINAL REPORT ---")
-    print("Results for environment check:")
-    for result in results:
-        status = '✓ Passed' if result['passed'] else '✗ Failed'
-        print(f"  - {result['name']}: {status} (+{result['points']}pts)")
-    print(f"\nFinal Score: {score}/{sum(TESTS.values())} (Correctness)")
-    print("----------------------------------\n")
-
-def run_check(name, check_func, points):
-    global score
-    print(f"Checking for {name}...")
-    result = check_func()
-    
-    if isinstance(result, tuple):
-        passed, points_earned = result
-        if passed:
-            score += points_earned
-            results.append({"name": name, "passed": True, "points": points_earned})
-            print(f"✓ {name}: Passed (+{points_earned}pts)")
-        else:
-            results.append({"name": name, "passed": False, "points": 0})
-            print(f"✗ {name}: Failed (+0pts)")
-        return passed
-    else:
-        if result:
-            score += points
-            results.append({"name": name, "passed": True, "points": points})
-            print(f"✓ {name}: Passed")
-        else:
-            results.append({"name": name, "passed": False, "points": 0})
-            print(f"✗ {name}: Failed")
-        return result
-
 def check_environment():
     """Checks the OS and WSL version."""
     print(f"  - Detected OS: {current_os}")
     
     # Check for Linux environments
     if current_os == 'Linux':
-        try:
-            # Check for WSL environment first by reading /proc/version
-            with open('/proc/version', 'r') as f:
-                version_info = f.read().strip()
-            
-            if "Microsoft" in version_info or "microsoft-standard" in version_info:
-                if "WSL2" in version_info:
-                    print("  - Detected: WSL2 environment.")
-                    return True, TESTS['Environment Check']
-                else:
-                    points_earned = TESTS['Environment Check'] / 2
-                    print(f"  - Detected: WSL1 environment. Partial points awarded (+{points_earned}pts).")
-                    return True, points_earned
-            else:
-                print("  - Detected: Native Linux environment.")
-                return True, TESTS['Environment Check']
-        except Exception:
+        # Check for WSL environment first by reading /proc/version
+        version_info = probes.read_file('/proc/version')
+        if version_info is None:
             # If reading /proc/version fails, assume it's native Linux as a fallback
             print("  - Detected: Native Linux environment (Error reading /proc/version).")
             return True, TESTS['Environment Check']
+        version_info = version_info.strip()
+
+        if "Microsoft" in version_info or "microsoft-standard" in version_info:
+            if "WSL2" in version_info:
+                print("  - Detected: WSL2 environment.")
+                return True, TESTS['Environment Check']
+            else:
+                points_earned = TESTS['Environment Check'] / 2
+                print(f"  - Detected: WSL1 environment. Partial points awarded (+{points_earned}pts).")
+                return True, points_earned
+        else:
+            print("  - Detected: Native Linux environment.")
+            return True, TESTS['Environment Check']
     # Check for macOS
     elif current_os == 'Darwin':
         print("  - Detected OS: macOS.")
@@ -117,73 +61,51 @@ def check_environment():
 
 def check_git():
     """Verifies the 'git' command is installed."""
-    try:
-        git_version_output = subprocess.check_output(['git', '--version'], text=True)
-        print(f"  - Passed: Git is installed. {git_version_output.strip()}")
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    # 版本号只能通过运行 git 得到，这是本任务唯一需要启动的进程
+    git_version_output = probes.command_output(('git', '--version'))
+    if git_version_output is None:
         print("  - Failed: 'git' command not found. Please install Git.")
         return False
-    except Exception as e:
-        print(f"  - An error occurred: {e}")
-        return False
+    print(f"  - Passed: Git is installed. {git_version_output.strip()}")
+    return True
 
 def check_python3_exists():
     """Verifies the 'python3' command is installed."""
-    try:
-        python3_path = subprocess.check_output(['which', 'python3'], text=True).strip()
-        print(f"  - Passed: 'python3' command found at {python3_path}")
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    python3_path = probes.which('python3')
+    if python3_path is None:
         print("  - Failed: 'python3' command not found. Please install Python 3.")
         return False
-    except Exception as e:
-        print(f"  - An error occurred during check: {e}")
-        return False
+    print(f"  - Passed: 'python3' command found at {python3_path}")
+    return True
 
-def encrypt_report(report_data):
-    try:
-        cipher = AES.new(SECRET_KEY, AES.MODE_EAX)
-        nonce = cipher.nonce
-        ciphertext, tag = cipher.encrypt_and_digest(json.dumps(report_data).encode('utf-8'))
-        
-        encrypted_data = {
-            "nonce": b64encode(nonce).decode('utf-8'),
-            "ciphertext": b64encode(ciphertext).decode('utf-8'),
-            "tag": b64encode(tag).decode('utf-8')
-        }
-        return json.dumps(encrypted_data)
-    except Exception as e:
-        return f"Encryption failed: {e}"
+# 三项检查互不依赖，会被同时执行；输入 (系统版本、可执行文件) 未变化时沿用上次通过的结果
+CHECKS = [
+    Check('Environment Check', check_environment, TESTS['Environment Check'],
+          fingerprint=lambda: [current_os, probes.read_file('/proc/version')]),
+    Check('Git Check', check_git, TESTS['Git Check'],
+          fingerprint=lambda: probes.binary_fingerprint('git')),
+    Check('Python3 Check', check_python3_exists, TESTS['Python3 Check'],
+          fingerprint=lambda: probes.binary_fingerprint('python3')),
+]
 
-def generate_and_save_report():
-    """Generates an encrypted report and saves it to the same directory as the executable."""
-    # 获取可执行文件所在的目录
-    app_dir = os.path.dirname(os.path.realpath(sys.executable))
-    # 拼接完整的报告文件路径
-    report_file_path = os.path.join(app_dir, "autograding_report.json")
-    
-    final_results = {
-        "score": score,
-        "max_score": sum(TESTS.values()),
-        "test_results": results
-    }
-    
-    encrypted_report = encrypt_report(final_results)
+grader = Grader(TASK_NAME, CHECKS, report_title="Results for environment check:")
 
-    with open(report_file_path, "w") as f:
-        f.write(encrypted_report)
-    
-    print("--- SUBMISSION CREATED ---")
-    print(f"An encrypted submission file has been saved to {report_file_path}.")
-    print("Please submit this file.")
+def grade():
+    print("\n--- Running Autograder for task1 ---")
+    grader.run_checks()
+
+def main(argv=None, app_dir=None):
+    """
+    Runs every check of task1 and saves the encrypted report.
+
+    Args:
+        argv (list): Command-line arguments, defaults to sys.argv[1:].
+        app_dir (str): Directory of the task, where the report is saved and from which
+            etc/config is found (two levels up). Defaults to the executable's directory.
+    """
+    grader.main(grade, argv, app_dir)
 
 if __name__ == "__main__":
-    print("\n--- Running Autograder for task1 ---")
-    
-    run_check('Environment Check', check_environment, TESTS['Environment Check'])
-    run_check('Git Check', check_git, TESTS['Git Check'])
-    run_check('Python3 Check', check_python3_exists, TESTS['Python3 Check'])
-    
-    print_final_report()
-    generate_and_save_report()
\ No newline at end of file
+    # grade 通过管道读取输出，按行刷新以便实时显示
+    sys.stdout.reconfigure(line_buffering=True)
+    main()
\ No newline at end of file
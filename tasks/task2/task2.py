@@ -1,10 +1,19 @@
-import subprocess
 import sys
 import os
-import json
-import base64
-from base64 import b64encode
-from Crypto.Cipher import AES
+import time
+
+# 共享模块 autograding/ 位于项目根目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from autograding import probes
+from autograding.core import Check, Grader
+from autograding.docker_client import DockerError, get_docker
+from autograding.timing import record_timing
+
+TASK_NAME = 'task2'
+
+HELLO_WORLD_IMAGE = 'hello-world'
+# 考场可能没有网络：'docker save hello-world -o hello-world.tar' 得到的镜像包放在可执行文件旁边
+HELLO_WORLD_TARBALL = 'hello-world.tar'
 
 # --- Test Definitions ---
 TESTS = {
@@ -14,169 +23,146 @@ TESTS = {
     'Container Execution Check': 25,
 }
 
-results = []
-score = 0
-
-# --- SECRET KEY ---
-# 从 etc/config 文件中加载密钥
-try:
-    app_dir = os.path.dirname(os.path.realpath(sys.executable))
-    project_root = os.path.dirname(os.path.dirname(app_dir))
-    config_path = os.path.join(project_root, 'etc', 'config')
-
-    with open(config_path, 'r') as f:
-        # 读取文件内容，去除首尾空白，然后进行 Base64 解码
-        SECRET_KEY = base64.b64decode(f.read().strip())
-    if len(SECRET_KEY) not in [16, 24, 32]:
-        raise ValueError("Incorrect AES key length from config file.")
-except FileNotFoundError:
-    print("Error: 'etc/config' file not found. Please ensure it exists.")
-    sys.exit(1)
-except Exception as e:
-    print(f"Error loading secret key: {e}")
-    sys.exit(1)
-
-# --- Helper function for printing reports ---
-def print_final_report():
-    """Prints a formatted summary of the test results and the final score."""
-    print("\n--- AUTOGRADING FINAL REPORT ---")
-    print("Results for Docker environment check:")
-    for result in results:
-        status = '✓ Passed' if result['passed'] else '✗ Failed'
-        print(f"  - {result['name']}: {status} (+{result['points']}pts)")
-    print(f"\nFinal Score: {score}/{sum(TESTS.values())} (Correctness)")
-    print("----------------------------------\n")
-
-def run_check(name, check_func, points):
-    global score
-    print(f"Checking {name}...")
-    result = check_func()
-
-    if result:
-        score += points
-        results.append({"name": name, "passed": True, "points": points})
-        print(f"✓ {name}: Passed")
-    else:
-        results.append({"name": name, "passed": False, "points": 0})
-        print(f"✗ {name}: Failed")
-
-    return result
-
-
 def check_docker_installed():
     print("  - Verifying 'docker' command exists...")
-    try:
-        # 'which' command finds the full path to an executable.
-        subprocess.check_output(['which', 'docker'], text=True, stderr=subprocess.DEVNULL).strip()
+    # 在 PATH 中查找，与 'which' 相同但无需启动进程
+    if probes.which('docker'):
         print("  - Passed: 'docker' command found.")
         return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("  - Failed: 'docker' command not found. Is Docker installed?")
-        return False
+    print("  - Failed: 'docker' command not found. Is Docker installed?")
+    return False
 
 def check_docker_service_running():
     print("  - Verifying the Docker service is running...")
-    try:
-        subprocess.run(['docker', 'info'], check=True, text=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if get_docker().ping():
         print("  - Passed: Docker service is active and responding.")
         return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("  - Failed: Could not connect to the Docker service.")
-        print("  - Tip: Make sure the Docker daemon is started.")
-        return False
+    print("  - Failed: Could not connect to the Docker service.")
+    print("  - Tip: Make sure the Docker daemon is started.")
+    return False
 
 def check_user_permissions():
     print("  - Verifying user permissions (no sudo required)...")
     try:
-        user_groups = subprocess.check_output(['groups'], text=True).strip()
-        if 'docker' in user_groups.split():
-            print("  - Passed: User is correctly configured in the 'docker' group.")
-            return True
-        else:
-            print("  - Failed: User is not in the 'docker' group.")
-            print("  - Tip: Run 'sudo usermod -aG docker $USER' and then RE-OPEN your terminal.")
-            return False
-    except (subprocess.CalledProcessError, FileNotFoundError):
+        user_groups = probes.user_groups()
+    except (ImportError, OSError):
         print("  - Failed: Could not determine user groups.")
         return False
+    if 'docker' in user_groups:
+        print("  - Passed: User is correctly configured in the 'docker' group.")
+        return True
+    else:
+        print("  - Failed: User is not in the 'docker' group.")
+        print("  - Tip: Run 'sudo usermod -aG docker $USER' and then RE-OPEN your terminal.")
+        return False
+
+def prepare_hello_world_image(docker):
+    """
+    Makes sure the 'hello-world' image is present, loading the bundled tarball or,
+    if there is none, pulling it from the registry.
+
+    Returns:
+        bool: True if the image is ready to run.
+    """
+    if docker.image_exists(HELLO_WORLD_IMAGE):
+        print("  - Image 'hello-world' is already present.")
+        return True
+
+    tarball_path = os.path.join(grader.app_dir, HELLO_WORLD_TARBALL)
+    start = time.monotonic()
+    if os.path.exists(tarball_path):
+        print(f"  - Loading 'hello-world' from {HELLO_WORLD_TARBALL}...")
+        error = docker.load_image(tarball_path)
+        label = 'image_load'
+    else:
+        print("  - Pulling 'hello-world' from the registry...")
+        error = docker.pull(HELLO_WORLD_IMAGE)
+        label = 'image_pull'
+    elapsed = time.monotonic() - start
+    record_timing(label, elapsed)
+
+    if error:
+        print(f"  - Failed: Could not get the 'hello-world' image. {error}")
+        return False
+    print(f"  - Image ready ({label.replace('_', ' ')}: {elapsed:.2f}s).")
+    return True
 
 def check_container_execution():
     print("  - Verifying container execution with 'hello-world'...")
     try:
-        output = subprocess.check_output(['docker', 'run', 'hello-world'], text=True, stderr=subprocess.STDOUT)
-        if "Hello from Docker!" in output:
-            print("  - Passed: Successfully pulled and ran the 'hello-world' container.")
-            return True
-        else:
-            print("  - Failed: 'hello-world' container ran, but output was unexpected.")
+        docker = get_docker()
+        if not prepare_hello_world_image(docker):
             return False
-    except subprocess.CalledProcessError as e:
+        start = time.monotonic()
+        exit_code, stdout, stderr = docker.run(HELLO_WORLD_IMAGE)
+        elapsed = time.monotonic() - start
+        record_timing('container_run', elapsed)
+        print(f"  - Container finished in {elapsed:.2f}s.")
+    except DockerError as e:
+        # 守护进程在前面的检查之后停止或断开 (套接字无法连接)，或回退到的 'docker' 命令无法执行时
+        print(f"  - Failed: {e}")
+        return False
+    if exit_code != 0:
         print("  - Failed: Could not run the 'hello-world' container.")
-        print(f"  - Error details: {e.output}")
+        print(f"  - Error details: {stdout}{stderr}")
         return False
-    except FileNotFoundError:
-        # 理论上不可能执行到这里，仅作为保险
-        print("  - Failed: 'docker' command not found.")
+    if "Hello from Docker!" in stdout:
+        print("  - Passed: Successfully ran the 'hello-world' container.")
+        return True
+    else:
+        print("  - Failed: 'hello-world' container ran, but output was unexpected.")
         return False
 
-def encrypt_report(report_data):
-    try:
-        cipher = AES.new(SECRET_KEY, AES.MODE_EAX)
-        nonce = cipher.nonce
-        ciphertext, tag = cipher.encrypt_and_digest(json.dumps(report_data).encode('utf-8'))
-        encrypted_data = {
-            "nonce": b64encode(nonce).decode('utf-8'),
-            "ciphertext": b64encode(ciphertext).decode('utf-8'),
-            "tag": b64encode(tag).decode('utf-8')
-        }
-        return json.dumps(encrypted_data)
-    except Exception as e:
-        return f"Encryption failed: {e}"
-
-def generate_and_save_report():
-    app_dir = os.path.dirname(os.path.realpath(sys.executable))
-    report_file_path = os.path.join(app_dir, "autograding_report.json")
-
-    final_results = {
-        "score": score,
-        "max_score": sum(TESTS.values()),
-        "test_results": results
-    }
-
-    encrypted_report = encrypt_report(final_results)
-
-    with open(report_file_path, "w") as f:
-        f.write(encrypted_report)
-
-    print("\n--- SUBMISSION CREATED ---")
-    print(f"An encrypted submission file has been saved to {report_file_path}.")
-    print("Please submit this file.")
-
-if __name__ == "__main__":
+def daemon_fingerprint():
+    """
+    Identifies the Docker daemon and its 'hello-world' image, so a container run is
+    not repeated against the same daemon and image. Without the image there is
+    nothing to reuse: it has to be loaded or pulled and run again.
+    """
+    docker = get_docker()
+    info = docker.info()
+    image_id = docker.image_id(HELLO_WORLD_IMAGE)
+    if not info or not image_id:
+        return None
+    return [info.get('ID'), info.get('ServerVersion'), image_id, sorted(probes.user_groups())]
+
+FUNDAMENTAL_CHECK_FAILED = """
+--- Fundamental Check Failed ---
+Docker command not found. Please install Docker before proceeding.
+----------------------------------
+"""
+
+# 'docker info' 与用户组检查互不依赖，会被同时执行；
+# 服务是否在运行每次都重新检查，其余检查在输入未变化时沿用上次通过的结果
+CHECKS = [
+    Check('Docker Installed Check', check_docker_installed, TESTS['Docker Installed Check'],
+          fingerprint=lambda: probes.binary_fingerprint('docker')),
+    Check('Docker Service Running Check', check_docker_service_running, TESTS['Docker Service Running Check'],
+          depends_on=['Docker Installed Check'], skip_message=FUNDAMENTAL_CHECK_FAILED),
+    Check('User Permissions Check', check_user_permissions, TESTS['User Permissions Check'],
+          depends_on=['Docker Installed Check'], fingerprint=lambda: sorted(probes.user_groups())),
+    Check('Container Execution Check', check_container_execution, TESTS['Container Execution Check'],
+          depends_on=['Docker Service Running Check', 'User Permissions Check'], fingerprint=daemon_fingerprint),
+]
+
+grader = Grader(TASK_NAME, CHECKS, report_title="Results for Docker environment check:")
+
+def grade():
     print("--- Running Autograder ---")
+    grader.run_checks()
 
-    docker_installed = run_check('Docker Installed Check', check_docker_installed, TESTS['Docker Installed Check'])
-
-    if docker_installed:
-        service_running = run_check('Docker Service Running Check', check_docker_service_running, TESTS['Docker Service Running Check'])
-        if service_running:
-            permissions_ok = run_check('User Permissions Check', check_user_permissions, TESTS['User Permissions Check'])
-            if permissions_ok:
-                run_check('Container Execution Check', check_container_execution, TESTS['Container Execution Check'])
-            else:
-                results.append({"name": "Container Execution Check", "passed": False, "points": 0})
-                print("✗ Skipping Container Execution Check due to user permission issues.")
-        else:
-            results.append({"name": "User Permissions Check", "passed": False, "points": 0})
-            results.append({"name": "Container Execution Check", "passed": False, "points": 0})
-            print("✗ Skipping subsequent checks as Docker service is not running.")
-    else:
-        results.append({"name": "Docker Service Running Check", "passed": False, "points": 0})
-        results.append({"name": "User Permissions Check", "passed": False, "points": 0})
-        results.append({"name": "Container Execution Check", "passed": False, "points": 0})
-        print("\n--- Fundamental Check Failed ---")
-        print("Docker command not found. Please install Docker before proceeding.")
-        print("----------------------------------\n")
-
-    print_final_report()
-    generate_and_save_report()
+def main(argv=None, app_dir=None):
+    """
+    Runs every check of task2 and saves the encrypted report.
+
+    Args:
+        argv (list): Command-line arguments, defaults to sys.argv[1:].
+        app_dir (str): Directory of the task, where the report is saved and from which
+            etc/config is found (two levels up). Defaults to the executable's directory.
+    """
+    grader.main(grade, argv, app_dir)
+
+if __name__ == "__main__":
+    # grade 通过管道读取输出，按行刷新以便实时显示
+    sys.stdout.reconfigure(line_buffering=True)
+    main()
\ No newline at end of file
@@ -1,84 +1,239 @@
 # build_quiz.py
 import argparse
 import base64
+import hashlib
 import json
 import re
 import os
+import struct
+import sys
 
-def parse_qmd_to_data(qmd_path):
+# 共享模块 autograding/ 位于项目根目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from autograding.quiz import BANK_FORMAT, question_id
+
+# 选项行，例如 "*B. pwd"，星号标记正确答案
+OPTION_PATTERN = re.compile(r'^\s*(\*?)\s*([A-D])\.\s*(.*)', re.IGNORECASE)
+# 可选的标签行，例如 "Tag: permissions"；抽题时按标签分层
+TAG_PATTERN = re.compile(r'^tag:\s*(\S.*)$', re.IGNORECASE)
+SEPARATOR = '---'
+# 缓存格式变化时递增，旧的缓存随之失效
+CACHE_VERSION = 3
+
+class QuizFormatError(ValueError):
+    """A mistake in the QMD file; the message starts with 'path:line:'."""
+
+    def __init__(self, qmd_path, line_number, message):
+        super().__init__(f"{qmd_path}:{line_number}: {message}")
+        self.line_number = line_number
+
+def iter_blocks(qmd_path):
     """
-    Parses a QMD file and extracts questions, options, and the correct answer.
-    This is the same logic as before, but now it's part of the build process.
+    Reads a QMD file line by line and yields every question block between '---' lines.
+
+    Yields:
+        list: (line number, line) pairs of the block, blank lines included.
     """
     if not os.path.exists(qmd_path):
         raise FileNotFoundError(f"QMD file not found at '{qmd_path}'")
 
     with open(qmd_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    questions = []
-    blocks = content.strip().split('---')
-
-    for block in blocks:
-        block = block.strip()
-        if not block:
+        block = []
+        for line_number, line in enumerate(f, 1):
+            if line.strip() == SEPARATOR:
+                if any(text.strip() for _, text in block):
+                    yield block
+                block = []
+            else:
+                block.append((line_number, line))
+        if any(text.strip() for _, text in block):
+            yield block
+
+def first_line(block):
+    """Returns (line number, text) of the question, the first non-blank line of a block."""
+    return next((line_number, text.strip()) for line_number, text in block if text.strip())
+
+def parse_block(qmd_path, block):
+    """
+    Parses one question block: the first non-blank line is the question, followed by
+    options such as 'A. ...', the correct one marked with '*', and optionally a
+    'Tag: ...' line.
+    """
+    lines = [(line_number, text.strip()) for line_number, text in block if text.strip()]
+    question_line, question_text = lines[0]
+    options = {}
+    correct_answer = None
+    tag = ''
+
+    for line_number, line in lines[1:]:
+        tag_match = TAG_PATTERN.match(line)
+        if tag_match:
+            if tag:
+                raise QuizFormatError(qmd_path, line_number, f"Multiple tags defined for question: {question_text}")
+            tag = tag_match.group(1).strip()
             continue
+        match = OPTION_PATTERN.match(line)
+        if match:
+            is_correct = match.group(1) == '*'
+            option_letter = match.group(2).upper()
+            option_text = match.group(3).strip()
+
+            options[option_letter] = option_text
+            if is_correct:
+                if correct_answer is not None:
+                    raise QuizFormatError(qmd_path, line_number,
+                                          f"Multiple correct answers defined for question: {question_text}")
+                correct_answer = option_letter
+
+    if not correct_answer:
+        raise QuizFormatError(qmd_path, question_line, f"No correct answer defined for question: {question_text}")
+
+    return {
+        # 按题目文本生成的 ID，用于在报告中记录每道题的作答情况
+        "id": question_id(question_text),
+        "question": question_text,
+        "options": options,
+        "answer": correct_answer,
+        "tag": tag
+    }
+
+def block_digest(block):
+    return hashlib.sha256(''.join(text for _, text in block).encode('utf-8')).hexdigest()
+
+def parse_qmd_to_data(qmd_path):
+    """
+    Parses a QMD file and extracts questions, options, and the correct answer.
 
-        lines = block.split('\n')
-        question_text = lines[0].strip()
-        options = {}
-        correct_answer = None
-
-        for line in lines[1:]:
-            line = line.strip()
-            match = re.match(r'^\s*(\*?)\s*([A-D])\.\s*(.*)', line, re.IGNORECASE)
-            if match:
-                is_correct = match.group(1) == '*'
-                option_letter = match.group(2).upper()
-                option_text = match.group(3).strip()
-
-                options[option_letter] = option_text
-                if is_correct:
-                    if correct_answer is not None:
-                        raise ValueError(f"Multiple correct answers defined for question: {question_text}")
-                    correct_answer = option_letter
-
-        if not correct_answer:
-            raise ValueError(f"No correct answer defined for question: {question_text}")
-
-        questions.append({
-            "question": question_text,
-            "options": options,
-            "answer": correct_answer
-        })
+    Raises:
+        QuizFormatError: If a question has no or several correct answers, or appears twice.
+    """
+    questions = []
+    seen_ids = {}
+    for block in iter_blocks(qmd_path):
+        question = parse_block(qmd_path, block)
+        check_duplicate(qmd_path, seen_ids, first_line(block), question['id'])
+        questions.append(question)
     return questions
 
-def generate_quiz_module(qmd_path, output_py_path):
+def check_duplicate(qmd_path, seen_ids, question, quiz_id):
+    question_line, question_text = question
+    if quiz_id in seen_ids:
+        raise QuizFormatError(qmd_path, question_line,
+                              f"Duplicate question (first on line {seen_ids[quiz_id]}): {question_text}")
+    seen_ids[quiz_id] = question_line
+
+def get_cache_path(output_py_path):
+    """The build cache lives next to the generated module, e.g. .quiz_data.cache."""
+    directory, file_name = os.path.split(output_py_path)
+    return os.path.join(directory, f".{os.path.splitext(file_name)[0]}.cache")
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+def load_cache(cache_path):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if cache.get('version') == CACHE_VERSION else {}
+
+def save_cache(cache_path, cache):
+    temporary_path = f"{cache_path}.tmp"
+    try:
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            # json.dumps 使用 C 编码器，比 json.dump 逐块写入快得多
+            f.write(json.dumps(cache, ensure_ascii=False))
+        os.replace(temporary_path, cache_path)
+    except OSError as e:
+        print(f"--> Could not save the build cache: {e}")
+
+def generate_quiz_module(qmd_path, output_py_path, use_cache=True):
     """
-    Reads QMD, converts it to a Base64 encoded JSON string,
-    and writes it into a Python module.
+    Reads QMD and writes the questions into a Python module as an indexed bank.
+
+    Every question is stored as its own Base64 encoded JSON record in RECORDS, and
+    INDEX holds the little-endian uint32 offset of each record (plus the end), so
+    the grader can decode a single question without touching the others (see
+    autograding.quiz.QuizBank). TAG_POSITIONS lists the positions of the questions
+    grouped by tag, and TAGS maps every tag to its (start, count) in that list, so a
+    stratified sample never scans the bank. BANK_ID identifies the bank's content.
+
+    The parsed and serialized form of every question block is kept in a build cache
+    keyed by the hash of the block's text, so a rebuild only parses the blocks that
+    changed. If neither the QMD file nor the generated module changed, nothing is done.
     """
-    print(f"--> Reading questions from: {qmd_path}")
-    quiz_data = parse_qmd_to_data(qmd_path)
-
-    # Convert the Python list of questions to a JSON string
-    json_string = json.dumps(quiz_data)
+    cache_path = get_cache_path(output_py_path)
+    cache = load_cache(cache_path) if use_cache else {}
+    qmd_signature = file_signature(qmd_path)
+    if (cache and qmd_signature is not None and cache.get('qmd') == qmd_signature
+            and cache.get('output') == file_signature(output_py_path)):
+        print(f"✓ {output_py_path} is up to date with {qmd_path}.")
+        return
 
-    # Encode the JSON string into Base64 to obfuscate it
-    encoded_data = base64.b64encode(json_string.encode('utf-8')).decode('utf-8')
+    print(f"--> Reading questions from: {qmd_path}")
+    cached_blocks = cache.get('blocks', {})
+    blocks = {}
+    records = []
+    seen_ids = {}
+    parsed = 0
+    for block in iter_blocks(qmd_path):
+        digest = block_digest(block)
+        # 未改动的题目不再解析，直接沿用缓存中的 ID 与编码后的记录
+        entry = cached_blocks.get(digest)
+        if entry is None:
+            question = parse_block(qmd_path, block)
+            # Encode every question into Base64 to obfuscate it
+            entry = {"id": question['id'], "tag": question['tag'], "record": base64.b64encode(json.dumps(question).encode('utf-8')).decode('ascii')}
+            parsed += 1
+        check_duplicate(qmd_path, seen_ids, first_line(block), entry['id'])
+        blocks[digest] = entry
+        records.append(entry['record'].encode('ascii'))
+
+    offsets = [0]
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+    tagged = {}
+    for position, entry in enumerate(blocks.values()):
+        tagged.setdefault(entry['tag'], []).append(position)
+    tags = {}
+    tag_positions = []
+    for tag in sorted(tagged):
+        tags[tag] = (len(tag_positions), len(tagged[tag]))
+        tag_positions.extend(tagged[tag])
+    all_records = b''.join(records)
 
     # Write the Python module file
     print(f"--> Generating Python module: {output_py_path}")
     with open(output_py_path, 'w', encoding='utf-8') as f:
         f.write("# This file is auto-generated by build_quiz.py. DO NOT EDIT.\n")
-        f.write(f'ENCODED_DATA = "{encoded_data}"\n')
-
-    print("✓ Quiz data module generated successfully.")
+        f.write(f"FORMAT = {BANK_FORMAT}\n")
+        f.write(f"BANK_ID = {hashlib.sha256(all_records).hexdigest()[:12]!r}\n")
+        f.write(f"COUNT = {len(records)}\n")
+        f.write(f"TAGS = {tags!r}\n")
+        f.write(f"TAG_POSITIONS = {struct.pack(f'<{len(tag_positions)}I', *tag_positions)!r}\n")
+        f.write(f"INDEX = {struct.pack(f'<{len(offsets)}I', *offsets)!r}\n")
+        f.write(f"RECORDS = {all_records!r}\n")
+
+    if use_cache:
+        save_cache(cache_path, {"version": CACHE_VERSION, "qmd": qmd_signature,
+                                "output": file_signature(output_py_path), "blocks": blocks})
+    print(f"✓ Quiz data module generated successfully "
+          f"({len(records)} questions, {parsed} parsed, {len(records) - parsed} from the build cache).")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Build quiz data module from a QMD file.")
     parser.add_argument("--qmd", required=True, help="Path to the input QMD file.")
     parser.add_argument("--output", required=True, help="Path for the output Python module file.")
+    parser.add_argument("--no-cache", action="store_true", help="Parse every question again and do not save a build cache.")
 
     args = parser.parse_args()
-    generate_quiz_module(args.qmd, args.output)
+    try:
+        generate_quiz_module(args.qmd, args.output, use_cache=not args.no_cache)
+    except (FileNotFoundError, QuizFormatError) as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
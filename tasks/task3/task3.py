@@ -1,17 +1,29 @@
+import concurrent.futures
+import fnmatch
+import getpass
+import json
 import os
+import re
+import socket
 import sys
-import json
-import base64
-import subprocess
-from base64 import b64encode
-from Crypto.Cipher import AES
+import time
+import threading
+
+# 共享模块 autograding/ 位于项目根目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from autograding.container_probe import run_probe, stat_paths
+from autograding.docker_client import DockerError, get_docker
+from autograding.core import Check, Grader, ThreadOutput
+from autograding.quiz import QuizBank, answer_key, check_answers, derive_seed, encode_mask, parse_answers, score_answers
+from autograding.timing import current_check
 
 try:
     import quiz_data
 except ImportError:
-    print("Error: quiz_data.py not found.")
-    print("Please run the build_quiz.py script first to generate it.")
-    sys.exit(1)
+    # 在 main() 中报错退出，使本模块在缺少题库时也能被 grade 导入
+    quiz_data = None
+
+TASK_NAME = 'task3'
 
 TESTS = {
     'Directory Creation': 10,
@@ -23,194 +35,484 @@ TESTS = {
 TOTAL_OPERATIONS_SCORE = sum(TESTS.values())
 TOTAL_QUIZ_SCORE = 50
 TOTAL_MAX_SCORE = TOTAL_OPERATIONS_SCORE + TOTAL_QUIZ_SCORE
-results = []
-final_score = 0
+# 每位学生从题库中抽取的题目数；题库更小时全部作答
+QUIZ_SIZE = 10
+# --answers-batch 写出报告的目录 (相对于任务目录)
+ANSWER_REPORTS_DIR = "quiz_reports"
 CONTAINER_NAME = "autograding-task3"
+# --containers 写出报告的目录 (相对于任务目录)，以及同时评测的容器数
+CONTAINER_REPORTS_DIR = "container_reports"
+DEFAULT_CONTAINER_JOBS = 8
 
-try:
-    app_dir = os.path.dirname(os.path.realpath(sys.executable))
-    project_root = os.path.dirname(os.path.dirname(app_dir))
-    config_path = os.path.join(project_root, 'etc', 'config')
-    with open(config_path, 'r') as f:
-        SECRET_KEY = base64.b64decode(f.read().strip())
-    if len(SECRET_KEY) not in [16, 24, 32]:
-        raise ValueError("Incorrect AES key length from config file.")
-except Exception as e:
-    print(f"Error loading secret key: {e}")
-    sys.exit(1)
-
-def print_final_report():
-    print("\n--- AUTOGRADING FINAL REPORT ---")
-    print("Results for Linux Challenge:")
-    for result in results:
-        status = '✓ Passed' if result.get('passed', False) else '✗ Failed'
-        points_str = f"+{result.get('points', 0)}pts"
-        print(f"  - {result['name']}: {status} ({points_str})")
-    print(f"\nFinal Score: {final_score}/{TOTAL_MAX_SCORE} (Correctness)")
-    print("----------------------------------\n")
+# start_container() 得到的容器信息 (docker inspect)
+container_details = None
 
-def run_docker_command(command, check_return_code=False):
+def run_docker_command(command, check_return_code=False, container=CONTAINER_NAME):
     try:
-        full_command = ["docker", "exec", CONTAINER_NAME] + command
-        process = subprocess.run(full_command, capture_output=True, text=True, check=False)
+        exit_code, stdout, stderr = get_docker().exec_run(container, command)
 
         if check_return_code:
-            return process.returncode == 0
-        if process.returncode != 0:
-            return process.stderr.strip()
-        return process.stdout.strip()
-    except FileNotFoundError:
-        print("Error: 'docker' command not found. Is Docker installed and in your PATH?")
+            return exit_code == 0
+        if exit_code != 0:
+            return stderr.strip()
+        return stdout.strip()
+    except DockerError as e:
+        print(f"Error: {e}")
         sys.exit(1)
 
-def start_container():
+def start_container(container=CONTAINER_NAME):
+    """Starts the container if it is stopped; returns its details (docker inspect), or None."""
     try:
-        print(f"--> Checking container '{CONTAINER_NAME}' status...")
-        inspect_cmd = ['docker', 'inspect', '-f', '{{.State.Status}}', CONTAINER_NAME]
-        status_proc = subprocess.run(inspect_cmd, capture_output=True, text=True)
+        print(f"--> Checking container '{container}' status...")
+        docker = get_docker()
+        details = docker.inspect(container)
 
-        if status_proc.returncode != 0:
-             print(f"✗ Error: Container '{CONTAINER_NAME}' not found.")
+        if details is None:
+             print(f"✗ Error: Container '{container}' not found.")
              print("   Please complete Part 1 of the task first by running 'docker run...'.")
-             return False
+             return None
 
-        status = status_proc.stdout.strip()
+        status = details['State']['Status']
         if status == 'exited':
-            print(f"--> Container is stopped. Starting '{CONTAINER_NAME}'...")
-            subprocess.run(["docker", "start", CONTAINER_NAME], check=True, capture_output=True)
+            print(f"--> Container is stopped. Starting '{container}'...")
+            if not docker.start(container):
+                print(f"✗ Failed to start container '{container}'.")
+                return None
             print(f"✓ Container started successfully.")
+            details = docker.inspect(container) or details
         elif status == 'running':
             print(f"✓ Container is already running.")
         else:
             print(f"✗ Unknown container status: {status}")
-            return False
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            return None
+        return details
+    except DockerError as e:
         print(f"✗ Failed to start or check container. Error: {e}")
-        return False
+        return None
 
-def check_operations():
-    global final_score
-    print("\n--- Checking Part 1: File System Operations (inside Docker) ---")
+# --- Part 1: File System Operations ---
+EXPECTED_CONTENT = "Docker is awesome!"
 
-    if run_docker_command(["test", "-d", "/challenge"], check_return_code=True):
-        results.append({"name": "Directory Creation", "passed": True, "points": TESTS['Directory Creation']})
-        final_score += TESTS['Directory Creation']
-        print("✓ Passed: Directory Creation")
-    else:
-        results.append({"name": "Directory Creation", "passed": False, "points": 0})
-        print("✗ Failed: Directory Creation")
+# 每项断言: (检查名, 在容器内执行的命令, 期望的输出; None 表示只检查退出码)
+ASSERTIONS = [
+    ('Directory Creation', ["test", "-d", "/challenge"], None),
+    ('File Creation', ["test", "-f", "/challenge/data.txt"], None),
+    ('File Content', ["cat", "/challenge/data.txt"], EXPECTED_CONTENT),
+    ('Directory Copy', ["cat", "/opt/challenge/data.txt"], EXPECTED_CONTENT),
+]
 
-    if run_docker_command(["test", "-f", "/challenge/data.txt"], check_return_code=True):
-        results.append({"name": "File Creation", "passed": True, "points": TESTS['File Creation']})
-        final_score += TESTS['File Creation']
-        print("✓ Passed: File Creation")
-    else:
-        results.append({"name": "File Creation", "passed": False, "points": 0})
-        print("✗ Failed: File Creation")
-
-    content_output = run_docker_command(["cat", "/challenge/data.txt"])
-    if content_output == "Docker is awesome!":
-        results.append({"name": "File Content", "passed": True, "points": TESTS['File Content']})
-        final_score += TESTS['File Content']
-        print("✓ Passed: File Content")
-    else:
-        results.append({"name": "File Content", "passed": False, "points": 0})
-        print("✗ Failed: File Content")
-
-    copy_output = run_docker_command(["cat", "/opt/challenge/data.txt"])
-    if copy_output == "Docker is awesome!":
-        results.append({"name": "Directory Copy", "passed": True, "points": TESTS['Directory Copy']})
-        final_score += TESTS['Directory Copy']
-        print("✓ Passed: Directory Copy")
-    else:
-        results.append({"name": "Directory Copy", "passed": False, "points": 0})
-        print("✗ Failed: Directory Copy")
+# 断言检查的路径：它们的状态是检查指纹的一部分，学生事后改动文件时缓存的结果不再沿用
+ASSERTED_PATHS = sorted({command[-1] for _, command, _ in ASSERTIONS})
+
+# 检查名 -> 是否通过，由第一个需要它的检查调用 probe_container() 填写
+probe_results = {}
+probe_lock = threading.Lock()
+# 'paths' -> stat_paths() 的结果，每次运行只查询一次
+path_state = {}
+path_state_lock = threading.Lock()
+
+def probe_container(container=CONTAINER_NAME):
+    """
+    Runs every assertion inside the container and returns whether each one passed.
+
+    All assertions are sent in a single 'docker exec', so adding assertions does not
+    add exec round-trips. If the batch cannot run (e.g. the container has no 'sh'),
+    the assertions are run one exec at a time instead.
+
+    Returns:
+        dict: Check name -> True if the assertion passed.
+    """
+    passed = {}
+    results = run_probe(get_docker(), container, [(name, command) for name, command, _ in ASSERTIONS])
+    if results is not None:
+        for name, _, expected in ASSERTIONS:
+            result = results.get(name)
+            passed[name] = (
+                result is not None
+                and result['exit_code'] == 0
+                and (expected is None or result['output'] == expected)
+            )
+        return passed
+
+    print("--> Could not run the checks in one batch, running them one by one...")
+    for name, command, expected in ASSERTIONS:
+        if expected is None:
+            passed[name] = run_docker_command(command, check_return_code=True, container=container)
+        else:
+            passed[name] = run_docker_command(command, container=container) == expected
+    return passed
+
+def check_assertion(name):
+    def check():
+        # 所有断言都沿用上次的结果时，只需 container_fingerprint() 那一次很小的 exec
+        with probe_lock:
+            if not probe_results:
+                probe_results.update(probe_container())
+        return probe_results.get(name, False)
+    return check
+
+def container_fingerprint():
+    """
+    Identifies this run of the container and the current state of the asserted paths,
+    so a restarted or re-created container, or a changed file, is checked again.
+    """
+    if container_details is None:
+        return None
+    with path_state_lock:
+        if 'paths' not in path_state:
+            path_state['paths'] = stat_paths(get_docker(), CONTAINER_NAME, ASSERTED_PATHS)
+    if path_state['paths'] is None:
+        return None
+    return [container_details['Id'], container_details['State'].get('StartedAt'), path_state['paths']]
 
 # --- Part 2: QMD Quiz Functions ---
 def get_quiz_questions():
+    """Opens the embedded question bank; every question is decoded only when it is asked."""
     try:
-        json_bytes = base64.b64decode(quiz_data.ENCODED_DATA)
-        questions = json.loads(json_bytes)
-        return questions
+        return QuizBank(quiz_data)
     except Exception as e:
         print(f"Error: Could not load or parse the embedded quiz data. {e}")
         return None
 
-def run_quiz(questions):
-    global final_score
+def default_student():
+    return f"{getpass.getuser()}@{socket.gethostname()}"
+
+def draw_quiz(bank, student, decoded=None):
+    """
+    Draws the student's own sample of the bank.
+
+    The questions and the order of their options are drawn from a seed derived from
+    the student, so running the grader again asks the same quiz, and the seed in the
+    report lets decrypt_report --bank check the answers against the bank.
+
+    Returns:
+        tuple: (seed, questions, answer key as returned by answer_key()).
+    """
+    seed = derive_seed(TASK_NAME, student)
+    return (seed, *answer_key(bank, seed, min(QUIZ_SIZE, len(bank)), decoded))
+
+def quiz_result(bank, seed, questions, answers, correct):
+    """The 'Quiz (x/y correct)' result of the report, for the answers given and which are correct."""
+    correct_count = sum(correct)
+    score_per_question = TOTAL_QUIZ_SCORE / len(questions)
+    quiz_score = round(correct_count * score_per_question)
+
+    # 逐题的对错记录为位掩码 (第 i 位对应 question_ids 中的第 i 题)，用于题目分析
+    return {
+        "name": f"Quiz ({correct_count}/{len(questions)} correct)",
+        "passed": True,
+        "points": quiz_score,
+        "seed": seed,
+        "bank_id": bank.bank_id,
+        "question_ids": [q['id'] for q in questions],
+        "answers": answers,
+        "correct_mask": encode_mask(correct),
+    }
+
+def run_quiz(bank, quiz, answer_sheet=None):
+    """
+    Asks the quiz drawn by draw_quiz().
+
+    With an answer sheet (--answers), the answers are taken from it instead of input();
+    the sheet was checked against the quiz before the grading started.
+    """
     print("\n--- Starting Part 2: Multiple Choice Quiz ---")
 
-    correct_count = 0
-    for i, q in enumerate(questions):
+    start = time.monotonic()
+    seed, questions, key = quiz
+    answers = []
+    for i, (q, (options, _)) in enumerate(zip(questions, key)):
         print(f"\nQuestion {i+1}/{len(questions)}: {q['question']}")
-        sorted_options = sorted(q['options'].items())
-        for letter, text in sorted_options:
+        for letter, text in options.items():
             print(f"  {letter}. {text}")
 
+        letters = list(options)
+        prompt = f"Your choice ({'/'.join(letters)}): "
+        if answer_sheet is not None:
+            print(f"{prompt}{answer_sheet[i]}")
+            answers.append(answer_sheet[i])
+            continue
         while True:
             try:
-                user_input = input("Your choice (A/B/C/D): ").upper().strip()
-                if user_input in q['options']:
-                    if user_input == q['answer']:
-                        correct_count += 1
+                user_input = input(prompt).upper().strip()
+                if user_input in options:
+                    answers.append(user_input)
                     break
                 else:
-                    print("Invalid input. Please enter A, B, C, or D.")
+                    print(f"Invalid input. Please enter {', '.join(letters[:-1])}, or {letters[-1]}.")
             except (EOFError, KeyboardInterrupt):
                 print("\nQuiz aborted. Exiting.")
                 sys.exit(0)
 
-    score_per_question = TOTAL_QUIZ_SCORE / len(questions)
-    quiz_score = round(correct_count * score_per_question)
-    final_score += quiz_score
-
-    results.append({
-        "name": f"Quiz ({correct_count}/{len(questions)} correct)",
-        "passed": True,
-        "points": quiz_score
-    })
+    correct = score_answers(answers, key)
+    grader.add_result(quiz_result(bank, seed, questions, ''.join(answers), correct), time.monotonic() - start, start)
     print(f"\n--- Quiz Finished ---")
-    print(f"You answered {correct_count} out of {len(questions)} questions correctly.")
+    print(f"You answered {sum(correct)} out of {len(questions)} questions correctly.")
 
-def encrypt_and_save_report():
-    app_dir = os.path.dirname(os.path.realpath(sys.executable))
-    report_file_path = os.path.join(app_dir, "autograding_report.json")
+def read_input(path):
+    """Reads a file, or stdin if the path is '-'."""
+    if path == '-':
+        return sys.stdin.read()
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
 
-    final_results_data = {
-        "score": final_score,
-        "max_score": TOTAL_MAX_SCORE,
-        "test_results": results
-    }
+def report_file_name(student):
+    return re.sub(r'[^\w.@-]+', '_', student) + '.json'
 
-    cipher = AES.new(SECRET_KEY, AES.MODE_EAX)
-    nonce = cipher.nonce
-    ciphertext, tag = cipher.encrypt_and_digest(json.dumps(final_results_data).encode('utf-8'))
-    encrypted_data = {
-        "nonce": b64encode(nonce).decode('utf-8'),
-        "ciphertext": b64encode(ciphertext).decode('utf-8'),
-        "tag": b64encode(tag).decode('utf-8')
-    }
+def read_answer_sheets(text):
+    """
+    Parses a JSONL batch of answer sheets, one {"student": ..., "answers": ...} per line.
 
-    with open(report_file_path, "w") as f:
-        f.write(json.dumps(encrypted_data))
+    Returns:
+        tuple: ([(line number, student, answers)], [(line number, problem)]).
+    """
+    sheets = []
+    problems = []
+    file_names = set()
+    for line_number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            sheet = json.loads(line)
+            student = sheet['student']
+            answers = sheet['answers']
+            if isinstance(answers, list):
+                answers = ' '.join(answers)
+            if not isinstance(student, str) or not student.strip() or not isinstance(answers, str):
+                raise ValueError("'student' must be a name and 'answers' a string or a list of letters")
+        except (ValueError, KeyError, TypeError) as e:
+            problems.append((line_number, f"not an answer sheet: {e}"))
+            continue
+        file_name = report_file_name(student)
+        if file_name in file_names:
+            problems.append((line_number, f"{student}: a sheet of this student was already listed"))
+            continue
+        file_names.add(file_name)
+        sheets.append((line_number, student, parse_answers(answers)))
+    return sheets, problems
 
-    print("\n--- SUBMISSION CREATED ---")
-    print(f"An encrypted submission file has been saved to {report_file_path}.")
-    print("Please submit this file.")
+def score_answer_sheets(bank, batch_path, output_dir):
+    """
+    Scores a batch of answer sheets (--answers-batch) without a container or a keyboard.
 
-if __name__ == "__main__":
-    if not start_container():
+    The batch is scored in one pass: the quiz of every student is drawn from their seed
+    as in the interactive quiz, every question is decoded once for the whole batch, and
+    one encrypted report holding the student's 'Quiz (x/y correct)' result is written
+    per student to output_dir.
+    """
+    try:
+        sheets, problems = read_answer_sheets(read_input(batch_path))
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error: Could not read answer sheets: {e}")
+        sys.exit(1)
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"\n--- Scoring {len(sheets)} answer sheet(s) ---")
+    decoded = {}
+    scored = 0
+    for line_number, student, answers in sheets:
+        start = time.monotonic()
+        seed, questions, key = draw_quiz(bank, student, decoded)
+        problem = check_answers(answers, key)
+        if problem:
+            problems.append((line_number, f"{student}: {problem}"))
+            continue
+        result = quiz_result(bank, seed, questions, answers, score_answers(answers, key))
+        duration = round(time.monotonic() - start, 6)
+        result['duration'] = duration
+        report_path = os.path.join(output_dir, report_file_name(student))
+        # 只评测验部分，满分为测验分
+        grader.write_report(report_path, {"task": TASK_NAME, "score": result['points'], "max_score": TOTAL_QUIZ_SCORE,
+                                          "duration": duration, "test_results": [result]})
+        grader.emit_event("report", student=student, path=report_path, score=result['points'],
+                          max_score=TOTAL_QUIZ_SCORE, name=result['name'])
+        print(f"  - {student}: {result['name']} (+{result['points']}pts) -> {report_path}")
+        scored += 1
+
+    for line_number, problem in sorted(problems):
+        print(f"✗ {batch_path}:{line_number}: {problem}")
+    print(f"\nScored {scored} answer sheet(s), {len(problems)} could not be scored.")
+    print("----------------------------------\n")
+    grader.reports_saved = True
+    if problems:
         sys.exit(1)
 
-    check_operations()
+# --- Grading many containers (--containers / --label) ---
+def find_containers(pattern=None, label=None):
+    """Names of the containers matching a name pattern (e.g. 'lab-*') or a label (KEY or KEY=VALUE)."""
+    names = get_docker().list_containers(label)
+    return sorted(name for name in names if pattern is None or fnmatch.fnmatch(name, pattern))
+
+def grade_container(output, container):
+    """
+    Starts one container if needed and runs the assertions in it (in a worker thread).
+
+    Returns:
+        tuple: (results, or None if the container could not be graded, the
+        container's calls, duration in seconds, captured output).
+    """
+    output.capture()
+    calls = current_check.calls = []
+    start = time.monotonic()
+    results = None
+    try:
+        if start_container(container) is not None:
+            passed = probe_container(container)
+            results = [{"name": name, "passed": passed.get(name, False),
+                        "points": TESTS[name] if passed.get(name, False) else 0} for name, _, _ in ASSERTIONS]
+            for result in results:
+                print(f"{'✓' if result['passed'] else '✗'} {result['name']}: "
+                      f"{'Passed' if result['passed'] else 'Failed'} (+{result['points']}pts)")
+    except DockerError as e:
+        print(f"✗ Could not grade container '{container}'. Error: {e}")
+        results = None
+    except SystemExit:
+        # run_docker_command() 打印错误后调用 sys.exit()，这里只放弃这一个容器
+        results = None
+    finally:
+        current_check.calls = None
+    return results, calls, time.monotonic() - start, output.release()
 
-    quiz_questions = get_quiz_questions()
-    if quiz_questions:
-        run_quiz(quiz_questions)
+def grade_containers(containers, jobs, output_dir):
+    """
+    Grades the operations of many student containers, at most `jobs` at a time.
+
+    Each container is started if needed and probed with one exec, like the single
+    container run, and gets its own encrypted report <container>.json in output_dir
+    (operations only; the quiz is taken by each student). The output of every
+    container is printed as one block as soon as it is done.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"\n--- Grading {len(containers)} container(s), {jobs} at a time ---")
+    start = time.monotonic()
+    failed = []
+    output = ThreadOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(grade_container, output, container): container for container in containers}
+            for future in concurrent.futures.as_completed(futures):
+                container = futures[future]
+                results, calls, duration, text = future.result()
+                print(f"\n[{container}]\n{text}", end='')
+                if results is None:
+                    failed.append(container)
+                    continue
+                score = sum(result['points'] for result in results)
+                report_path = os.path.join(output_dir, report_file_name(container))
+                report = {"task": TASK_NAME, "container": container, "score": score,
+                          "max_score": TOTAL_OPERATIONS_SCORE, "duration": round(duration, 6), "test_results": results}
+                if calls:
+                    report['calls'] = calls
+                grader.write_report(report_path, report)
+                grader.emit_event("report", container=container, path=report_path, score=score,
+                                  max_score=TOTAL_OPERATIONS_SCORE)
+                print(f"Score: {score}/{TOTAL_OPERATIONS_SCORE} -> {report_path}")
+    finally:
+        sys.stdout = output.target
+
+    print(f"\nGraded {len(containers) - len(failed)} container(s) in {time.monotonic() - start:.2f}s, "
+          f"{len(failed)} could not be graded{': ' + ', '.join(sorted(failed)) if failed else '.'}")
+    print("----------------------------------\n")
+    grader.reports_saved = True
+    if failed:
+        sys.exit(1)
+
+CHECKS = [Check(name, check_assertion(name), TESTS[name], fingerprint=container_fingerprint)
+          for name, _, _ in ASSERTIONS]
+
+grader = Grader(TASK_NAME, CHECKS, max_score=TOTAL_MAX_SCORE,
+                report_title="Results for Linux Challenge:", manual_checks=['Quiz'])
+
+def grade():
+    args = grader.args
+    if args.containers or args.label:
+        if args.jobs < 1:
+            print("Error: --jobs must be at least 1.")
+            sys.exit(1)
+        try:
+            containers = find_containers(args.containers, args.label)
+        except DockerError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if not containers:
+            print("Error: No container matches the given name pattern or label.")
+            sys.exit(1)
+        grade_containers(containers, args.jobs, args.output_dir or os.path.join(grader.app_dir, CONTAINER_REPORTS_DIR))
+        return
+
+    if quiz_data is None:
+        print("Error: quiz_data.py not found.")
+        print("Please run the build_quiz.py script first to generate it.")
+        sys.exit(1)
+
+    bank = get_quiz_questions()
+    if args.answers_batch:
+        if bank is None:
+            sys.exit(1)
+        score_answer_sheets(bank, args.answers_batch, args.output_dir or os.path.join(grader.app_dir, ANSWER_REPORTS_DIR))
+        return
+
+    quiz = draw_quiz(bank, args.student) if bank else None
+    answer_sheet = None
+    if args.answers:
+        # 在检查容器之前核对答题卡，避免评完一半才发现答案无效
+        try:
+            answer_sheet = parse_answers(read_input(args.answers))
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Error: Could not read answers: {e}")
+            sys.exit(1)
+        problem = check_answers(answer_sheet, quiz[2]) if quiz else "the quiz could not be loaded"
+        if problem:
+            print(f"Error: {args.answers}: {problem}")
+            sys.exit(1)
+
+    global container_details
+    container_details = start_container()
+    if container_details is None:
+        sys.exit(1)
+
+    print("\n--- Checking Part 1: File System Operations (inside Docker) ---")
+    grader.run_checks()
+
+    if quiz:
+        run_quiz(bank, quiz, answer_sheet)
     else:
         print("Error: Embedded quiz could not be loaded. Skipping quiz.")
-        results.append({"name": "Quiz", "passed": False, "points": 0})
+        grader.add_result({"name": "Quiz", "passed": False, "points": 0})
 
-    print_final_report()
-    encrypt_and_save_report()
+def add_arguments(parser):
+    parser.add_argument("--student", default=default_student(),
+                        help="Who is taking the quiz; every student gets their own questions (default: USER@HOST).")
+    # 运行方式只能选一种：交互式作答、答题卡、批量答题卡或评测多个容器
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--answers", metavar="FILE",
+                      help="Take the quiz answers from FILE ('-' for stdin), e.g. 'B D A C', instead of asking.")
+    mode.add_argument("--answers-batch", metavar="JSONL",
+                      help="Only score the quiz of every answer sheet in JSONL ('-' for stdin), one "
+                           "{\"student\": ..., \"answers\": ...} per line, and write one report per student.")
+    mode.add_argument("--containers", metavar="PATTERN",
+                      help="Grade the operations of every container whose name matches PATTERN, e.g. 'lab-*', "
+                           "and write one report per container.")
+    mode.add_argument("--label", help="Grade every container with this label (KEY or KEY=VALUE), like --containers.")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_CONTAINER_JOBS,
+                        help=f"Containers graded at the same time (default: {DEFAULT_CONTAINER_JOBS}).")
+    parser.add_argument("--output-dir",
+                        help=f"Where --answers-batch and --containers write the reports "
+                             f"(default: {ANSWER_REPORTS_DIR}/ or {CONTAINER_REPORTS_DIR}/ next to the grader).")
+
+def main(argv=None, app_dir=None):
+    """
+    Runs every check of task3 and the quiz, then saves the encrypted report.
+
+    Args:
+        argv (list): Command-line arguments, defaults to sys.argv[1:].
+        app_dir (str): Directory of the task, where the report is saved and from which
+            etc/config is found (two levels up). Defaults to the executable's directory.
+    """
+    grader.main(grade, argv, app_dir, add_arguments=add_arguments)
+
+if __name__ == "__main__":
+    # grade 通过管道读取输出，按行刷新以便实时显示
+    sys.stdout.reconfigure(line_buffering=True)
+    main()
@@ -0,0 +1,42 @@
+import base64
+import importlib
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (REPO_ROOT, os.path.join(REPO_ROOT, 'util'), os.path.join(REPO_ROOT, 'tasks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# 测试用的 AES 密钥
+SECRET_KEY = bytes(range(32))
+# 启动子进程 (如 fake_docker_daemon) 时使用的解释器，util 模块导入时会临时替换 sys.executable
+PYTHON = sys.executable
+
+@pytest.fixture(scope='session')
+def project_root(tmp_path_factory):
+    """A project root laid out like a packed build, with SECRET_KEY in etc/config."""
+    root = tmp_path_factory.mktemp('project')
+    (root / 'etc').mkdir()
+    (root / 'etc' / 'config').write_text(base64.b64encode(SECRET_KEY).decode('ascii'))
+    (root / 'bin').mkdir()
+    return root
+
+@pytest.fixture(scope='session')
+def util_module(project_root):
+    """
+    Imports a util script as if it ran from the packed build under project_root.
+
+    The scripts load their keys from <root>/etc/config at import time, found through
+    the path of the executable.
+    """
+    def load(name):
+        executable = sys.executable
+        sys.executable = str(project_root / 'bin' / name)
+        try:
+            return importlib.import_module(name)
+        finally:
+            sys.executable = executable
+    return load
@@ -0,0 +1,95 @@
+import pytest
+
+from autograding.core import CACHE_FILE_NAME, Check, Grader
+from conftest import SECRET_KEY
+
+class Calls:
+    """Check functions that count how often they ran."""
+
+    def __init__(self):
+        self.counts = {}
+
+    def returning(self, name, result):
+        def func():
+            self.counts[name] = self.counts.get(name, 0) + 1
+            return result
+        return func
+
+def results_by_name(grader):
+    return {result['name']: result for result in grader.results}
+
+def test_checks_are_skipped_when_a_dependency_fails():
+    calls = Calls()
+    grader = Grader('task0', [
+        Check("Build", calls.returning("Build", False), 2),
+        Check("Run", calls.returning("Run", True), 3, depends_on=["Build"]),
+        Check("Output", calls.returning("Output", True), 1, depends_on=["Run"]),
+        Check("Style", calls.returning("Style", (True, 1)), 2),
+    ])
+    grader.run_checks()
+
+    assert [result['name'] for result in grader.results] == ["Build", "Run", "Output", "Style"]
+    results = results_by_name(grader)
+    assert results["Run"]['skipped'] and results["Output"]['skipped']
+    assert calls.counts == {"Build": 1, "Style": 1}
+    # 返回 (passed, points) 的检查只得部分分
+    assert grader.score == 1
+    assert grader.max_score == 8
+
+def test_undeclared_dependency_is_rejected():
+    with pytest.raises(ValueError):
+        Grader('task0', [Check("Run", lambda: True, 1, depends_on=["Build"])])
+
+def make_cached_grader(calls, fingerprints, cache):
+    grader = Grader('task0', [
+        Check(name, calls.returning(name, name != "Broken"), 1, fingerprint=lambda name=name: fingerprints[name])
+        for name in ("Build", "Run", "Broken")
+    ])
+    grader.cache = cache
+    grader.use_cache = True
+    return grader
+
+def test_passed_checks_are_reused_while_their_fingerprint_is_unchanged():
+    calls = Calls()
+    fingerprints = {"Build": ["main.c", 1], "Run": ["binary", 1], "Broken": ["input", 1]}
+    first = make_cached_grader(calls, fingerprints, {})
+    first.run_checks()
+    # 只缓存通过的检查
+    assert set(first.cache) == {"Build", "Run"}
+
+    fingerprints["Run"] = ["binary", 2]
+    second = make_cached_grader(calls, fingerprints, dict(first.cache))
+    second.run_checks()
+    results = results_by_name(second)
+    assert results["Build"].get('cached')
+    assert not results["Run"].get('cached')
+    assert calls.counts == {"Build": 1, "Run": 2, "Broken": 2}
+    assert second.score == 2
+
+def test_cache_is_ignored_with_fresh():
+    calls = Calls()
+    fingerprints = {"Build": 1, "Run": 1, "Broken": 1}
+    first = make_cached_grader(calls, fingerprints, {})
+    first.run_checks()
+    second = make_cached_grader(calls, fingerprints, dict(first.cache))
+    second.use_cache = False
+    second.run_checks()
+    assert calls.counts["Build"] == 2
+
+def test_cache_survives_a_save_and_load(tmp_path):
+    grader = Grader('task0', [])
+    grader.app_dir = str(tmp_path)
+    grader.secret_key = SECRET_KEY
+    grader.cache = {"Build": {"fingerprint": "abc", "points": 2}}
+    grader.save_cache()
+
+    loaded = Grader('task0', [])
+    loaded.app_dir = str(tmp_path)
+    loaded.secret_key = SECRET_KEY
+    loaded.load_cache()
+    assert loaded.cache == grader.cache
+
+    # 被改动的缓存文件被忽略，而不是让评分失败
+    (tmp_path / CACHE_FILE_NAME).write_text('tampered')
+    loaded.load_cache()
+    assert loaded.cache == {}
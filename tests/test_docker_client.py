@@ -0,0 +1,107 @@
+import os
+import struct
+import subprocess
+
+import pytest
+
+from autograding import docker_client
+from autograding.docker_client import DockerCli, DockerClient, demultiplex, get_docker
+from conftest import PYTHON, REPO_ROOT
+
+FAKE_DAEMON = os.path.join(REPO_ROOT, 'util', 'fake_docker_daemon.py')
+
+def start_daemon(socket_path, *args):
+    """Starts util/fake_docker_daemon.py and waits until it listens."""
+    process = subprocess.Popen([PYTHON, FAKE_DAEMON, str(socket_path), *args],
+                               stdout=subprocess.PIPE, text=True)
+    assert 'listening' in process.stdout.readline()
+    return process
+
+def stop_daemon(process):
+    process.terminate()
+    process.communicate(timeout=10)
+
+@pytest.fixture
+def socket_path(tmp_path_factory):
+    # unix socket 路径长度有限，使用较短的临时目录
+    return tmp_path_factory.mktemp('docker') / 'docker.sock'
+
+@pytest.fixture
+def daemon(socket_path):
+    process = start_daemon(socket_path, '--container', 'autograding-task3')
+    yield process
+    stop_daemon(process)
+
+def frame(stream, text):
+    data = text.encode('utf-8')
+    return struct.pack('>BxxxI', stream, len(data)) + data
+
+def test_demultiplex_splits_frames_by_stream():
+    data = frame(1, 'out 1\n') + frame(2, 'err\n') + frame(1, 'out 2\n')
+    assert demultiplex(data) == ('out 1\nout 2\n', 'err\n')
+
+def test_demultiplex_ignores_truncated_header():
+    assert demultiplex(frame(1, 'done') + b'\x01\x00') == ('done', '')
+
+def test_request_reconnects_once_after_daemon_restart(socket_path, daemon):
+    client = DockerClient(str(socket_path))
+    assert client.ping()
+    # 重启守护进程：客户端保留的连接已被对方关闭，下一次请求应重连一次后成功
+    stop_daemon(daemon)
+    restarted = start_daemon(socket_path, '--container', 'autograding-task3')
+    try:
+        assert client.inspect('autograding-task3')['State']['Status'] == 'running'
+    finally:
+        stop_daemon(restarted)
+
+def test_request_fails_when_daemon_is_gone(socket_path, daemon):
+    client = DockerClient(str(socket_path))
+    assert client.ping()
+    stop_daemon(daemon)
+    with pytest.raises(docker_client.DockerError):
+        client.request('GET', '/_ping')
+
+def test_run_pulls_missing_image(socket_path, daemon):
+    client = DockerClient(str(socket_path))
+    assert not client.image_exists('hello-world')
+    exit_code, stdout, _ = client.run('hello-world')
+    assert exit_code == 0
+    assert 'Hello from Docker!' in stdout
+    assert client.image_exists('hello-world')
+
+def test_run_reports_pull_error_when_offline(socket_path):
+    process = start_daemon(socket_path, '--offline')
+    try:
+        exit_code, _, stderr = DockerClient(str(socket_path)).run('hello-world')
+    finally:
+        stop_daemon(process)
+    assert exit_code == 1
+    assert 'offline' in stderr
+
+@pytest.fixture
+def fresh_get_docker():
+    get_docker.cache_clear()
+    yield get_docker
+    get_docker.cache_clear()
+
+def test_get_docker_uses_socket_when_daemon_answers(monkeypatch, socket_path, daemon, fresh_get_docker):
+    monkeypatch.setenv('DOCKER_HOST', f"unix://{socket_path}")
+    client = fresh_get_docker()
+    assert isinstance(client, DockerClient)
+    assert client.socket_path == str(socket_path)
+
+def test_get_docker_falls_back_to_cli_without_socket(monkeypatch, tmp_path, fresh_get_docker):
+    monkeypatch.setenv('DOCKER_HOST', f"unix://{tmp_path / 'missing.sock'}")
+    assert isinstance(fresh_get_docker(), DockerCli)
+
+def test_get_docker_uses_cli_for_remote_host(monkeypatch, fresh_get_docker):
+    monkeypatch.setenv('DOCKER_HOST', 'tcp://docker.example:2376')
+    assert isinstance(fresh_get_docker(), DockerCli)
+
+def test_image_id_of_a_pulled_image(socket_path, daemon):
+    client = DockerClient(str(socket_path))
+    assert client.image_id('hello-world') is None
+    assert client.pull('hello-world') is None
+    image_id = client.image_id('hello-world')
+    assert image_id.startswith('sha256:')
+    assert client.image_id('hello-world:latest') == image_id
@@ -0,0 +1,69 @@
+import base64
+import json
+
+import pytest
+
+from autograding.envelope import FLAG_COMPRESSED, decrypt_envelope, decrypt_with_key_ring, encrypt_report, parse_envelope
+from autograding.keys import KeyRing, get_key_id
+from conftest import SECRET_KEY
+
+OTHER_KEY = bytes(range(100, 116))
+
+REPORT = {"task": "task1", "score": 7, "max_score": 10,
+          "test_results": [{"name": f"Check {i}", "passed": i % 2 == 0, "points": 1} for i in range(40)]}
+
+def flip_byte(envelope, index):
+    """Returns a v2 envelope with one byte of its frame changed."""
+    frame = bytearray(base64.b64decode(envelope))
+    frame[index] ^= 0x01
+    return base64.b64encode(bytes(frame)).decode('ascii')
+
+@pytest.mark.parametrize('version', [1, 2])
+def test_round_trip(version):
+    envelope = encrypt_report(REPORT, SECRET_KEY, version=version)
+    assert parse_envelope(envelope)['version'] == version
+    assert parse_envelope(envelope)['key_id'] == get_key_id(SECRET_KEY)
+    assert decrypt_envelope(envelope, SECRET_KEY) == REPORT
+
+def test_v2_compresses_large_reports_only():
+    assert parse_envelope(encrypt_report(REPORT, SECRET_KEY))['flags'] & FLAG_COMPRESSED
+    small = {"task": "task1", "score": 0}
+    envelope = encrypt_report(small, SECRET_KEY)
+    assert not parse_envelope(envelope)['flags'] & FLAG_COMPRESSED
+    assert decrypt_envelope(envelope, SECRET_KEY) == small
+
+@pytest.mark.parametrize('index', [1, 10, -1])
+def test_tampered_v2_envelope_is_rejected(index):
+    # 1: 标志位 (附加数据)，10: nonce，-1: tag
+    envelope = flip_byte(encrypt_report(REPORT, SECRET_KEY), index)
+    with pytest.raises(ValueError):
+        decrypt_envelope(envelope, SECRET_KEY)
+
+def test_tampered_v1_envelope_is_rejected():
+    encrypted_data = json.loads(encrypt_report(REPORT, SECRET_KEY, version=1))
+    ciphertext = bytearray(base64.b64decode(encrypted_data['ciphertext']))
+    ciphertext[0] ^= 0x01
+    encrypted_data['ciphertext'] = base64.b64encode(bytes(ciphertext)).decode('ascii')
+    with pytest.raises(ValueError):
+        decrypt_envelope(json.dumps(encrypted_data), SECRET_KEY)
+
+def test_envelope_from_another_key_is_rejected():
+    with pytest.raises(ValueError, match="another key"):
+        decrypt_envelope(encrypt_report(REPORT, OTHER_KEY), SECRET_KEY)
+
+def test_malformed_envelope_is_rejected():
+    with pytest.raises(ValueError):
+        decrypt_envelope("not an envelope", SECRET_KEY)
+
+def test_key_ring_opens_envelopes_of_every_key():
+    key_ring = KeyRing([SECRET_KEY, OTHER_KEY])
+    assert decrypt_with_key_ring(encrypt_report(REPORT, OTHER_KEY), key_ring) == REPORT
+
+    # 没有 key_id 的旧信封：逐个尝试，打开它的密钥移到最前
+    encrypted_data = json.loads(encrypt_report(REPORT, OTHER_KEY, version=1))
+    del encrypted_data['key_id']
+    assert decrypt_with_key_ring(json.dumps(encrypted_data), key_ring) == REPORT
+    assert key_ring.legacy_order[0] == get_key_id(OTHER_KEY)
+
+    with pytest.raises(ValueError, match="unknown key id"):
+        decrypt_with_key_ring(encrypt_report(REPORT, bytes(16)), key_ring)
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from autograding.envelope import encrypt_report
+from conftest import SECRET_KEY
+from intake_server import ResultLog
+from seen_index import SeenIndex, envelope_digests
+
+def submission(score):
+    return {"task": "task1", "score": score, "max_score": 10}, envelope_digests(encrypt_report({"score": score}, SECRET_KEY))
+
+def read_log(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+async def with_log(log, body):
+    task = asyncio.create_task(log.run())
+    try:
+        return await body()
+    finally:
+        task.cancel()
+
+@pytest.fixture
+def log(tmp_path):
+    log = ResultLog(str(tmp_path / 'submissions.jsonl'), SeenIndex(str(tmp_path / 'seen.db'), capacity=1000))
+    yield log
+    log.close()
+
+def test_batch_is_logged_with_duplicates_flagged(tmp_path, log):
+    report, digests = submission(7)
+    other_report, other_digests = submission(3)
+
+    async def body():
+        return await asyncio.gather(log.append('alice', report, digests), log.append('bob', report, digests),
+                                    log.append('carol', other_report, other_digests))
+
+    assert asyncio.run(with_log(log, body)) == [None, 'intake:alice', None]
+    rows = read_log(tmp_path / 'submissions.jsonl')
+    assert [row['id'] for row in rows] == ['alice', 'bob', 'carol']
+    assert rows[1]['duplicate_of'] == 'intake:alice'
+
+def test_index_is_used_off_the_event_loop(log):
+    threads = []
+    check_and_add = log.seen.check_and_add
+    def record_thread(*args):
+        threads.append(threading.get_ident())
+        return check_and_add(*args)
+    log.seen.check_and_add = record_thread
+
+    asyncio.run(with_log(log, lambda: log.append('alice', *submission(7))))
+    assert threads and threading.get_ident() not in threads
+
+def test_cancelled_submission_does_not_stop_the_log(tmp_path, log):
+    async def body():
+        # 客户端断开：等待中的提交被取消，日志任务仍须继续处理后面的提交
+        abandoned = asyncio.create_task(log.append('alice', *submission(7)))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        return await asyncio.wait_for(log.append('bob', *submission(3)), 5)
+
+    assert asyncio.run(with_log(log, body)) is None
+    assert [row['id'] for row in read_log(tmp_path / 'submissions.jsonl')] == ['alice', 'bob']
+
+def test_failed_batch_is_undone_and_reported(tmp_path, log):
+    check_and_add = log.seen.check_and_add
+    def fail_once(*args):
+        log.seen.check_and_add = check_and_add
+        check_and_add(*args)
+        raise sqlite3.OperationalError("database is locked")
+    log.seen.check_and_add = fail_once
+    report, digests = submission(7)
+
+    async def body():
+        with pytest.raises(sqlite3.OperationalError):
+            await log.append('alice', report, digests)
+        return await log.append('alice', report, digests)
+
+    # 失败的那一批已回滚，重新提交时不算重复
+    assert asyncio.run(with_log(log, body)) is None
+    assert [row['id'] for row in read_log(tmp_path / 'submissions.jsonl')] == ['alice']
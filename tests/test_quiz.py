@@ -0,0 +1,110 @@
+import importlib.util
+import os
+
+import pytest
+
+from autograding.quiz import (QuizBank, SeededStream, allocate, answer_key, decode_mask, derive_seed,
+                              encode_mask, question_id, sample_quiz, score_answers, verify_quiz)
+from conftest import REPO_ROOT
+
+TAGS = {'files': 6, 'permissions': 4, '': 2}
+# derive_seed('task3', 'alice') 与它在下面的题库中抽到的 5 道题 (题号)
+PINNED_SEED = '6851335017a97f94'
+PINNED_NUMBERS = [3, 9, 7, 12, 5]
+
+def write_qmd(path):
+    blocks = []
+    number = 0
+    for tag, size in TAGS.items():
+        for _ in range(size):
+            number += 1
+            block = [f"Question {number}?", "*A. right", "B. wrong", "C. also wrong", "D. not this one"]
+            if tag:
+                block.append(f"Tag: {tag}")
+            blocks.append('\n'.join(block))
+    path.write_text('---\n' + '\n---\n'.join(blocks) + '\n', encoding='utf-8')
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(scope='module')
+def bank(tmp_path_factory):
+    """A bank of 12 questions generated by build_quiz.py: 6 tagged 'files', 4 'permissions', 2 untagged."""
+    build_quiz = load_module('build_quiz', os.path.join(REPO_ROOT, 'tasks', 'task3', 'build_quiz.py'))
+    directory = tmp_path_factory.mktemp('quiz')
+    write_qmd(directory / 'questions.qmd')
+    build_quiz.generate_quiz_module(str(directory / 'questions.qmd'), str(directory / 'quiz_data.py'), use_cache=False)
+    return QuizBank(load_module('quiz_data', str(directory / 'quiz_data.py')))
+
+def test_pinned_seed_draws_known_questions(bank):
+    # 同一学生在任何 Python 版本下都必须抽到同一份题目，改动抽题算法会让已有报告无法校验
+    seed = derive_seed('task3', 'alice')
+    assert seed == PINNED_SEED
+    questions, _ = answer_key(bank, seed, 5)
+    assert [question['id'] for question in questions] == [question_id(f"Question {number}?") for number in PINNED_NUMBERS]
+
+@pytest.mark.parametrize('population, count', [(10, 10), (1000, 7), (50_000, 30), (1, 1), (5, 0)])
+def test_choose_draws_distinct_numbers(population, count):
+    chosen = SeededStream('seed', 'test').choose(population, count)
+    assert len(chosen) == len(set(chosen)) == count
+    assert all(0 <= number < population for number in chosen)
+
+def test_choose_is_deterministic():
+    assert SeededStream('seed', 'test').choose(100, 5) == SeededStream('seed', 'test').choose(100, 5)
+    assert SeededStream('seed', 'test').choose(100, 5) != SeededStream('other', 'test').choose(100, 5)
+
+def test_allocate_is_proportional_and_capped():
+    assert allocate({'files': 6, 'permissions': 4, '': 2}, 6) == {'files': 3, 'permissions': 2, '': 1}
+    # 最大余数法，余数相同时按标签名
+    assert allocate({'a': 1, 'b': 1, 'c': 1}, 2) == {'a': 1, 'b': 1, 'c': 0}
+    assert allocate({'files': 6, 'permissions': 4}, 50) == {'files': 6, 'permissions': 4}
+    assert allocate({}, 5) == {}
+
+def test_sample_is_stratified_by_tag(bank):
+    for student in ('alice', 'bob', 'carol'):
+        positions = sample_quiz(bank, derive_seed('task3', student), 6)
+        assert len(set(positions)) == 6
+        tags = [bank[position]['tag'] for position in positions]
+        assert (tags.count('files'), tags.count('permissions'), tags.count('')) == (3, 2, 1)
+
+@pytest.mark.parametrize('correct, mask', [([], '0'), ([True, False, True], '5'), ([False] * 3 + [True], '8')])
+def test_mask_round_trip(correct, mask):
+    assert encode_mask(correct) == mask
+    assert decode_mask(mask, len(correct)) == correct
+
+def quiz_result(bank, student, answers):
+    """A report's quiz entry, as task3 records it."""
+    seed = derive_seed('task3', student)
+    questions, key = answer_key(bank, seed, 5)
+    correct = score_answers(answers, key)
+    return {"name": f"Quiz ({sum(correct)}/{len(questions)} correct)", "seed": seed, "bank_id": bank.bank_id,
+            "question_ids": [question['id'] for question in questions], "answers": answers,
+            "correct_mask": encode_mask(correct)}
+
+def correct_answers(bank, student):
+    _, key = answer_key(bank, derive_seed('task3', student), 5)
+    return ''.join(letter for _, letter in key)
+
+def test_verify_quiz_accepts_a_recorded_quiz(bank):
+    assert verify_quiz(bank, quiz_result(bank, 'alice', correct_answers(bank, 'alice'))) == []
+    assert verify_quiz(bank, quiz_result(bank, 'alice', 'AAAAA')) == []
+
+def test_verify_quiz_finds_tampering(bank):
+    result = quiz_result(bank, 'alice', 'AAAAA')
+    result['correct_mask'] = '1f'
+    assert verify_quiz(bank, result) == ["the recorded answers do not match the correct_mask"]
+
+    result = quiz_result(bank, 'alice', correct_answers(bank, 'alice'))
+    result['name'] = "Quiz (4/5 correct)"
+    assert verify_quiz(bank, result) == ["the number of correct answers does not match the answers"]
+
+    result = quiz_result(bank, 'alice', 'AAAAA')
+    result['question_ids'] = quiz_result(bank, 'bob', 'AAAAA')['question_ids']
+    assert verify_quiz(bank, result) == ["the questions differ from the ones drawn for this seed"]
+
+    result = quiz_result(bank, 'alice', 'AAAAA')
+    result['bank_id'] = 'another'
+    assert len(verify_quiz(bank, result)) == 1
@@ -0,0 +1,46 @@
+import os
+
+from autograding.envelope import encrypt_report
+from conftest import SECRET_KEY
+
+def make_report(task, score, max_score):
+    return {
+        'task': task,
+        'score': score,
+        'max_score': max_score,
+        'test_results': [{'name': 'Check', 'passed': score > 0, 'points': score}],
+    }
+
+def write_report(path, report):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(encrypt_report(report, SECRET_KEY))
+
+def submissions(connection):
+    return sorted(connection.execute("SELECT submission, task FROM reports"))
+
+def test_ingest_directory_and_glob_name_submissions_by_folder(tmp_path, util_module):
+    report_index = util_module('report_index')
+    subs = tmp_path / 'subs'
+    write_report(subs / 'alice' / 'autograding_report.json', make_report('task1', 10, 10))
+    write_report(subs / 'bob' / 'autograding_report.json', make_report('task1', 5, 10))
+    expected = [('alice', 'task1'), ('bob', 'task1')]
+
+    connection = report_index.open_index(':memory:')
+    assert report_index.ingest(connection, str(subs), 'autograding_report.json') == (2, 0, 0)
+    assert submissions(connection) == expected
+
+    connection = report_index.open_index(':memory:')
+    target = os.path.join(str(subs), '*', 'autograding_report.json')
+    assert report_index.ingest(connection, target, 'autograding_report.json') == (2, 0, 0)
+    assert submissions(connection) == expected
+
+def test_best_score_keeps_its_own_max_score(tmp_path, util_module):
+    report_index = util_module('report_index')
+    subs = tmp_path / 'subs'
+    # 满分不同的两份报告：最高分 8/10 必须与它自己的满分成对，而不是 8/20
+    write_report(subs / 'alice' / 'first' / 'autograding_report.json', make_report('task1', 8, 10))
+    write_report(subs / 'alice' / 'second' / 'autograding_report.json', make_report('task1', 6, 20))
+
+    connection = report_index.open_index(':memory:')
+    report_index.ingest(connection, str(subs), 'autograding_report.json')
+    assert connection.execute(report_index.BEST_SCORES).fetchall() == [('alice', 'task1', 8.0, 10.0)]
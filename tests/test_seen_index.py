@@ -0,0 +1,69 @@
+import hashlib
+import os
+
+from autograding.envelope import encrypt_report
+from conftest import SECRET_KEY
+from seen_index import BloomFilter, SeenIndex, envelope_digests
+
+def digest(value):
+    return hashlib.sha256(str(value).encode('utf-8')).digest()
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for value in range(1000):
+        bloom.add(digest(value))
+    assert all(digest(value) in bloom for value in range(1000))
+    false_positives = sum(digest(value) in bloom for value in range(1000, 11000))
+    assert false_positives < 300
+
+def test_bloom_filter_restores_from_its_bits():
+    bloom = BloomFilter(capacity=100)
+    bloom.add(digest('a'))
+    assert digest('a') in BloomFilter(capacity=100, bits=bloom.bits)
+
+def test_envelope_digests_ignore_other_files():
+    assert len(envelope_digests(encrypt_report({"score": 1}, SECRET_KEY))) == 2
+    assert envelope_digests("not an envelope") == []
+
+def test_copied_file_is_a_duplicate_of_the_first(tmp_path):
+    seen = SeenIndex(str(tmp_path / 'seen.db'), capacity=1000)
+    digests = envelope_digests(encrypt_report({"score": 1}, SECRET_KEY))
+    assert seen.check_and_add('alice/autograding_report.json', digests) is None
+    # 重新处理同一批次不算重复
+    assert seen.check_and_add('alice/autograding_report.json', digests) is None
+    assert seen.check_and_add('bob/autograding_report.json', digests) == 'alice/autograding_report.json'
+    other = envelope_digests(encrypt_report({"score": 1}, SECRET_KEY))
+    assert seen.check_and_add('carol/autograding_report.json', other) is None
+
+def test_duplicates_are_found_after_commit_and_reopening(tmp_path):
+    path = str(tmp_path / 'seen.db')
+    digests = envelope_digests(encrypt_report({"score": 1}, SECRET_KEY))
+    seen = SeenIndex(path, capacity=1000)
+    seen.check_and_add('alice', digests)
+    seen.close()
+
+    seen = SeenIndex(path, capacity=1000)
+    assert seen.bloom_saved
+    seen.check_and_add('bob', envelope_digests(encrypt_report({"score": 2}, SECRET_KEY)))
+    seen.commit()
+    # commit() 之后保存的过滤器已过期，被删除，重新打开时由数据库重建
+    assert not os.path.exists(seen.bloom_path)
+    seen.connection.close()
+
+    seen = SeenIndex(path, capacity=1000)
+    assert not seen.bloom_saved
+    assert seen.check_and_add('mallory', digests) == 'alice'
+
+def test_rolled_back_digests_are_forgotten(tmp_path):
+    path = str(tmp_path / 'seen.db')
+    digests = envelope_digests(encrypt_report({"score": 1}, SECRET_KEY))
+    seen = SeenIndex(path, capacity=1000)
+    seen.check_and_add('alice', digests)
+    seen.rollback()
+    # 过滤器仍保留这些位，但数据库中已没有记录，因此不算重复
+    assert digests[0] in seen.bloom
+    assert seen.check_and_add('bob', digests) is None
+    seen.close()
+
+    seen = SeenIndex(path, capacity=1000)
+    assert seen.check_and_add('carol', digests) == 'bob'
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from autograding.envelope import decrypt_envelope, encrypt_v1, encrypt_v2
+
+def make_report(checks, calls):
+    """Builds a report shaped like the graders' (per-check timings and docker calls)."""
+    results = []
+    for index in range(checks):
+        results.append({
+            "name": f"Check {index + 1} (container state)",
+            "passed": index % 3 != 0,
+            "points": 5 if index % 3 else 0,
+            "start": round(index * 0.0123, 6),
+            "duration": 0.045678,
+            "timings": {"exec": 0.031234, "parse": 0.000412},
+            "calls": [{"call": "docker exec", "start": round(index * 0.0123 + call * 0.001, 6), "duration": 0.012345}
+                      for call in range(calls)],
+        })
+    return {"task": "task3", "score": 70, "max_score": 100, "duration": 1.234567, "test_results": results}
+
+def measure(function, argument, runs):
+    """Returns the median seconds per call of function(argument) over `runs` repetitions of a batch."""
+    batch = 200
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _ in range(batch):
+            function(argument)
+        timings.append((time.perf_counter() - start) / batch)
+    return statistics.median(timings)
+
+def main(checks, calls, runs, as_json):
+    """
+    Compares the v1 (JSON, AES-EAX) and v2 (framed, AES-GCM, zlib) report envelopes.
+
+    For a synthetic report of `checks` checks with `calls` recorded calls each, prints
+    the envelope size and the encrypt/decrypt time and throughput (of the report JSON).
+    """
+    secret_key = os.urandom(32)
+    report = make_report(checks, calls)
+    plaintext = json.dumps(report).encode('utf-8')
+
+    # 与 encrypt_report 相同：v1 使用默认的 JSON 序列化，v2 使用紧凑格式
+    formats = {
+        "v1 (EAX, JSON/Base64)":
+            lambda data: encrypt_v1(json.dumps(data).encode('utf-8'), secret_key),
+        "v2 (GCM, uncompressed)":
+            lambda data: encrypt_v2(json.dumps(data, separators=(',', ':')).encode('utf-8'), secret_key, compress=False),
+        "v2 (GCM, zlib)":
+            lambda data: encrypt_v2(json.dumps(data, separators=(',', ':')).encode('utf-8'), secret_key),
+    }
+    results = {}
+    for label, encrypt in formats.items():
+        envelope = encrypt(report)
+        # 计时包含 JSON 的序列化与解析，与评测程序和 decrypt_report 实际的工作量一致
+        encrypt_seconds = measure(encrypt, report, runs)
+        decrypt_seconds = measure(lambda data: decrypt_envelope(data, secret_key), envelope, runs)
+        results[label] = {
+            "size": len(envelope),
+            "encrypt_us": round(encrypt_seconds * 1e6, 1),
+            "decrypt_us": round(decrypt_seconds * 1e6, 1),
+            "encrypt_mb_s": round(len(plaintext) / encrypt_seconds / 1e6, 1),
+            "decrypt_mb_s": round(len(plaintext) / decrypt_seconds / 1e6, 1),
+        }
+
+    if as_json:
+        print(json.dumps({"report_bytes": len(plaintext), "checks": checks, "calls": calls, "formats": results}, indent=2))
+        return
+
+    print(f"\n--- ENVELOPE BENCHMARK (report of {len(plaintext)} bytes, {checks} checks) ---")
+    print(f"  {'Format':<26} {'size':>9} {'encrypt':>18} {'decrypt':>18}")
+    for label, row in results.items():
+        print(f"  {label:<26} {row['size']:>7} B "
+              f"{row['encrypt_us']:>8.1f} us {row['encrypt_mb_s']:>5.1f} MB/s "
+              f"{row['decrypt_us']:>8.1f} us {row['decrypt_mb_s']:>5.1f} MB/s")
+    print("----------------------------------\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the size and speed of the v1 and v2 report envelopes.")
+    parser.add_argument("--checks", type=int, default=20, help="Number of checks in the synthetic report.")
+    parser.add_argument("--calls", type=int, default=3, help="Number of recorded calls per check.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of timed batches per measurement.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+    args = parser.parse_args()
+    main(args.checks, args.calls, args.runs, args.json)
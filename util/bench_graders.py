@@ -0,0 +1,266 @@
+import argparse
+import base64
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS_DIR = os.path.join(PROJECT_ROOT, 'tasks')
+DEFAULT_TASKS = ['task1', 'task2', 'task3']
+
+# 假 docker 每条子命令的默认延迟 (秒)，大致对应本地守护进程上的真实耗时
+DEFAULT_LATENCIES = {
+    "info": 0.05,
+    "inspect": 0.03,
+    "start": 0.3,
+    "exec": 0.05,
+    "run": 0.8,
+    "image": 0.03,
+    "pull": 2.0,
+    "load": 0.5,
+}
+
+# 假的 docker 命令：按 FAKE_DOCKER_LATENCIES 延迟，容器状态保存在 FAKE_DOCKER_STATE 中，
+# exec 的命令在 FAKE_DOCKER_ROOT (容器的文件系统) 下执行
+FAKE_DOCKER = r'''
+import json, os, re, subprocess, sys, time
+
+args = sys.argv[1:]
+latencies = json.loads(os.environ.get('FAKE_DOCKER_LATENCIES', '{}'))
+state_path = os.environ['FAKE_DOCKER_STATE']
+root = os.environ['FAKE_DOCKER_ROOT']
+with open(state_path) as f:
+    state = json.load(f)
+
+def save():
+    with open(state_path, 'w') as f:
+        json.dump(state, f)
+
+def in_container(text):
+    # 把容器内的绝对路径 (其第一级目录存在于 FAKE_DOCKER_ROOT 中) 改写到 FAKE_DOCKER_ROOT 下
+    def rewrite(match):
+        if os.path.exists(os.path.join(root, match.group(1))):
+            return os.path.join(root, match.group(1))
+        return match.group(0)
+    return re.sub(r"(?<![\w./-])/([\w.-]+)", rewrite, text)
+
+command = args[0] if args else ''
+time.sleep(latencies.get(command, 0))
+container = state.get('container')
+
+if command == 'info':
+    print(json.dumps({"ID": "fake-daemon", "ServerVersion": "fake"}))
+elif command == 'inspect':
+    if container is None or args[1] != container['Name']:
+        sys.stderr.write(f"Error: No such object: {args[1]}\n")
+        sys.exit(1)
+    print(json.dumps([{"Id": container['Id'], "State": container['State']}]))
+elif command == 'start':
+    container['State'] = {"Status": "running", "StartedAt": time.strftime('%Y-%m-%dT%H:%M:%S')}
+    save()
+elif command == 'exec':
+    if container is None or container['State']['Status'] != 'running':
+        sys.stderr.write("Error: container is not running\n")
+        sys.exit(1)
+    process = subprocess.run([in_container(arg) for arg in args[2:]])
+    sys.exit(process.returncode)
+elif command == 'image':
+    sys.exit(0 if args[2] in state['images'] else 1)
+elif command in ('pull', 'load'):
+    state['images'].append('hello-world')
+    save()
+elif command == 'run':
+    if 'hello-world' not in state['images']:
+        time.sleep(latencies.get('pull', 0))
+    print("\nHello from Docker!\nThis message shows that your installation appears to be working correctly.")
+else:
+    sys.stderr.write(f"fake docker: unsupported command {command}\n")
+    sys.exit(1)
+'''
+
+# 在子进程中运行一个任务：统计它启动的子进程数，并把用户加入 docker 组 (假 docker 不检查权限)
+RUNNER = r'''
+import json, os, sys
+task_name, app_dir, count_path = sys.argv[1:4]
+subprocesses = [0]
+def audit(event, args):
+    if event == 'subprocess.Popen':
+        subprocesses[0] += 1
+sys.addaudithook(audit)
+
+from autograding import probes
+groups = probes.user_groups
+probes.user_groups = lambda: groups() | {'docker'}
+
+module = __import__(task_name)
+try:
+    module.main(['--fresh', '--format', 'jsonl'], app_dir)
+finally:
+    with open(count_path, 'w') as f:
+        f.write(str(subprocesses[0]))
+'''
+
+def make_sandbox(base_dir, container_state, image_present):
+    """
+    Creates the temporary project the graders run in: an AES key in etc/config, a
+    directory per task for the reports, the fake docker on PATH and its state.
+    """
+    os.makedirs(os.path.join(base_dir, 'etc'))
+    with open(os.path.join(base_dir, 'etc', 'config'), 'w') as f:
+        f.write(base64.b64encode(os.urandom(32)).decode('ascii'))
+    for task_name in DEFAULT_TASKS:
+        os.makedirs(os.path.join(base_dir, 'tasks', task_name))
+
+    bin_dir = os.path.join(base_dir, 'bin')
+    os.makedirs(bin_dir)
+    docker_path = os.path.join(bin_dir, 'docker')
+    with open(docker_path, 'w') as f:
+        f.write(f"#!{sys.executable}\n{FAKE_DOCKER}")
+    os.chmod(docker_path, 0o755)
+
+    # 容器的文件系统：已完成 task3 第一部分的状态
+    root = os.path.join(base_dir, 'container')
+    for directory in ('challenge', os.path.join('opt', 'challenge')):
+        os.makedirs(os.path.join(root, directory))
+        with open(os.path.join(root, directory, 'data.txt'), 'w') as f:
+            f.write("Docker is awesome!\n")
+
+    state = {"images": ['hello-world'] if image_present else [], "container": None}
+    if container_state != 'missing':
+        state['container'] = {"Id": "f" * 64, "Name": "autograding-task3",
+                              "State": {"Status": container_state, "StartedAt": "2024-01-01T00:00:00"}}
+    with open(os.path.join(base_dir, 'state.json'), 'w') as f:
+        json.dump(state, f)
+
+    # task3 的题库由 build_quiz.py 生成
+    quiz_dir = os.path.join(base_dir, 'quiz')
+    os.makedirs(quiz_dir)
+    subprocess.run([sys.executable, 'build_quiz.py', '--qmd', 'questions.qmd',
+                    '--output', os.path.join(quiz_dir, 'quiz_data.py')],
+                   cwd=os.path.join(TASKS_DIR, 'task3'), check=True, stdout=subprocess.DEVNULL)
+    return root
+
+def run_task_once(base_dir, task_name, latencies):
+    """
+    Runs one task end to end against the fake docker.
+
+    Returns:
+        dict: 'wall' time in seconds, 'subprocesses' started by the grader, and the
+        'checks' durations from the task's JSONL events.
+    """
+    env = dict(os.environ)
+    env.update({
+        "PATH": os.path.join(base_dir, 'bin') + os.pathsep + env.get('PATH', ''),
+        "PYTHONPATH": os.pathsep.join([PROJECT_ROOT, os.path.join(TASKS_DIR, task_name), os.path.join(base_dir, 'quiz')]),
+        # 不使用本机的 Docker 守护进程，让客户端退回调用 docker 命令
+        "DOCKER_HOST": f"unix://{os.path.join(base_dir, 'no-daemon.sock')}",
+        "FAKE_DOCKER_LATENCIES": json.dumps(latencies),
+        "FAKE_DOCKER_STATE": os.path.join(base_dir, 'state.json'),
+        "FAKE_DOCKER_ROOT": os.path.join(base_dir, 'container'),
+    })
+    count_path = os.path.join(base_dir, 'subprocesses')
+    app_dir = os.path.join(base_dir, 'tasks', task_name)
+
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-c', RUNNER, task_name, app_dir, count_path],
+                             env=env, input="A\n" * 200, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+
+    checks = {}
+    for line in process.stdout.splitlines():
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        if event.get('event') == 'check':
+            checks[event['name'].split(' (')[0]] = event['duration']
+    with open(count_path) as f:
+        subprocesses = int(f.read())
+    return {"wall": wall, "subprocesses": subprocesses, "checks": checks, "exit_code": process.returncode}
+
+def distribution(values):
+    """Summarizes a list of durations (seconds) as min/median/p95/max."""
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {"runs": len(ordered), "min": round(ordered[0], 6), "median": round(statistics.median(ordered), 6),
+            "p95": round(p95, 6), "max": round(ordered[-1], 6)}
+
+def main(tasks, runs, latencies, container_state, image_present, output):
+    """
+    Benchmarks the graders end to end without Docker, network or the real key.
+
+    Every task is run `runs` times in a fresh interpreter. The results (wall time,
+    number of subprocesses and per-check latency distributions) are written as JSON.
+    """
+    base_dir = tempfile.mkdtemp(prefix='autograding-bench-')
+    try:
+        make_sandbox(base_dir, container_state, image_present)
+        state_path = os.path.join(base_dir, 'state.json')
+        with open(state_path) as f:
+            initial_state = f.read()
+
+        results = {}
+        for task_name in tasks:
+            samples = []
+            for _ in range(runs):
+                # 每次运行前恢复容器与镜像的初始状态
+                with open(state_path, 'w') as f:
+                    f.write(initial_state)
+                samples.append(run_task_once(base_dir, task_name, latencies))
+            check_names = list(dict.fromkeys(name for sample in samples for name in sample['checks']))
+            results[task_name] = {
+                "wall": distribution([sample['wall'] for sample in samples]),
+                "subprocesses": distribution([sample['subprocesses'] for sample in samples]),
+                "failed_runs": sum(1 for sample in samples if sample['exit_code'] != 0),
+                "checks": {name: distribution([sample['checks'][name] for sample in samples if name in sample['checks']])
+                           for name in check_names},
+            }
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+    report = {
+        "runs": runs,
+        "latencies": latencies,
+        "container_state": container_state,
+        "image_present": image_present,
+        "python": sys.version.split()[0],
+        "tasks": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + "\n")
+        print(f"Benchmark results saved to {output}")
+    else:
+        print(text)
+
+def parse_latency(value):
+    command, _, seconds = value.partition('=')
+    if command not in DEFAULT_LATENCIES:
+        raise argparse.ArgumentTypeError(f"unknown docker command '{command}' (known: {', '.join(DEFAULT_LATENCIES)})")
+    try:
+        return command, float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid latency '{seconds}' for '{command}'")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the graders against a fake docker command and a temporary key.")
+    parser.add_argument("--tasks", nargs='+', default=DEFAULT_TASKS, choices=DEFAULT_TASKS, help="Tasks to run (default: all).")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per task.")
+    parser.add_argument("--latency", action='append', default=[], type=parse_latency, metavar='CMD=SEC',
+                        help="Latency of a fake docker command, e.g. exec=0.1 (repeatable).")
+    parser.add_argument("--container-state", choices=['running', 'exited', 'missing'], default='running',
+                        help="State of the task3 container at the start of every run.")
+    parser.add_argument("--no-image", action='store_true', help="Start every run without the hello-world image.")
+    parser.add_argument("-o", "--output", help="Write the JSON results to this file instead of stdout.")
+
+    args = parser.parse_args()
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+    main(args.tasks, args.runs, {**DEFAULT_LATENCIES, **dict(args.latency)},
+         args.container_state, not args.no_image, args.output)
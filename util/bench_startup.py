@@ -0,0 +1,62 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_TASKS = ['task1', 'task2', 'task3']
+
+def time_command(command, runs):
+    """Runs the command `runs` times (stdin closed, output discarded) and returns the wall times."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def print_timing(label, timings):
+    print(f"  {label:<28} median {statistics.median(timings) * 1000:8.1f} ms   "
+          f"min {min(timings) * 1000:8.1f} ms")
+
+def main(tasks_dir, tasks, runs):
+    """
+    Compares the startup cost of the per-task executables with the single grade binary.
+
+    `taskN --help` measures what every task executable pays before grading starts
+    (onefile unpack, interpreter start, imports). `grade --exec` and `grade` then run
+    the same checks as separate executables and in-process, so their difference is
+    the startup cost saved by the single binary.
+    """
+    grade_path = os.path.join(tasks_dir, 'grade')
+    if not os.path.exists(grade_path):
+        print(f"Error: grade executable not found at {grade_path}")
+        sys.exit(1)
+
+    print(f"\n--- STARTUP BENCHMARK ({runs} runs each) ---")
+    print("Task executables (startup only):")
+    for task_name in tasks:
+        task_path = os.path.join(tasks_dir, task_name, task_name)
+        if os.path.exists(task_path):
+            print_timing(f"{task_name} --help", time_command([task_path, '--help'], runs))
+        else:
+            print(f"  {task_name:<28} (executable not found, skipped)")
+
+    print("Full grading run:")
+    exec_timings = time_command([grade_path, '--exec'] + tasks, runs)
+    bundled_timings = time_command([grade_path] + tasks, runs)
+    print_timing("grade --exec (N+1 starts)", exec_timings)
+    print_timing("grade (in-process)", bundled_timings)
+    saved = statistics.median(exec_timings) - statistics.median(bundled_timings)
+    print(f"\nSaved by in-process dispatch: {saved * 1000:.1f} ms per run")
+    print("----------------------------------\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the startup cost of the packed graders.")
+    parser.add_argument("tasks_dir", help="Path to the tasks/ directory holding the packed executables.")
+    parser.add_argument("--tasks", nargs='+', default=DEFAULT_TASKS, help="Tasks to run (default: all).")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per measurement.")
+
+    args = parser.parse_args()
+    main(args.tasks_dir, args.tasks, args.runs)
@@ -0,0 +1,208 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from autograding.history import check_key
+
+# 题目分析中的高分组与低分组各占的比例 (经典的 27% 分组)
+GROUP_FRACTION = 0.27
+
+def load_reports(target, pattern, jobs, task=None):
+    """
+    Returns the decrypted reports of a cohort.
+
+    Args:
+        target (str): A JSONL file written by 'decrypt_report --batch', or a directory
+            or glob of encrypted reports (decrypted here with `jobs` processes).
+        task (str): Only keep the reports of this task.
+    """
+    if os.path.isfile(target) and target.endswith('.jsonl'):
+        reports = []
+        with open(target, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    reports.append(json.loads(line))
+    else:
+        # 只有需要解密时才加载密钥，分析已解密的 JSONL 不需要 etc/config
+        from decrypt_report import decrypt_file, find_reports
+        with multiprocessing.Pool(processes=jobs) as pool:
+            reports = [report for _, report, _ in pool.imap(decrypt_file, find_reports(target, pattern), chunksize=64)]
+    return [report for report in reports
+            if "error" not in report and (task is None or report.get('task') == task)]
+
+def build_matrices(reports):
+    """
+    Turns the reports into dense arrays, one row per submission.
+
+    Returns:
+        dict: 'checks' (column names) with 'passed', 'points' and 'present'
+        (submissions × checks), 'scores' and 'max_scores' (per submission), and
+        'questions' (quiz question ids) with 'answered' and 'correct'
+        (submissions × questions) from the quiz bitmasks.
+    """
+    check_columns = {}
+    question_columns = {}
+    check_rows, check_cols, passed, points = [], [], [], []
+    quiz_rows, quiz_cols, quiz_correct = [], [], []
+    for row, report in enumerate(reports):
+        for result in report.get('test_results', []):
+            column = check_columns.setdefault(check_key(result['name']), len(check_columns))
+            check_rows.append(row)
+            check_cols.append(column)
+            passed.append(bool(result.get('passed')))
+            points.append(result.get('points', 0))
+            if 'correct_mask' in result:
+                count = len(result['question_ids'])
+                # 位掩码按小端字节展开为逐题的 0/1
+                mask = int(result['correct_mask'], 16).to_bytes((count + 7) // 8 or 1, 'little')
+                bits = np.unpackbits(np.frombuffer(mask, dtype=np.uint8), bitorder='little')[:count]
+                quiz_rows.extend([row] * count)
+                quiz_cols.extend(question_columns.setdefault(question_id, len(question_columns))
+                                 for question_id in result['question_ids'])
+                quiz_correct.append(bits)
+
+    submissions = len(reports)
+    matrices = {
+        "checks": list(check_columns),
+        "passed": np.zeros((submissions, len(check_columns)), dtype=bool),
+        "points": np.zeros((submissions, len(check_columns)), dtype=np.float32),
+        "present": np.zeros((submissions, len(check_columns)), dtype=bool),
+        "scores": np.array([report.get('score', 0) for report in reports], dtype=np.float64),
+        "max_scores": np.array([report.get('max_score', 0) for report in reports], dtype=np.float64),
+        "questions": list(question_columns),
+        "answered": np.zeros((submissions, len(question_columns)), dtype=bool),
+        "correct": np.zeros((submissions, len(question_columns)), dtype=bool),
+    }
+    if check_rows:
+        index = (np.array(check_rows), np.array(check_cols))
+        matrices['present'][index] = True
+        matrices['passed'][index] = passed
+        matrices['points'][index] = points
+    if quiz_rows:
+        index = (np.array(quiz_rows), np.array(quiz_cols))
+        matrices['answered'][index] = True
+        matrices['correct'][index] = np.concatenate(quiz_correct).astype(bool)
+    return matrices
+
+def pass_rates(matrices):
+    """Fraction of the submissions that have a check and passed it, per check."""
+    attempts = matrices['present'].sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return matrices['passed'].sum(axis=0) / attempts, attempts
+
+def score_distribution(matrices, bins):
+    """Histogram and percentiles of the scores as a fraction of max_score."""
+    max_scores = matrices['max_scores']
+    fractions = np.divide(matrices['scores'], max_scores, out=np.zeros_like(max_scores), where=max_scores > 0)
+    counts, edges = np.histogram(fractions, bins=bins, range=(0.0, 1.0))
+    percentiles = np.percentile(fractions, [10, 25, 50, 75, 90]) if len(fractions) else np.zeros(5)
+    return {
+        "counts": counts.tolist(), "edges": edges.tolist(),
+        "mean": float(fractions.mean()) if len(fractions) else 0.0,
+        "std": float(fractions.std()) if len(fractions) else 0.0,
+        "percentiles": dict(zip(['p10', 'p25', 'p50', 'p75', 'p90'], percentiles.tolist())),
+    }
+
+def item_analysis(matrices):
+    """
+    Difficulty and discrimination of every quiz question.
+
+    difficulty: fraction of the students who were asked the question and answered it
+    correctly. discrimination: the corrected item-total (point-biserial) correlation
+    between answering it correctly and the number of other questions answered
+    correctly, and the upper-lower index: its difficulty in the top 27% of students
+    by quiz result minus its difficulty in the bottom 27%.
+    """
+    answered = matrices['answered'].astype(np.float64)
+    correct = matrices['correct'] & matrices['answered']
+    x = correct.astype(np.float64)
+    asked = answered.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        difficulty = x.sum(axis=0) / asked
+
+        # 与其余题目答对数的相关系数 (不含本题，避免自相关)
+        totals = x.sum(axis=1)
+        rest = (totals[:, None] - x) * answered
+        mean_x = difficulty
+        mean_rest = rest.sum(axis=0) / asked
+        covariance = (x * rest).sum(axis=0) / asked - mean_x * mean_rest
+        variance_rest = (rest * rest).sum(axis=0) / asked - mean_rest ** 2
+        point_biserial = covariance / np.sqrt(mean_x * (1 - mean_x) * variance_rest)
+
+        # 按答对比例排序，取高分组与低分组
+        answered_per_student = answered.sum(axis=1)
+        quiz_fraction = np.divide(totals, answered_per_student, out=np.zeros_like(totals),
+                                  where=answered_per_student > 0)
+        takers = np.flatnonzero(answered_per_student > 0)
+        group_size = max(1, int(round(GROUP_FRACTION * len(takers))))
+        ordered = takers[np.argsort(quiz_fraction[takers], kind='stable')]
+        lower, upper = ordered[:group_size], ordered[-group_size:]
+        upper_lower = (x[upper].sum(axis=0) / answered[upper].sum(axis=0)
+                       - x[lower].sum(axis=0) / answered[lower].sum(axis=0))
+    return [
+        {"question": question_id, "asked": int(asked[column]), "difficulty": float(difficulty[column]),
+         "point_biserial": float(point_biserial[column]), "upper_lower": float(upper_lower[column])}
+        for column, question_id in enumerate(matrices['questions'])
+    ]
+
+def finite(value):
+    """NaN (e.g. a question everybody answered correctly has no correlation) becomes None in JSON."""
+    return None if np.isnan(value) else value
+
+def print_report(matrices, bins):
+    rates, attempts = pass_rates(matrices)
+    print(f"\n--- CHECK PASS RATES ({len(matrices['scores'])} submissions) ---")
+    for column in np.argsort(rates, kind='stable'):
+        print(f"  {matrices['checks'][column]:<40} {rates[column]:7.1%} of {attempts[column]}")
+
+    distribution = score_distribution(matrices, bins)
+    print("\n--- SCORE DISTRIBUTION ---")
+    widest = max(distribution['counts']) or 1
+    for count, low, high in zip(distribution['counts'], distribution['edges'], distribution['edges'][1:]):
+        print(f"  {low * 100:5.1f}-{high * 100:5.1f}% | {'#' * round(40 * count / widest):<40} {count}")
+    percentiles = '  '.join(f"{name} {value:.1%}" for name, value in distribution['percentiles'].items())
+    print(f"  mean {distribution['mean']:.1%}  std {distribution['std']:.1%}  {percentiles}")
+
+    if matrices['questions']:
+        print("\n--- QUIZ ITEM ANALYSIS ---")
+        print(f"  {'Question':<10} {'asked':>7} {'difficulty':>11} {'r_pb':>7} {'upper-lower':>12}")
+        for item in sorted(item_analysis(matrices), key=lambda item: item['difficulty']):
+            print(f"  {item['question']:<10} {item['asked']:>7} {item['difficulty']:>11.2f} "
+                  f"{item['point_biserial']:>7.2f} {item['upper_lower']:>12.2f}")
+    print("----------------------------------\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pass rates, score distributions and quiz item analysis of a cohort.")
+    parser.add_argument("target", help="JSONL from 'decrypt_report --batch', or a directory or glob of encrypted reports.")
+    parser.add_argument("--pattern", default="*.json",
+                        help="File name pattern used when target is a directory (default: *.json).")
+    parser.add_argument("--task", help="Only this task, e.g. task3.")
+    parser.add_argument("--bins", type=int, default=10, help="Number of score buckets (default: 10).")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="Number of worker processes decrypting reports (default: number of CPUs).")
+    parser.add_argument("--json", action="store_true", help="Print the statistics as JSON.")
+
+    args = parser.parse_args()
+    if args.bins < 1 or args.jobs < 1:
+        parser.error("--bins and --jobs must be at least 1")
+    matrices = build_matrices(load_reports(args.target, args.pattern, args.jobs, args.task))
+    if not len(matrices['scores']):
+        print("No reports to analyze.")
+        sys.exit(1)
+    if args.json:
+        rates, attempts = pass_rates(matrices)
+        print(json.dumps({
+            "submissions": len(matrices['scores']),
+            "checks": [{"check": name, "pass_rate": finite(float(rates[column])), "attempts": int(attempts[column])}
+                       for column, name in enumerate(matrices['checks'])],
+            "scores": score_distribution(matrices, args.bins),
+            "quiz": [{name: finite(value) if isinstance(value, float) else value for name, value in item.items()}
+                     for item in item_analysis(matrices)],
+        }, indent=2))
+    else:
+        print_report(matrices, args.bins)
@@ -1,13 +1,22 @@
+import csv
+import fnmatch
+import glob
+import importlib.util
+import itertools
 import json
+import multiprocessing
+import re
 import sys
-import base64
-from base64 import b64decode
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import unpad
 import os
 
-# --- SECRET KEY ---
-# 从 etc/config 文件中加载密钥
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from autograding.envelope import decrypt_with_key_ring
+from autograding.keys import load_key_ring
+from autograding.quiz import QuizBank, decode_mask, verify_quiz
+from seen_index import SeenIndex, envelope_digests
+
+# --- SECRET KEYS ---
+# 从 etc/config 加载当前密钥，并从 etc/keyring (若存在) 加载往届的密钥
 try:
     # 使用 os.path.realpath(sys.executable) 获取可执行文件的真实路径
     # 这在 PyInstaller 打包的单文件可执行文件中非常重要
@@ -16,13 +25,7 @@ try:
     app_dir = os.path.dirname(app_path)
     # 获取项目根目录，这里假设etc文件夹在可执行文件的上一级目录
     project_root = os.path.dirname(app_dir)
-    config_path = os.path.join(project_root, 'etc', 'config')
-    
-    with open(config_path, 'r') as f:
-        # 读取文件内容，去除首尾空白，然后进行 Base64 解码
-        SECRET_KEY = base64.b64decode(f.read().strip())
-    if len(SECRET_KEY) not in [16, 24, 32]:
-        raise ValueError("Incorrect AES key length from config file.")
+    KEY_RING = load_key_ring(project_root)
 except FileNotFoundError:
     print("Error: 'etc/config' file not found. Please ensure it exists.")
     sys.exit(1)
@@ -30,24 +33,177 @@ except Exception as e:
     print(f"Error loading secret key: {e}")
     sys.exit(1)
 
+def use_key_ring(key_ring_path):
+    """Loads the keys from another key ring file (also run in every batch worker)."""
+    global KEY_RING
+    KEY_RING = load_key_ring(project_root, key_ring_path)
 
 def decrypt_report(encrypted_data_string):
-    """Decrypts the report data using AES."""
+    """Decrypts the report data with the key it was encrypted with."""
+    try:
+        return decrypt_with_key_ring(encrypted_data_string, KEY_RING)
+    except ValueError as e:
+        return {"error": str(e)}
+
+def format_timing(result):
+    """Formats when a check started and how long it took, e.g. ' [0.345s, started at +0.012s]'."""
+    if 'duration' not in result:
+        return ""
+    if 'start' not in result:
+        return f" [{result['duration']:.3f}s]"
+    return f" [{result['duration']:.3f}s, started at +{result['start']:.3f}s]"
+
+def print_calls(calls, indent):
+    for call in calls:
+        print(f"{indent}{call['call']}: {call['duration']:.3f}s (at +{call['start']:.3f}s)")
+
+# 批量模式下每次交给进程池的文件数；结果按批写出，内存占用与文件总数无关
+BATCH_SIZE = 1000
+
+CSV_FIELDS = ['path', 'score', 'max_score', 'passed_checks', 'failed_checks', 'duration', 'duplicate_of',
+              'quiz_verified']
+
+def load_bank(bank_path):
+    """Loads a quiz_data.py generated by build_quiz.py as a QuizBank."""
+    spec = importlib.util.spec_from_file_location('quiz_data', bank_path)
+    if spec is None:
+        raise ValueError(f"not a Python module: {bank_path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return QuizBank(module)
+
+def check_quiz(bank, report):
+    """
+    Verifies the sampled quiz of a report against the bank.
+
+    Returns:
+        list: Problems found, or None if the report has no sampled quiz to verify.
+    """
+    for result in report.get('test_results', []):
+        if 'seed' in result:
+            return verify_quiz(bank, result)
+    return None
+
+def find_reports(target, pattern):
+    """
+    Yields the report files to decrypt, one at a time.
+
+    Args:
+        target (str): A directory (searched recursively for files matching pattern)
+            or a glob such as 'submissions/*/autograding_report.json'.
+        pattern (str): File name pattern used when target is a directory.
+    """
+    if os.path.isdir(target):
+        for directory, directory_names, file_names in os.walk(target):
+            directory_names.sort()
+            for file_name in sorted(file_names):
+                if fnmatch.fnmatch(file_name, pattern):
+                    yield os.path.join(directory, file_name)
+    else:
+        for path in glob.iglob(target, recursive=True):
+            if os.path.isfile(path):
+                yield path
+
+def batch_root(target):
+    """The directory a batch's paths are relative to: the target directory, or a glob's directory before its first wildcard."""
+    if os.path.isdir(target):
+        return target
+    return os.path.dirname(re.split(r'[*?[]', target, 1)[0]) or '.'
+
+def submission_key(target, path):
+    """
+    Identifies a report file in the seen index by its path below the batch's root, so
+    the same folder read from another checkout or mount point is the same submission.
+    """
+    return os.path.relpath(path, batch_root(target))
+
+def decrypt_file(path):
+    """
+    Decrypts one report file.
+
+    Returns:
+        tuple: (path, report or {'error': ...}, digests identifying the envelope).
+    """
     try:
-        encrypted_data = json.loads(encrypted_data_string)
-        nonce = b64decode(encrypted_data['nonce'])
-        ciphertext = b64decode(encrypted_data['ciphertext'])
-        tag = b64decode(encrypted_data['tag'])
-
-        cipher = AES.new(SECRET_KEY, AES.MODE_EAX, nonce=nonce)
-        decrypted_data = cipher.decrypt_and_verify(ciphertext, tag)
-        
-        return json.loads(decrypted_data.decode('utf-8'))
-    except Exception as e:
-        return {"error": f"Decryption failed: {e}"}
-
-def main(file_path):
-    """Reads an encrypted report from a file and decrypts it."""
+        with open(path, 'r') as f:
+            encrypted_data_string = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return path, {"error": f"Could not read file: {e}"}, []
+    return path, decrypt_report(encrypted_data_string), envelope_digests(encrypted_data_string)
+
+def to_row(path, report):
+    """Flattens a decrypted report into one CSV row."""
+    results = report.get('test_results', [])
+    return {
+        "path": path,
+        "score": report.get('score'),
+        "max_score": report.get('max_score'),
+        "passed_checks": sum(1 for result in results if result.get('passed')),
+        "failed_checks": sum(1 for result in results if not result.get('passed')),
+        "duration": report.get('duration', ''),
+        "duplicate_of": report.get('duplicate_of', ''),
+        "quiz_verified": report.get('quiz_verified', ''),
+    }
+
+def decrypt_batch(target, pattern, output, errors, output_format, jobs, chunk_size, seen=None, key_ring_path=None,
+                  bank=None):
+    """
+    Decrypts and verifies every report under a directory or matching a glob.
+
+    The keys are loaded once per worker; the files are decrypted in parallel by a pool of `jobs`
+    processes, BATCH_SIZE files at a time. Every report becomes one JSONL or CSV row
+    in `output`; files that cannot be decrypted (tampered, corrupt, wrong key) are
+    written as JSONL to `errors` and do not stop the batch.
+
+    With a SeenIndex, a report whose nonce or ciphertext was already seen in another
+    file (a copied or renamed submission) gets 'duplicate_of' set to that file, as
+    named by submission_key(). With a
+    QuizBank, every report with a sampled quiz gets 'quiz_verified' (and, in JSONL,
+    the 'quiz_problems' found).
+
+    Returns:
+        tuple: (number of reports decrypted, number of errors, number of duplicates).
+    """
+    writer = None
+    if output_format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+
+    decrypted = failed = duplicates = 0
+    paths = find_reports(target, pattern)
+    initializer, initargs = (use_key_ring, (key_ring_path,)) if key_ring_path else (None, ())
+    with multiprocessing.Pool(processes=jobs, initializer=initializer, initargs=initargs) as pool:
+        while True:
+            batch = list(itertools.islice(paths, BATCH_SIZE))
+            if not batch:
+                break
+            for path, report, digests in pool.imap(decrypt_file, batch, chunksize=chunk_size):
+                if "error" in report:
+                    failed += 1
+                    errors.write(json.dumps({"path": path, "error": report['error']}, ensure_ascii=False) + "\n")
+                    continue
+                decrypted += 1
+                if seen is not None:
+                    duplicate_of = seen.check_and_add(submission_key(target, path), digests)
+                    if duplicate_of is not None:
+                        duplicates += 1
+                        report['duplicate_of'] = duplicate_of
+                if bank is not None:
+                    problems = check_quiz(bank, report)
+                    if problems is not None:
+                        report['quiz_verified'] = not problems
+                        if problems:
+                            report['quiz_problems'] = problems
+                if writer is not None:
+                    writer.writerow(to_row(path, report))
+                else:
+                    output.write(json.dumps({"path": path, **report}, ensure_ascii=False) + "\n")
+            if seen is not None:
+                seen.save()
+    return decrypted, failed, duplicates
+
+def main(file_path, bank=None):
+    """Reads an encrypted report from a file and decrypts it (and checks its quiz against the bank)."""
     if not os.path.exists(file_path):
         print(f"Error: File not found at {file_path}")
         return
@@ -63,18 +219,90 @@ def main(file_path):
     else:
         print("\n--- DECRYPTED REPORT ---")
         print(f"Final Score: {decrypted_result['score']}/{decrypted_result['max_score']}")
+        # 较早版本的报告没有计时信息
+        if 'duration' in decrypted_result:
+            print(f"Grading Time: {decrypted_result['duration']:.3f}s")
         print("Test Results:")
         for result in decrypted_result['test_results']:
             status = 'Passed' if result['passed'] else 'Failed'
             points = result['points']
-            print(f"  - {result['name']}: {status} (+{points}pts)")
+            print(f"  - {result['name']}: {status} (+{points}pts){format_timing(result)}")
+            for label, seconds in result.get('timings', {}).items():
+                print(f"      {label}: {seconds:.3f}s")
+            print_calls(result.get('calls', []), "      ")
+            if 'correct_mask' in result:
+                answers = decode_mask(result['correct_mask'], len(result['question_ids']))
+                print(f"      Answers: {''.join('✓' if is_correct else '✗' for is_correct in answers)}")
+        if bank is not None:
+            problems = check_quiz(bank, decrypted_result)
+            if problems is None:
+                print("Quiz: no sampled quiz to verify.")
+            elif problems:
+                for problem in problems:
+                    print(f"✗ Quiz does not match the bank: {problem}")
+            else:
+                print("✓ Quiz verified against the bank")
+        if decrypted_result.get('calls'):
+            print("Other Calls:")
+            print_calls(decrypted_result['calls'], "  - ")
         print("------------------------\n")
 
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Decrypts an autograding report.")
-    parser.add_argument("file", help="Path to the encrypted report file.")
+    parser.add_argument("file", help="Path to the encrypted report file, or with --batch a directory or glob.")
+    parser.add_argument("--batch", action="store_true",
+                        help="Decrypt every report in a directory (recursively) or matching a glob.")
+    parser.add_argument("--pattern", default="*.json",
+                        help="File name pattern used when FILE is a directory (default: *.json).")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl",
+                        help="Output format of --batch: one row per submission (default: jsonl).")
+    parser.add_argument("-o", "--output", help="Write the rows to this file instead of stdout.")
+    parser.add_argument("--errors", help="Write failed files (as JSONL) to this file instead of stderr.")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="Number of worker processes (default: number of CPUs).")
+    parser.add_argument("--chunk-size", type=int, default=16,
+                        help="Files handed to a worker at a time (default: 16).")
+    parser.add_argument("--seen-index", metavar="PATH",
+                        help="Flag copies of earlier submissions, using and updating the index at PATH "
+                             "(e.g. seen_submissions.db; off by default).")
+    parser.add_argument("--keyring", help="Key ring with the keys of earlier semesters (default: etc/keyring, if present).")
+    parser.add_argument("--bank", help="quiz_data.py the quizzes were drawn from; draws every quiz again and checks the answers.")
     
     args = parser.parse_args()
-    main(args.file)
\ No newline at end of file
+    if args.keyring:
+        try:
+            use_key_ring(args.keyring)
+        except (OSError, ValueError) as e:
+            print(f"Error loading key ring: {e}")
+            sys.exit(1)
+    bank = None
+    if args.bank:
+        try:
+            bank = load_bank(args.bank)
+        except (OSError, ValueError, SyntaxError, AttributeError) as e:
+            print(f"Error loading quiz bank: {e}")
+            sys.exit(1)
+    if not args.batch:
+        main(args.file, bank)
+        sys.exit(0)
+
+    if args.jobs < 1 or args.chunk_size < 1:
+        parser.error("--jobs and --chunk-size must be at least 1")
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    errors = open(args.errors, 'w') if args.errors else sys.stderr
+    seen = SeenIndex(args.seen_index) if args.seen_index else None
+    try:
+        decrypted, failed, duplicates = decrypt_batch(args.file, args.pattern, output, errors,
+                                                      args.format, args.jobs, args.chunk_size, seen, args.keyring, bank)
+    finally:
+        if seen is not None:
+            seen.close()
+        if args.output:
+            output.close()
+        if args.errors:
+            errors.close()
+    print(f"Decrypted {decrypted} report(s), {failed} could not be decrypted, "
+          f"{duplicates} duplicate(s) of earlier submissions.", file=sys.stderr)
+    sys.exit(1 if failed else 0)
\ No newline at end of file
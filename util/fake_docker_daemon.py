@@ -0,0 +1,288 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import signal
+import socketserver
+import struct
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urlparse
+
+HELLO_WORLD_OUTPUT = "\nHello from Docker!\nThis message shows that your installation appears to be working correctly.\n"
+
+def multiplex(stdout, stderr=''):
+    """Frames output as a Docker raw stream (8-byte header per stdout/stderr frame)."""
+    frames = b''
+    for stream, text in ((1, stdout), (2, stderr)):
+        data = text.encode('utf-8')
+        if data:
+            frames += struct.pack('>BxxxI', stream, len(data)) + data
+    return frames
+
+class FakeDocker:
+    """
+    In-memory state of the fake daemon: images, containers and exec instances.
+
+    Commands sent with exec are run on the host, so a container's files can be
+    faked with directories on the machine running the tests. `latency` (seconds) is
+    added to every exec, like a busy daemon.
+    """
+
+    def __init__(self, images, containers, latency=0.0):
+        self.lock = threading.Lock()
+        self.images = {self.image_name(image) for image in images}
+        self.containers = {}
+        for name, status, labels in containers:
+            self.add_container(name, 'fake:latest', status, labels)
+        self.latency = latency
+        self.execs = {}
+        self.connections = 0
+        self.requests = 0
+
+    @staticmethod
+    def image_name(image):
+        return image if ':' in image else f"{image}:latest"
+
+    def add_container(self, name, image, status, labels=None):
+        container = {"Id": uuid.uuid4().hex, "Name": f"/{name}", "Image": image, "State": {"Status": status},
+                     "Config": {"Labels": labels or {}}}
+        self.containers[name] = container
+        return container
+
+    def find_container(self, ref):
+        for name, container in self.containers.items():
+            if ref == name or container['Id'].startswith(ref):
+                return name, container
+        return None, None
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            sys.stderr.write(f"fake-docker: {format % args}\n")
+
+    def send(self, status, body=None, close=False, content_type='application/json'):
+        data = b'' if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode('utf-8'))
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if close:
+            # 与真实守护进程一样，附加到 exec 的连接在输出结束后关闭
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        else:
+            self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length) if length else b''
+        return json.loads(data) if data else {}
+
+    def handle_any(self, method):
+        state = self.server.state
+        with state.lock:
+            state.requests += 1
+        url = urlparse(self.path)
+        # 去掉可选的 API 版本前缀，如 /v1.43
+        path = re.sub(r'^/v[\d.]+', '', unquote(url.path))
+        query = parse_qs(url.query)
+        route = f"{method} {path}"
+
+        if route == 'GET /_ping':
+            return self.send(200, b'OK', content_type='text/plain')
+        if route == 'GET /info':
+            return self.send(200, {"ServerVersion": "fake", "Containers": len(state.containers), "Images": len(state.images)})
+        if route == 'GET /_fake/stats':
+            return self.send(200, {"connections": state.connections, "requests": state.requests})
+
+        if route == 'GET /containers/json':
+            return self.send(200, self.list_containers(query))
+        match = re.fullmatch(r'(GET|POST|DELETE) /containers/([^/]+)(/\w+)?', route)
+        if match and match.group(2) != 'create':
+            return self.container_route(method, match.group(2), match.group(3) or '')
+        match = re.fullmatch(r'(GET|POST) /exec/(\w+)/(start|json)', route)
+        if match:
+            return self.exec_route(match.group(2), match.group(3))
+        if route == 'POST /containers/create':
+            config = self.read_body()
+            image = FakeDocker.image_name(config.get('Image', ''))
+            if image not in state.images:
+                return self.send(404, {"message": f"No such image: {image}"})
+            with state.lock:
+                container = state.add_container(f"fake_{uuid.uuid4().hex[:8]}", image, 'created')
+            return self.send(201, {"Id": container['Id'], "Warnings": []})
+        if route == 'POST /images/create':
+            image = FakeDocker.image_name(f"{query['fromImage'][0]}:{query.get('tag', ['latest'])[0]}")
+            if self.server.offline:
+                return self.send(200, b'{"error":"network is unreachable (fake daemon is offline)"}\n')
+            state.images.add(image)
+            return self.send(200, b'{"status":"Pulling"}\n{"status":"Downloaded newer image"}\n')
+        match = re.fullmatch(r'GET /images/(.+)/json', route)
+        if match:
+            if FakeDocker.image_name(match.group(1)) not in state.images:
+                return self.send(404, {"message": f"No such image: {match.group(1)}"})
+            image = FakeDocker.image_name(match.group(1))
+            return self.send(200, {"Id": f"sha256:{hashlib.sha256(image.encode('utf-8')).hexdigest()}", "RepoTags": [image]})
+        if route == 'POST /images/load':
+            loaded = self.load_tarball()
+            if loaded is None:
+                return self.send(200, b'{"error":"invalid tar archive"}\n')
+            state.images.update(loaded)
+            return self.send(200, ''.join(json.dumps({"stream": f"Loaded image: {image}\n"}) + '\n' for image in sorted(loaded)).encode('utf-8'))
+        if route == 'GET /images/json':
+            return self.send(200, [{"RepoTags": [image]} for image in sorted(state.images)])
+        return self.send(404, {"message": f"page not found: {route}"})
+
+    def list_containers(self, query):
+        """GET /containers/json with the 'all' flag and 'label' filters (KEY or KEY=VALUE)."""
+        filters = json.loads(query.get('filters', ['{}'])[0])
+        show_all = query.get('all', ['0'])[0] not in ('0', 'false')
+        listed = []
+        with self.server.state.lock:
+            containers = list(self.server.state.containers.items())
+        for name, container in containers:
+            if not show_all and container['State']['Status'] != 'running':
+                continue
+            labels = container['Config']['Labels']
+            if all(key in labels and (not value or labels[key] == value)
+                   for key, _, value in (label.partition('=') for label in filters.get('label', []))):
+                listed.append({"Id": container['Id'], "Names": [f"/{name}"], "Image": container['Image'],
+                               "State": container['State']['Status'], "Labels": labels})
+        return listed
+
+    def load_tarball(self):
+        """Reads a 'docker save' tarball from the request and returns the image tags in its manifest."""
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            with tarfile.open(fileobj=io.BytesIO(self.rfile.read(length))) as tarball:
+                manifest = json.load(tarball.extractfile('manifest.json'))
+        except (tarfile.TarError, KeyError, ValueError):
+            return None
+        return {FakeDocker.image_name(tag) for entry in manifest for tag in entry.get('RepoTags') or []}
+
+    def container_route(self, method, ref, action):
+        state = self.server.state
+        name, container = state.find_container(ref)
+        if container is None:
+            return self.send(404, {"message": f"No such container: {ref}"})
+
+        if method == 'GET' and action == '/json':
+            return self.send(200, container)
+        if method == 'DELETE' and action == '':
+            with state.lock:
+                del state.containers[name]
+            return self.send(204)
+        if method == 'POST' and action == '/start':
+            if container['State']['Status'] == 'running':
+                return self.send(304)
+            container['State']['Status'] = 'exited' if container['Image'] == 'hello-world:latest' else 'running'
+            return self.send(204)
+        if method == 'POST' and action == '/wait':
+            return self.send(200, {"StatusCode": 0})
+        if method == 'GET' and action == '/logs':
+            output = HELLO_WORLD_OUTPUT if container['Image'] == 'hello-world:latest' else ''
+            return self.send(200, multiplex(output), content_type='application/vnd.docker.raw-stream')
+        if method == 'POST' and action == '/exec':
+            if container['State']['Status'] != 'running':
+                return self.send(409, {"message": f"Container {ref} is not running"})
+            exec_id = uuid.uuid4().hex
+            command = self.read_body().get('Cmd', [])
+            with state.lock:
+                state.execs[exec_id] = {"Cmd": command, "ExitCode": None}
+            return self.send(201, {"Id": exec_id})
+        return self.send(404, {"message": f"page not found: {method} {action}"})
+
+    def exec_route(self, exec_id, action):
+        exec_instance = self.server.state.execs.get(exec_id)
+        if exec_instance is None:
+            return self.send(404, {"message": f"No such exec instance: {exec_id}"})
+        if action == 'json':
+            return self.send(200, {"ID": exec_id, "Running": False, "ExitCode": exec_instance['ExitCode']})
+
+        self.read_body()
+        if self.server.state.latency:
+            time.sleep(self.server.state.latency)
+        try:
+            process = subprocess.run(exec_instance['Cmd'], capture_output=True, text=True)
+            exec_instance['ExitCode'] = process.returncode
+            output = multiplex(process.stdout, process.stderr)
+        except OSError as e:
+            exec_instance['ExitCode'] = 126
+            output = multiplex('', f"{e}\n")
+        return self.send(200, output, close=True, content_type='application/vnd.docker.raw-stream')
+
+    def do_GET(self):
+        self.handle_any('GET')
+
+    def do_POST(self):
+        self.handle_any('POST')
+
+    def do_DELETE(self):
+        self.handle_any('DELETE')
+
+class FakeDockerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, state, offline=False, verbose=False):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, Handler)
+        self.state = state
+        self.offline = offline
+        self.verbose = verbose
+
+def main(socket_path, images, containers, offline, verbose, latency=0.0):
+    """
+    Serves a fake Docker Engine API on a unix socket until interrupted.
+
+    Point the graders at it with DOCKER_HOST=unix://<socket>. On exit, the number of
+    connections and requests is printed, which shows whether connections are reused.
+    """
+    state = FakeDocker(images, containers, latency)
+    server = FakeDockerServer(socket_path, state, offline, verbose)
+    print(f"Fake Docker daemon listening on {socket_path}", flush=True)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+        print(f"\nServed {state.requests} requests over {state.connections} connections.")
+
+def parse_container(value):
+    """Parses NAME[=STATUS][,KEY=VALUE...] into (name, status, labels)."""
+    container, *labels = value.split(',')
+    name, _, status = container.partition('=')
+    return name, status or 'running', dict(label.partition('=')[::2] for label in labels)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Docker daemon for testing the graders without Docker.")
+    parser.add_argument("socket", help="Path of the unix socket to listen on.")
+    parser.add_argument("--image", action='append', default=[],
+                        help="Image present locally, e.g. hello-world (repeatable).")
+    parser.add_argument("--container", action='append', default=[], type=parse_container,
+                        help="Container as NAME or NAME=STATUS, with optional labels, e.g. "
+                             "autograding-task3=exited or lab-01,lab=linux (repeatable).")
+    parser.add_argument("--offline", action='store_true', help="Fail every image pull.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every exec (default: 0).")
+    parser.add_argument("-v", "--verbose", action='store_true', help="Log every request to stderr.")
+
+    args = parser.parse_args()
+    main(args.socket, args.image, args.container, args.offline, args.verbose, args.latency)
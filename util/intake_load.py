@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from autograding.envelope import encrypt_report
+from bench_envelope import make_report
+
+INTAKE_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intake_server.py')
+
+def make_submissions(count, secret_key, checks):
+    """Encrypts `count` synthetic reports with the test key (each with its own nonce)."""
+    submissions = []
+    for index in range(count):
+        report = make_report(checks, 1)
+        report['score'] = index % (report['max_score'] + 1)
+        submissions.append((f"load-{index:06d}", encrypt_report(report, secret_key).encode('utf-8')))
+    return submissions
+
+async def open_connection(address):
+    if ':' in address and not os.path.exists(address):
+        host, _, port = address.rpartition(':')
+        return await asyncio.open_connection(host, int(port))
+    return await asyncio.open_unix_connection(address)
+
+async def post(reader, writer, submission_id, body):
+    """Sends one POST /submit over a keep-alive connection; returns (status, headers, payload)."""
+    writer.write((f"POST /submit HTTP/1.1\r\nHost: intake\r\nX-Submission-Id: {submission_id}\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    payload = json.loads(await reader.readexactly(int(headers.get('content-length', 0))))
+    return status, headers, payload
+
+async def client(address, submissions, results):
+    """Submits from the shared list until it is empty, retrying uploads refused while busy."""
+    reader, writer = await open_connection(address)
+    try:
+        while submissions:
+            submission_id, body = submissions.pop()
+            start = time.perf_counter()
+            while True:
+                status, headers, payload = await post(reader, writer, submission_id, body)
+                if status != 503:
+                    break
+                results['busy'] += 1
+                # 服务端繁忙时稍后重试；Retry-After 以秒为单位，对压测来说太长
+                await asyncio.sleep(0.01)
+            results['latencies'].append(time.perf_counter() - start)
+            results['statuses'][status] = results['statuses'].get(status, 0) + 1
+    finally:
+        writer.close()
+
+async def run_load(address, submissions, concurrency):
+    results = {"latencies": [], "statuses": {}, "busy": 0}
+    pending = list(reversed(submissions))
+    start = time.perf_counter()
+    await asyncio.gather(*(client(address, pending, results) for _ in range(concurrency)))
+    results['wall'] = time.perf_counter() - start
+    return results
+
+def start_server(base_dir, secret_key, jobs, max_pending):
+    """Starts intake_server.py on a unix socket with a key ring holding only the test key."""
+    key_ring_path = os.path.join(base_dir, 'keyring')
+    with open(key_ring_path, 'w') as f:
+        f.write(base64.b64encode(secret_key).decode('ascii') + "  # intake_load test key\n")
+    socket_path = os.path.join(base_dir, 'intake.sock')
+    process = subprocess.Popen(
+        [sys.executable, INTAKE_SERVER, '--socket', socket_path, '--keyring', key_ring_path,
+         '--results', os.path.join(base_dir, 'submissions.jsonl'),
+         '--seen-index', os.path.join(base_dir, 'seen_submissions.db'),
+         '--jobs', str(jobs), '--max-pending', str(max_pending)],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    deadline = time.monotonic() + 10
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            print(f"Error: intake server did not start:\n{process.communicate()[0]}")
+            sys.exit(1)
+        time.sleep(0.05)
+    return process, socket_path
+
+def main(args):
+    """
+    Measures the sustained submission rate and latency of the intake server.
+
+    Without --connect, a server is started in a temporary directory with a fresh test
+    key, and the number of lines it stored is checked against the submissions sent.
+    """
+    base_dir = tempfile.mkdtemp(prefix='autograding-intake-')
+    process = None
+    try:
+        if args.connect:
+            with open(args.key, 'r') as f:
+                secret_key = base64.b64decode(f.read().split('#', 1)[0].strip())
+            address = args.connect
+        else:
+            secret_key = os.urandom(32)
+            process, address = start_server(base_dir, secret_key, args.jobs, args.max_pending)
+
+        submissions = make_submissions(args.submissions, secret_key, args.checks)
+        results = asyncio.run(run_load(address, submissions, args.concurrency))
+
+        stored = None
+        if process is not None:
+            process.send_signal(signal.SIGTERM)
+            server_output = process.communicate(timeout=30)[0]
+            with open(os.path.join(base_dir, 'submissions.jsonl')) as f:
+                stored = sum(1 for _ in f)
+    finally:
+        if process is not None and process.poll() is None:
+            process.kill()
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+    latencies = sorted(results['latencies'])
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(round(fraction * (len(latencies) - 1))))]
+    summary = {
+        "submissions": args.submissions,
+        "concurrency": args.concurrency,
+        "wall": round(results['wall'], 3),
+        "per_second": round(args.submissions / results['wall'], 1),
+        "latency_ms": {name: round(value * 1000, 2) for name, value in (
+            ("median", statistics.median(latencies)), ("p95", percentile(0.95)),
+            ("p99", percentile(0.99)), ("max", latencies[-1]))},
+        "statuses": results['statuses'],
+        "busy_retries": results['busy'],
+        "stored": stored,
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"\n--- INTAKE LOAD TEST ({args.submissions} submissions, {args.concurrency} clients) ---")
+    print(f"  Sustained rate:  {summary['per_second']:.1f} submissions/s over {summary['wall']:.2f}s")
+    latency = summary['latency_ms']
+    print(f"  Latency:         median {latency['median']:.2f} ms   p95 {latency['p95']:.2f} ms   "
+          f"p99 {latency['p99']:.2f} ms   max {latency['max']:.2f} ms")
+    print(f"  Responses:       {', '.join(f'{status}: {count}' for status, count in sorted(summary['statuses'].items()))}"
+          f" ({summary['busy_retries']} retried after 503)")
+    if stored is not None:
+        flag = '✓' if stored == summary['statuses'].get(200, 0) else '✗'
+        print(f"  {flag} Stored:        {stored} line(s) in the results file")
+        print(f"  Server:          {server_output.strip().splitlines()[-1]}")
+    print("----------------------------------\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-tests the intake server with synthetic encrypted reports.")
+    parser.add_argument("-n", "--submissions", type=int, default=2000, help="Number of reports to submit.")
+    parser.add_argument("-c", "--concurrency", type=int, default=32, help="Number of concurrent clients.")
+    parser.add_argument("--checks", type=int, default=10, help="Number of checks in every synthetic report.")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Worker processes of the started server.")
+    parser.add_argument("--max-pending", type=int, default=256, help="--max-pending of the started server.")
+    parser.add_argument("--connect", help="Use a running server instead (unix socket path or HOST:PORT).")
+    parser.add_argument("--key", help="With --connect: file with the Base64 key the server accepts.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+    args = parser.parse_args()
+    if args.submissions < 1 or args.concurrency < 1:
+        parser.error("--submissions and --concurrency must be at least 1")
+    if args.connect and not args.key:
+        parser.error("--connect requires --key")
+    main(args)
@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import signal
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from autograding.envelope import decrypt_with_key_ring
+from autograding.keys import load_key_ring
+from seen_index import DEFAULT_SEEN_INDEX_PATH, SeenIndex, envelope_digests
+
+DEFAULT_RESULTS_PATH = "submissions.jsonl"
+# 单份报告的大小上限；正常的报告只有几 KB
+MAX_BODY_SIZE = 1 << 20
+MAX_HEADER_LINES = 100
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 422: "Unprocessable Entity", 503: "Service Unavailable"}
+
+# 每个工作进程各自加载一次密钥
+KEY_RING = None
+
+def load_worker_keys(project_root, key_ring_path):
+    global KEY_RING
+    KEY_RING = load_key_ring(project_root, key_ring_path)
+
+def verify_submission(data):
+    """
+    Decrypts and verifies one uploaded report (run in a worker process).
+
+    Returns:
+        tuple: (report or {'error': ...}, digests identifying the envelope).
+    """
+    try:
+        encrypted_data_string = data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        return {"error": f"Could not read report: {e}"}, []
+    try:
+        report = decrypt_with_key_ring(encrypted_data_string, KEY_RING)
+    except ValueError as e:
+        return {"error": str(e)}, []
+    return report, envelope_digests(encrypted_data_string)
+
+class ResultLog:
+    """
+    Appends accepted submissions to a JSONL file and makes them durable.
+
+    Submissions are queued and written by a single task, which also checks them for
+    duplicates so the order of the log and of the seen index agree. Everything that
+    queued up while the previous write was flushed is written and fsync'ed at once
+    (group commit); a submission is acknowledged only after its line is on disk. The
+    index lookups and the fsync of a batch run in a thread, off the event loop.
+    """
+
+    def __init__(self, path, seen=None):
+        self.file = open(path, 'a', encoding='utf-8')
+        self.seen = seen
+        self.queue = asyncio.Queue()
+        self.writes = 0
+
+    async def append(self, submission_id, report, digests):
+        """Queues a submission; returns its duplicate_of (or None) once it is durable."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((submission_id, report, digests, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            while not self.queue.empty():
+                pending.append(self.queue.get_nowait())
+
+            try:
+                duplicates = await loop.run_in_executor(None, self.write_batch, [entry[:3] for entry in pending])
+            except (OSError, sqlite3.Error) as e:
+                # 让每个提交都收到错误，而不是一直等待；客户端已断开的提交，其 future 已被取消
+                for *_, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.writes += 1
+            for (*_, future), duplicate_of in zip(pending, duplicates):
+                if not future.done():
+                    future.set_result(duplicate_of)
+
+    def write_batch(self, batch):
+        """
+        Checks a batch of (submission_id, report, digests) for duplicates, appends it to
+        the log and makes it durable.
+
+        Returns:
+            list: The duplicate_of of every submission (or None), in order.
+
+        Raises:
+            OSError, sqlite3.Error: If the batch could not be stored. Its lines are cut
+                from the log and its digests rolled back, so it can be submitted again.
+        """
+        lines = []
+        duplicates = []
+        position = self.file.tell()
+        try:
+            for submission_id, report, digests in batch:
+                duplicate_of = None
+                if self.seen is not None:
+                    duplicate_of = self.seen.check_and_add(f"intake:{submission_id}", digests)
+                duplicates.append(duplicate_of)
+                row = {"id": submission_id, "received_at": time.strftime('%Y-%m-%dT%H:%M:%S'), **report}
+                if duplicate_of is not None:
+                    row['duplicate_of'] = duplicate_of
+                lines.append(json.dumps(row, ensure_ascii=False) + "\n")
+            self.file.write(''.join(lines))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            if self.seen is not None:
+                self.seen.commit()
+        except (OSError, sqlite3.Error):
+            # 这一批没有存好：截掉已写入的行，并撤销它在索引中的记录
+            try:
+                self.file.truncate(position)
+                self.file.seek(position)
+            except OSError:
+                pass
+            if self.seen is not None:
+                try:
+                    self.seen.rollback()
+                except sqlite3.Error:
+                    pass
+            raise
+        return duplicates
+
+    def close(self):
+        self.file.close()
+        if self.seen is not None:
+            self.seen.close()
+
+class IntakeServer:
+    """
+    HTTP intake for encrypted reports: POST /submit stores a report, GET /stats shows counters.
+
+    Reports are verified in a pool of worker processes, so the event loop only parses
+    requests. At most `max_pending` submissions are in flight; further uploads are
+    refused at once with 503 and Retry-After instead of queueing without bound.
+    """
+
+    def __init__(self, pool, log, max_pending):
+        self.pool = pool
+        self.log = log
+        self.max_pending = max_pending
+        self.pending = 0
+        self.stats = {"accepted": 0, "rejected": 0, "duplicates": 0, "busy": 0, "connections": 0}
+
+    async def handle_connection(self, reader, writer):
+        self.stats['connections'] += 1
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                if isinstance(request, int):
+                    await send_response(writer, request, {"error": STATUS_TEXT[request]}, close=True)
+                    break
+                method, target, headers, body = request
+                status, payload, extra_headers = await self.route(method, target, headers, body)
+                close = headers.get('connection', '').lower() == 'close'
+                await send_response(writer, status, payload, extra_headers, close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, target, headers, body):
+        path, _, query = target.partition('?')
+        if path == '/stats':
+            if method != 'GET':
+                return 405, {"error": "Use GET"}, {}
+            return 200, {**self.stats, "pending": self.pending, "log_writes": self.log.writes}, {}
+        if path != '/submit':
+            return 404, {"error": f"Unknown path {path}"}, {}
+        if method != 'POST':
+            return 405, {"error": "Use POST"}, {}
+
+        if self.pending >= self.max_pending:
+            self.stats['busy'] += 1
+            return 503, {"error": "Too many submissions in progress, retry later"}, {"Retry-After": "1"}
+        self.pending += 1
+        try:
+            return await self.submit(headers.get('x-submission-id') or query_id(query) or
+                                     hashlib.sha256(body).hexdigest()[:16], body)
+        finally:
+            self.pending -= 1
+
+    async def submit(self, submission_id, body):
+        loop = asyncio.get_running_loop()
+        report, digests = await loop.run_in_executor(self.pool, verify_submission, body)
+        if "error" in report:
+            self.stats['rejected'] += 1
+            return 422, {"id": submission_id, "error": report['error']}, {}
+        try:
+            duplicate_of = await self.log.append(submission_id, report, digests)
+        except (OSError, sqlite3.Error) as e:
+            return 503, {"id": submission_id, "error": f"Could not store the submission: {e}"}, {"Retry-After": "1"}
+        self.stats['accepted'] += 1
+        response = {"id": submission_id, "status": "accepted",
+                    "score": report.get('score'), "max_score": report.get('max_score')}
+        if duplicate_of is not None:
+            self.stats['duplicates'] += 1
+            response['duplicate_of'] = duplicate_of
+        return 200, response, {}
+
+def query_id(query):
+    for pair in query.split('&'):
+        name, _, value = pair.partition('=')
+        if name == 'id' and value:
+            return value
+    return None
+
+async def read_request(reader):
+    """
+    Reads one HTTP/1.1 request.
+
+    Returns:
+        tuple: (method, target, headers with lower-case names, body), None when the
+        client closed the connection, or an error status for a bad request.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode('latin-1').split()
+    if len(parts) != 3:
+        return 400
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        return 400
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        return 400
+    if length > MAX_BODY_SIZE:
+        return 413
+    body = await reader.readexactly(length) if length > 0 else b''
+    return parts[0], parts[1], headers, body
+
+async def send_response(writer, status, payload, extra_headers=None, close=False):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}", "Content-Type: application/json",
+             f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in (extra_headers or {}).items()]
+    if close:
+        lines.append("Connection: close")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+
+async def serve(args, project_root):
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs, initializer=load_worker_keys,
+                                                initargs=(project_root, args.keyring)) as pool:
+        seen = None if args.no_seen_index else SeenIndex(args.seen_index)
+        log = ResultLog(args.results, seen)
+        intake = IntakeServer(pool, log, args.max_pending)
+        if args.socket:
+            if os.path.exists(args.socket):
+                os.unlink(args.socket)
+            server = await asyncio.start_unix_server(intake.handle_connection, path=args.socket)
+            address = args.socket
+        else:
+            server = await asyncio.start_server(intake.handle_connection, host=args.host, port=args.port)
+            address = f"http://{args.host}:{args.port}"
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        log_task = asyncio.create_task(log.run())
+        print(f"Intake listening on {address} ({args.jobs} workers, up to {args.max_pending} pending)", flush=True)
+        async with server:
+            await stop.wait()
+            server.close()
+            await server.wait_closed()
+            # 等待已接收的提交写完再退出
+            while intake.pending or not log.queue.empty():
+                await asyncio.sleep(0.05)
+        log_task.cancel()
+        log.close()
+        if args.socket:
+            os.unlink(args.socket)
+        stats = intake.stats
+        print(f"\nAccepted {stats['accepted']} submission(s) ({stats['duplicates']} duplicate(s)), "
+              f"rejected {stats['rejected']}, refused {stats['busy']} while busy, "
+              f"over {stats['connections']} connections.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accepts encrypted reports over HTTP and stores the verified results.")
+    listen = parser.add_mutually_exclusive_group()
+    listen.add_argument("--socket", help="Listen on this unix socket instead of TCP.")
+    listen.add_argument("--port", type=int, default=8650, help="TCP port on --host (default: 8650).")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1).")
+    parser.add_argument("--results", default=DEFAULT_RESULTS_PATH,
+                        help=f"JSONL file the accepted submissions are appended to (default: {DEFAULT_RESULTS_PATH}).")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="Number of worker processes verifying reports (default: number of CPUs).")
+    parser.add_argument("--max-pending", type=int, default=256,
+                        help="Submissions in flight before new ones get 503 (default: 256).")
+    parser.add_argument("--keyring", help="Key ring with the keys of earlier semesters (default: etc/keyring, if present).")
+    parser.add_argument("--seen-index", default=DEFAULT_SEEN_INDEX_PATH,
+                        help=f"Index of every submission seen so far, used to flag copies (default: {DEFAULT_SEEN_INDEX_PATH}).")
+    parser.add_argument("--no-seen-index", action="store_true", help="Do not check for or record duplicate submissions.")
+
+    args = parser.parse_args()
+    if args.jobs < 1 or args.max_pending < 1:
+        parser.error("--jobs and --max-pending must be at least 1")
+    # 与 decrypt_report 相同，etc/ 位于可执行文件的上一级目录
+    project_root = os.path.dirname(os.path.dirname(os.path.realpath(sys.executable)))
+    try:
+        load_key_ring(project_root, args.keyring)
+    except (OSError, ValueError) as e:
+        print(f"Error loading secret key: {e}")
+        sys.exit(1)
+    asyncio.run(serve(args, project_root))
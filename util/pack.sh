@@ -12,6 +12,8 @@ if [ ! -f "$1" ]; then
 fi
 
 PYTHON_SCRIPT="$1"
+# 项目根目录，共享模块 autograding/ 位于其中
+PROJECT_ROOT=$(cd "$(dirname "$0")/.." && pwd)
 DEST_DIR=$(dirname "$PYTHON_SCRIPT")
 SCRIPT_BASENAME=$(basename "$PYTHON_SCRIPT")
 EXECUTABLE_NAME=$(basename "$SCRIPT_BASENAME" .py)
@@ -34,7 +36,7 @@ else
 fi
 
 echo "--> Starting to pack ${SCRIPT_BASENAME} with PyInstaller..."
-pyinstaller --onefile --clean --noconfirm "$SCRIPT_BASENAME"
+pyinstaller --onefile --clean --noconfirm --paths "$PROJECT_ROOT" "$SCRIPT_BASENAME"
 
 if [ $? -ne 0 ]; then
     echo "✗ Error: PyInstaller failed. Exiting."
@@ -0,0 +1,66 @@
+#!/bin/bash
+
+# 将 tasks/grade.py 与所有任务模块打包为同一个可执行文件 tasks/grade。
+# grade 会在进程内依次运行各任务，整个评测只需启动一次解释器、加载一次密钥与加密库。
+
+PROJECT_ROOT=$(cd "$(dirname "$0")/.." && pwd)
+TASKS_DIR="$PROJECT_ROOT/tasks"
+TASKS=$(cd "$TASKS_DIR" && python3 -c "import grade; print(' '.join(grade.ALL_TASKS))")
+
+if [ -z "$TASKS" ]; then
+    echo "Error: Could not read ALL_TASKS from tasks/grade.py."
+    exit 1
+fi
+
+PYINSTALLER_ARGS=(--onefile --clean --noconfirm --paths "$PROJECT_ROOT")
+GENERATED_QUIZ_DIRS=()
+
+for TASK in $TASKS; do
+    TASK_DIR="$TASKS_DIR/$TASK"
+    if [ ! -f "$TASK_DIR/$TASK.py" ]; then
+        echo "Error: File not found: $TASK_DIR/$TASK.py"
+        exit 1
+    fi
+    PYINSTALLER_ARGS+=(--paths "$TASK_DIR" --hidden-import "$TASK")
+
+    if [ -f "$TASK_DIR/build_quiz.py" ] && [ -f "$TASK_DIR/questions.qmd" ]; then
+        echo "--> Found quiz components in ${TASK}. Generating quiz_data.py..."
+        (cd "$TASK_DIR" && python3 build_quiz.py --qmd questions.qmd --output quiz_data.py)
+        if [ $? -ne 0 ]; then
+            echo "✗ Error: build_quiz.py failed for ${TASK}. Exiting."
+            exit 1
+        fi
+        PYINSTALLER_ARGS+=(--hidden-import quiz_data)
+        GENERATED_QUIZ_DIRS+=("$TASK_DIR")
+    fi
+done
+
+cleanup_quiz_modules() {
+    for DIR in "${GENERATED_QUIZ_DIRS[@]}"; do
+        echo "--> Cleaning up generated quiz module in ${DIR}..."
+        rm -f "$DIR/quiz_data.py"
+    done
+}
+
+echo "--> Changing directory to ${TASKS_DIR}"
+pushd "$TASKS_DIR" > /dev/null
+
+echo "--> Starting to pack grade.py with tasks: ${TASKS}"
+pyinstaller "${PYINSTALLER_ARGS[@]}" grade.py
+
+if [ $? -ne 0 ]; then
+    echo "✗ Error: PyInstaller failed. Exiting."
+    cleanup_quiz_modules
+    popd > /dev/null
+    exit 1
+fi
+
+echo "--> Cleaning up build artifacts..."
+mv dist/grade .
+rm -rf dist build *.spec
+cleanup_quiz_modules
+
+popd > /dev/null
+
+echo "✓ Packing completed successfully!"
+echo "✓ Executable saved as ${TASKS_DIR}/grade"
@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import socket
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from autograding.history import HISTORY_FILE_NAME, compare_latest, open_history
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tasks', HISTORY_FILE_NAME)
+
+def show(connection, host, limit):
+    """Prints the most recent runs with the total time of every task."""
+    query = "SELECT id, started_at, build, host, mode FROM runs"
+    params = []
+    if host:
+        query += " WHERE host = ?"
+        params.append(host)
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+
+    print(f"\n--- GRADING HISTORY (last {limit} runs) ---")
+    for run_id, started_at, build, run_host, mode in connection.execute(query, params):
+        tasks = ", ".join(f"{task} {duration:.2f}s ({status})" for task, status, duration in connection.execute(
+            "SELECT task, status, duration FROM task_timings WHERE run_id = ? ORDER BY rowid", (run_id,)))
+        print(f"  #{run_id} {started_at} build {build} on {run_host} [{mode}]: {tasks}")
+    print("----------------------------------\n")
+
+def compare(connection, host, args):
+    """
+    Prints the latest build's timings against the baseline and returns the exit code:
+    1 if any task or check regressed, else 0.
+    """
+    build, rows = compare_latest(connection, host, args.baseline_runs, args.threshold,
+                                 args.min_delta, args.latest_runs)
+    if args.json:
+        print(json.dumps({"host": host, "build": build, "checks": rows}, indent=2, ensure_ascii=False))
+        return 1 if any(row['regressed'] for row in rows) else 0
+
+    if build is None:
+        print(f"No runs recorded for host '{host}'.")
+        return 0
+    if not rows:
+        print(f"Build {build} on {host}: no earlier build to compare with yet.")
+        return 0
+
+    print(f"\n--- PERFORMANCE COMPARISON: build {build} on {host} ---")
+    print(f"  {'Task / Check':<44} {'median':>18} {'p95':>18}")
+    for row in rows:
+        flag = '✗ REGRESSED' if row['regressed'] else ''
+        print(f"  {row['task'] + ' / ' + row['check']:<44} "
+              f"{row['baseline_median'] * 1000:7.1f} → {row['median'] * 1000:7.1f}ms "
+              f"{row['baseline_p95'] * 1000:7.1f} → {row['p95'] * 1000:7.1f}ms  {flag}")
+    regressions = sum(1 for row in rows if row['regressed'])
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%} (and {args.min_delta * 1000:.0f}ms).")
+    print("----------------------------------\n")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shows and compares the grading timings recorded by grade.")
+    parser.add_argument("--db", default=DEFAULT_HISTORY_PATH, help=f"Path of {HISTORY_FILE_NAME} (default: tasks/).")
+    parser.add_argument("--host", default=socket.gethostname(), help="Host to look at (default: this machine).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    show_parser = subparsers.add_parser("show", help="List the most recent runs.")
+    show_parser.add_argument("--limit", type=int, default=10, help="Number of runs to list.")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare the latest build against earlier builds.")
+    compare_parser.add_argument("--baseline-runs", type=int, default=20,
+                                help="Number of most recent runs of earlier builds in the baseline.")
+    compare_parser.add_argument("--latest-runs", type=int, default=5,
+                                help="Number of most recent runs of the latest build to compare.")
+    compare_parser.add_argument("--threshold", type=float, default=0.2,
+                                help="Relative growth of the median or p95 that counts as a regression (default: 0.2).")
+    compare_parser.add_argument("--min-delta", type=float, default=0.005,
+                                help="Ignore growth below this many seconds (default: 0.005).")
+    compare_parser.add_argument("--json", action="store_true", help="Print the comparison as JSON.")
+
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        print(f"Error: History not found at {args.db}")
+        sys.exit(1)
+    connection = open_history(args.db)
+    try:
+        if args.command == "show":
+            show(connection, args.host, args.limit)
+        else:
+            sys.exit(compare(connection, args.host, args))
+    finally:
+        connection.close()
@@ -0,0 +1,202 @@
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from autograding.history import check_key
+from decrypt_report import batch_root, decrypt_report, find_reports
+
+DEFAULT_INDEX_PATH = "reports.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    content_hash TEXT NOT NULL,
+    submission TEXT NOT NULL,
+    task TEXT NOT NULL,
+    score REAL NOT NULL,
+    max_score REAL NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checks (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    passed INTEGER NOT NULL,
+    points REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_by_submission ON reports(submission, task);
+CREATE INDEX IF NOT EXISTS reports_by_task ON reports(task);
+CREATE INDEX IF NOT EXISTS checks_by_report ON checks(report_id);
+CREATE INDEX IF NOT EXISTS checks_by_name ON checks(name, passed);
+"""
+
+def open_index(path):
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+def identify(root, path, report):
+    """
+    Returns (submission, task) for a report file.
+
+    The submission is the first directory below the ingested root (e.g. the
+    student's folder), or the file name if the report lies directly in it. For a
+    glob, the root is its directory before the first wildcard. Reports written
+    before the task name was recorded fall back to a 'taskN' in the path.
+    """
+    relative = os.path.relpath(path, batch_root(root))
+    parts = relative.split(os.sep)
+    submission = parts[0] if len(parts) > 1 else os.path.splitext(parts[0])[0]
+    task = report.get('task')
+    if not task:
+        match = re.search(r'task\d+', relative)
+        task = match.group(0) if match else 'unknown'
+    return submission, task
+
+def ingest(connection, target, pattern):
+    """
+    Adds the reports under a directory (or matching a glob) to the index.
+
+    A file whose path and content hash are already indexed is skipped without being
+    decrypted, so re-running over a growing folder only costs the new files. A file
+    whose content changed replaces its earlier rows (or removes them if it can no
+    longer be decrypted).
+
+    Returns:
+        tuple: (added, skipped, failed) file counts; failed files (unreadable or not decryptable) are printed to stderr.
+    """
+    known = dict(connection.execute("SELECT path, content_hash FROM reports"))
+    added = skipped = failed = 0
+    for path in find_reports(target, pattern):
+        absolute_path = os.path.abspath(path)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError as e:
+            # 文件可能在列出之后被删除或改名 (文件夹仍在增长)，跳过它，下次再索引
+            failed += 1
+            print(f"  - {path}: Could not read file: {e}", file=sys.stderr)
+            continue
+        content_hash = hashlib.sha256(content).hexdigest()
+        if known.get(absolute_path) == content_hash:
+            skipped += 1
+            continue
+
+        report = decrypt_report(content.decode('utf-8', 'replace'))
+        if "error" in report:
+            failed += 1
+            print(f"  - {path}: {report['error']}", file=sys.stderr)
+            # 文件被改坏时，不再保留它之前的结果
+            with connection:
+                connection.execute("DELETE FROM reports WHERE path = ?", (absolute_path,))
+            continue
+
+        submission, task = identify(target, path, report)
+        with connection:
+            connection.execute("DELETE FROM reports WHERE path = ?", (absolute_path,))
+            report_id = connection.execute(
+                "INSERT INTO reports (path, content_hash, submission, task, score, max_score, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (absolute_path, content_hash, submission, task, report['score'], report['max_score'],
+                 time.strftime('%Y-%m-%dT%H:%M:%S'))
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO checks (report_id, name, passed, points) VALUES (?, ?, ?, ?)",
+                [(report_id, check_key(result['name']), bool(result['passed']), result['points'])
+                 for result in report['test_results']]
+            )
+        added += 1
+    return added, skipped, failed
+
+# 每个学生每个任务只计最高分 (同一任务可能提交了多份报告)；score 与 max_score 取自同一份报告
+BEST_SCORES = """
+SELECT submission, task, score, max_score FROM (
+    SELECT submission, task, score, max_score,
+           ROW_NUMBER() OVER (PARTITION BY submission, task ORDER BY score DESC, id DESC) AS rank
+    FROM reports
+) WHERE rank = 1
+"""
+
+def leaderboard(connection, limit):
+    print(f"\n--- LEADERBOARD (top {limit}) ---")
+    rows = connection.execute(
+        f"SELECT submission, SUM(score), SUM(max_score), COUNT(*) FROM ({BEST_SCORES}) "
+        "GROUP BY submission ORDER BY SUM(score) DESC, submission LIMIT ?", (limit,))
+    for rank, (submission, score, max_score, tasks) in enumerate(rows, 1):
+        print(f"  {rank:>4}. {submission:<32} {score:g}/{max_score:g} ({tasks} task(s))")
+    print("----------------------------------\n")
+
+def failure_rates(connection, task):
+    print("\n--- CHECK FAILURE RATES ---")
+    query = ("SELECT reports.task, checks.name, COUNT(*), SUM(1 - checks.passed) "
+             "FROM checks JOIN reports ON reports.id = checks.report_id")
+    params = ()
+    if task:
+        query += " WHERE reports.task = ?"
+        params = (task,)
+    query += " GROUP BY reports.task, checks.name ORDER BY 1.0 * SUM(1 - checks.passed) / COUNT(*) DESC, 1, 2"
+    for row_task, name, total, failed in connection.execute(query, params):
+        print(f"  {row_task + ' / ' + name:<48} {failed:>6}/{total:<6} failed ({failed / total:.1%})")
+    print("----------------------------------\n")
+
+def histogram(connection, task, bins):
+    """Prints how the scores (as a percentage of max_score) are distributed over `bins` buckets."""
+    query = f"SELECT score, max_score FROM ({BEST_SCORES})"
+    params = ()
+    if task:
+        query += " WHERE task = ?"
+        params = (task,)
+    counts = [0] * bins
+    for score, max_score in connection.execute(query, params):
+        fraction = score / max_score if max_score else 0.0
+        counts[min(bins - 1, int(fraction * bins))] += 1
+
+    print(f"\n--- SCORE HISTOGRAM{' (' + task + ')' if task else ''} ---")
+    widest = max(counts) or 1
+    for index, count in enumerate(counts):
+        low, high = 100 * index / bins, 100 * (index + 1) / bins
+        print(f"  {low:5.1f}-{high:5.1f}% | {'#' * round(40 * count / widest):<40} {count}")
+    print("----------------------------------\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indexes decrypted reports in SQLite and queries them.")
+    parser.add_argument("--db", default=DEFAULT_INDEX_PATH, help=f"Path of the index (default: {DEFAULT_INDEX_PATH}).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Add new or changed reports to the index.")
+    ingest_parser.add_argument("target", help="Directory of submissions (searched recursively) or a glob.")
+    ingest_parser.add_argument("--pattern", default="*.json",
+                               help="File name pattern used when target is a directory (default: *.json).")
+
+    leaderboard_parser = subparsers.add_parser("leaderboard", help="Rank submissions by their total score.")
+    leaderboard_parser.add_argument("--limit", type=int, default=20, help="Number of submissions to list.")
+
+    failures_parser = subparsers.add_parser("failures", help="Show how often every check fails.")
+    failures_parser.add_argument("--task", help="Only this task, e.g. task2.")
+
+    histogram_parser = subparsers.add_parser("histogram", help="Show the distribution of scores.")
+    histogram_parser.add_argument("--task", help="Only this task, e.g. task2.")
+    histogram_parser.add_argument("--bins", type=int, default=10, help="Number of buckets (default: 10).")
+
+    args = parser.parse_args()
+    connection = open_index(args.db)
+    try:
+        if args.command == "ingest":
+            added, skipped, failed = ingest(connection, args.target, args.pattern)
+            print(f"Indexed {added} new report(s), skipped {skipped} unchanged, {failed} could not be read or decrypted.")
+        elif args.command == "leaderboard":
+            leaderboard(connection, args.limit)
+        elif args.command == "failures":
+            failure_rates(connection, args.task)
+        else:
+            if args.bins < 1:
+                parser.error("--bins must be at least 1")
+            histogram(connection, args.task, args.bins)
+    finally:
+        connection.close()
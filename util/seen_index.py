@@ -0,0 +1,139 @@
+import hashlib
+import math
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from autograding.envelope import parse_envelope
+
+DEFAULT_SEEN_INDEX_PATH = "seen_submissions.db"
+
+# 布隆过滤器按这个容量与误判率确定大小；超过容量后误判率会上升，但结果仍然正确
+DEFAULT_CAPACITY = 1_000_000
+FALSE_POSITIVE_RATE = 0.01
+
+def envelope_digests(encrypted_data_string):
+    """
+    Returns the digests that identify an encrypted report, or [] if it is not an envelope.
+
+    The nonce is random for every report the graders write, so a repeated nonce means
+    a copied file; the ciphertext digest also catches a copy whose JSON was reformatted.
+    """
+    try:
+        envelope = parse_envelope(encrypted_data_string)
+    except ValueError:
+        return []
+    return [hashlib.sha256(b'nonce:' + envelope['nonce']).digest(),
+            hashlib.sha256(b'ciphertext:' + envelope['ciphertext'] + envelope['tag']).digest()]
+
+class BloomFilter:
+    """
+    Compact set of digests that answers "definitely not seen" without touching the index.
+
+    The bit positions are taken from the (already uniformly distributed) SHA-256 digest,
+    so no extra hashing is needed.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=FALSE_POSITIVE_RATE, bits=None):
+        size = -capacity * math.log(error_rate) / (math.log(2) ** 2)
+        self.size = int(size) // 8 * 8 + 8
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits is not None else bytearray(self.size // 8)
+
+    def _positions(self, digest):
+        # 双重哈希：由摘要中的两个 64 位整数线性组合出 k 个位置
+        first = int.from_bytes(digest[0:8], 'big')
+        second = int.from_bytes(digest[8:16], 'big') | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, digest):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, digest):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+class SeenIndex:
+    """
+    Persistent index of every submission seen by the batch decryption.
+
+    Digests live in SQLite (with the path of the first file that had them); a Bloom
+    filter saved next to the database is consulted first, so a new submission, the
+    common case, costs one in-memory test and one insert.
+
+    Args:
+        path (str): Path of the SQLite database; the filter is saved as <path>.bloom.
+        capacity (int): Number of digests the filter is sized for.
+    """
+
+    def __init__(self, path=DEFAULT_SEEN_INDEX_PATH, capacity=DEFAULT_CAPACITY):
+        # intake_server 在线程池中使用索引 (同一时间只有一个线程)，因此不限定创建连接的线程
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS seen (digest BLOB PRIMARY KEY, path TEXT NOT NULL, first_seen TEXT NOT NULL)"
+        )
+        self.bloom_path = f"{path}.bloom"
+        self.bloom = BloomFilter(capacity)
+        try:
+            with open(self.bloom_path, 'rb') as f:
+                bits = f.read()
+        except OSError:
+            bits = None
+        self.bloom_saved = bits is not None and len(bits) == len(self.bloom.bits)
+        if self.bloom_saved:
+            self.bloom.bits = bytearray(bits)
+        else:
+            # 过滤器丢失或容量改变时由数据库重建
+            for (digest,) in self.connection.execute("SELECT digest FROM seen"):
+                self.bloom.add(digest)
+
+    def check_and_add(self, path, digests):
+        """
+        Records a submission's digests and returns the path of an earlier, different file
+        with the same nonce or ciphertext, or None. Seeing the same file at the same path
+        again (re-running a batch) is not a duplicate.
+        """
+        duplicate_of = None
+        for digest in digests:
+            if digest in self.bloom:
+                row = self.connection.execute("SELECT path FROM seen WHERE digest = ?", (digest,)).fetchone()
+                if row is not None and row[0] != path and duplicate_of is None:
+                    duplicate_of = row[0]
+            self.connection.execute("INSERT OR IGNORE INTO seen (digest, path, first_seen) VALUES (?, ?, ?)",
+                                    (digest, path, time.strftime('%Y-%m-%dT%H:%M:%S')))
+            self.bloom.add(digest)
+        return duplicate_of
+
+    def commit(self):
+        """
+        Commits the new digests without writing the filter, for callers that commit
+        often. The saved filter no longer matches the database, so it is removed until
+        the next save(); after a crash the filter is rebuilt instead of missing digests.
+        """
+        self.connection.commit()
+        if self.bloom_saved:
+            os.remove(self.bloom_path)
+            self.bloom_saved = False
+
+    def rollback(self):
+        """
+        Forgets the digests added since the last commit, e.g. when the submissions they
+        belong to could not be stored. The filter keeps their bits, which only costs an
+        extra lookup if they are seen again.
+        """
+        self.connection.rollback()
+
+    def save(self):
+        """Commits the new digests and writes the filter (call after every batch)."""
+        self.connection.commit()
+        temporary_path = f"{self.bloom_path}.tmp"
+        with open(temporary_path, 'wb') as f:
+            f.write(self.bloom.bits)
+        os.replace(temporary_path, self.bloom_path)
+        self.bloom_saved = True
+
+    def close(self):
+        self.save()
+        self.connection.close()